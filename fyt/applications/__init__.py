@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class ApplicationsConfig(AppConfig):
+    name = 'fyt.applications'
+
+    def ready(self):
+        # Register signals
+        from . import signals
+
+
+default_app_config = 'fyt.applications.ApplicationsConfig'
@@ -0,0 +1,173 @@
+"""
+Bulk release of application decisions.
+
+Instead of setting the status of each application by hand, directors can
+pick score cutoffs for croo members, trip leaders and the leader waitlist.
+Every submitted application which is still pending is given the status of
+the first cutoff its score meets; the remaining applications are either
+rejected or left pending.
+
+The decisions can be previewed, and are then applied in a single
+transaction with one ``bulk_update``. ``bulk_update`` doesn't send
+``post_save``, so the side effects of saving an application are applied in
+bulk as well: the scoring queue is updated, the data version of the
+applications is bumped, and any missing training ``Attendee`` objects are
+created with one ``bulk_create``.
+"""
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.db.models import F
+
+from fyt.applications.models import ScoreQueueEntry, Volunteer
+from fyt.training.models import Attendee
+from fyt.utils.cache import bump_data_version
+
+
+AVERAGE = 'average'
+NORMALIZED = 'normalized'
+SCORE_CHOICES = ((AVERAGE, 'Average score'), (NORMALIZED, 'Normalized score'))
+
+# The (leader, croo) score fields of each kind of score
+SCORE_FIELDS = {
+    AVERAGE: ('avg_leader_score', 'avg_croo_score'),
+    NORMALIZED: ('normalized_leader_score', 'normalized_croo_score'),
+}
+
+
+class Cutoffs(
+    namedtuple('Cutoffs', ['score', 'croo', 'leader', 'waitlist', 'reject_rest'])
+):
+    """
+    The minimum scores for each status. A cutoff of None gives the status
+    to no one.
+    """
+
+    def decide(self, application):
+        """
+        The status to give a pending ``application``.
+        """
+        leader_field, croo_field = SCORE_FIELDS[self.score]
+        leader_score = getattr(application, leader_field)
+        croo_score = getattr(application, croo_field)
+
+        def meets(score, cutoff):
+            return score is not None and cutoff is not None and score >= cutoff
+
+        if application.croo_willing and meets(croo_score, self.croo):
+            return Volunteer.CROO
+        if application.leader_willing and meets(leader_score, self.leader):
+            return Volunteer.LEADER
+        if application.leader_willing and meets(leader_score, self.waitlist):
+            return Volunteer.LEADER_WAITLIST
+        if self.reject_rest:
+            return Volunteer.REJECTED
+        return Volunteer.PENDING
+
+
+def pending_applications(trips_year, score=AVERAGE):
+    """
+    The submitted, pending applications of ``trips_year``, ranked by their
+    leader and croo scores.
+    """
+    leader_field, croo_field = SCORE_FIELDS[score]
+    return (
+        Volunteer.objects.filter(
+            trips_year=trips_year, status=Volunteer.PENDING, submitted__isnull=False,
+        )
+        .select_related(None)
+        .select_related('applicant')
+        .only(
+            'applicant__name',
+            'applicant__netid',
+            'trips_year',
+            'status',
+            'leader_willing',
+            'croo_willing',
+            'avg_leader_score',
+            'avg_croo_score',
+            'normalized_leader_score',
+            'normalized_croo_score',
+        )
+        .order_by(
+            F(leader_field).desc(nulls_last=True),
+            F(croo_field).desc(nulls_last=True),
+            'pk',
+        )
+    )
+
+
+def plan(trips_year, cutoffs):
+    """
+    A ranked list of (application, status) pairs, without changing
+    anything.
+    """
+    return [
+        (application, cutoffs.decide(application))
+        for application in pending_applications(trips_year, cutoffs.score)
+    ]
+
+
+def count_statuses(statuses):
+    """
+    A list of (label, count) pairs of ``statuses``, in the order of
+    ``Volunteer.STATUS_CHOICES``.
+    """
+    counts = Counter(statuses)
+    return [
+        (label, counts[status])
+        for status, label in Volunteer.STATUS_CHOICES
+        if counts[status]
+    ]
+
+
+def release(trips_year, cutoffs):
+    """
+    Apply the decisions for ``cutoffs``. Returns the list of applications
+    whose status was changed.
+    """
+    with transaction.atomic():
+        # Lock the applications in pk order, as normalization does, so that a
+        # release during scoring can't deadlock. Decisions don't depend on
+        # the ranking.
+        applications = (
+            pending_applications(trips_year, cutoffs.score)
+            .order_by('pk')
+            .select_for_update(of=('self',))
+        )
+
+        changed = []
+        for application in applications:
+            status = cutoffs.decide(application)
+            if status != application.status:
+                application.status = status
+                changed.append(application)
+
+        if not changed:
+            return changed
+
+        Volunteer.objects.bulk_update(changed, ['status'], batch_size=500)
+        bump_data_version(trips_year, Volunteer)
+
+        # None of the released applications are waiting to be scored
+        ScoreQueueEntry.objects.filter(application__in=changed).update(pending=False)
+
+        trainable = [
+            application
+            for application in changed
+            if application.status in Attendee.TRAINABLE_STATUSES
+        ]
+        existing = set(
+            Attendee.objects.filter(volunteer__in=trainable)
+            .order_by()
+            .values_list('volunteer_id', flat=True)
+        )
+        attendees = Attendee.objects.bulk_create(
+            Attendee(trips_year=trips_year, volunteer=application)
+            for application in trainable
+            if application.pk not in existing
+        )
+        if attendees:
+            bump_data_version(trips_year, Attendee)
+
+    return changed
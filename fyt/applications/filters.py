@@ -78,6 +78,7 @@ class ApplicationTypeFilter(django_filters.ChoiceFilter):
             'Incomplete Croo Applications',
             'incomplete_croo_applications',
         ),
+        _Choice('extension', 'Within Deadline Extension', 'extension_applications'),
     ]
 
     def croo_applications(self, qs):
@@ -98,6 +99,9 @@ class ApplicationTypeFilter(django_filters.ChoiceFilter):
     def incomplete_croo_applications(self, qs):
         return qs & Volunteer.objects.incomplete_croo_applications(self.trips_year)
 
+    def extension_applications(self, qs):
+        return qs.within_deadline_extension()
+
     def filter(self, qs, value):
         if not value or not self.actions[value]:
             return qs
@@ -216,6 +220,7 @@ class ApplicationFilterSet(django_filters.FilterSet):
 
     name = django_filters.CharFilter(method='lookup_user_by_name', label='Name')
     netid = django_filters.CharFilter(method='lookup_user_by_netid', label='NetId')
+    search = django_filters.CharFilter(method='search_answers', label='Search Answers')
 
     def lookup_user_by_name(self, qs, name, value):
         if not value:
@@ -229,6 +234,12 @@ class ApplicationFilterSet(django_filters.FilterSet):
 
         return qs.filter(applicant__netid__iexact=value)
 
+    def search_answers(self, qs, name, value):
+        if not value:
+            return qs
+
+        return qs.search(value)
+
     def __init__(self, trips_year, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -275,6 +286,7 @@ class FilterSetFormHelper(FormHelper):
             filter_row(CLASS_YEAR),
             filter_row('name'),
             filter_row('netid'),
+            filter_row('search'),
             filter_row(AVAILABLE_SECTIONS),
             filter_row(AVAILABLE_TRIPTYPES),
             filter_row(SWIM_TEST),
@@ -4,8 +4,10 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import HTML, Div, Field, Fieldset, Layout, Row, Submit
 from django import forms
 from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import transaction
 from django.utils import timezone
 
+from fyt.applications import decisions
 from fyt.applications.models import (
     LEADER_SECTION_CHOICES,
     LEADER_TRIPTYPE_CHOICES,
@@ -19,11 +21,13 @@ from fyt.applications.models import (
     Volunteer,
     validate_word_count,
 )
+from fyt.applications.search import update_search_document
 from fyt.core.forms import TripsYearModelForm
 from fyt.core.models import TripsYear
 from fyt.croos.models import Croo
 from fyt.trips.fields import TripChoiceField
 from fyt.trips.models import Section, Trip, TripType
+from fyt.utils.cache import bump_data_version
 from fyt.utils.choices import NOT_AVAILABLE
 from fyt.utils.fmt import join_with_and
 from fyt.utils.forms import crispify
@@ -115,7 +119,10 @@ class QuestionForm(TripsYearModelForm):
             self._update_errors(e)
 
     def save(self, **kwargs):
-        self.question_handler.save()
+        with transaction.atomic():
+            self.question_handler.save()
+            # Answers are saved in bulk, which doesn't send signals
+            update_search_document(self.instance)
 
 
 class AgreementForm(TripsYearModelForm):
@@ -202,10 +209,6 @@ class PreferenceHandler:
     # of through objects
     through_qs_name = None
 
-    # Name of the method on the instance which creates a new through object
-    # with the specified (target, data) arguments.
-    through_creator = None
-
     # The name of the extra data field on the through model
     data_field = None
 
@@ -236,8 +239,19 @@ class PreferenceHandler:
             .all()
         )
 
-    def create_through(self, instance, target, data):
-        return getattr(instance, self.through_creator)(target, data)
+    def through_model(self, instance):
+        return getattr(instance, self.through_qs_name).model
+
+    def build_through(self, instance, target, data):
+        """Build a new, unsaved, through object."""
+        related = getattr(instance, self.through_qs_name)
+        return related.model(
+            **{
+                related.field.name: instance,
+                self.target_field: target,
+                self.data_field: data,
+            }
+        )
 
     def formfield_label(self, target):
         """The label for the formfield."""
@@ -290,28 +304,38 @@ class PreferenceHandler:
         """
         Save the through objects.
 
-        This must be called after the form's `save` method has been called.
+        Changed objects are updated, and new objects created, with one query
+        each. This must be called after the form's `save` method has been
+        called.
         """
 
         def get_cleaned_data(target):
             return self.form.cleaned_data[self.formfield_name(target)]
 
+        instance = self.form.instance
         targets = set(self.targets)
 
         # Update old answers
-        for pref in self.through_qs(self.form.instance):
+        changed = []
+        for pref in self.through_qs(instance):
             target = self.get_target(pref)
             new_data = get_cleaned_data(target)
 
             if new_data != self.get_data(pref):
                 self.set_data(pref, new_data)
-                pref.save()
+                changed.append(pref)
 
             targets.remove(target)
 
+        model = self.through_model(instance)
+        model.objects.bulk_update(changed, [self.data_field])
+
         # Save new answers
-        for t in targets:
-            self.create_through(self.form.instance, t, get_cleaned_data(t))
+        model.objects.bulk_create(
+            [self.build_through(instance, t, get_cleaned_data(t)) for t in targets]
+        )
+        # The through objects belong to the instance
+        bump_data_version(instance.trips_year_id, type(instance))
 
 
 class QuestionHandler(PreferenceHandler):
@@ -320,7 +344,6 @@ class QuestionHandler(PreferenceHandler):
     """
 
     through_qs_name = 'answer_set'
-    through_creator = 'answer_question'
     data_field = 'answer'
     target_field = 'question'
     default = ''
@@ -356,7 +379,6 @@ class QuestionHandler(PreferenceHandler):
 
 class SectionPreferenceHandler(PreferenceHandler):
     through_qs_name = 'leadersectionchoice_set'
-    through_creator = 'set_section_preference'
     data_field = 'preference'
     target_field = 'section'
     choices = LEADER_SECTION_CHOICES
@@ -387,7 +409,6 @@ class SectionPreferenceHandler(PreferenceHandler):
 
 class TripTypePreferenceHandler(PreferenceHandler):
     through_qs_name = 'leadertriptypechoice_set'
-    through_creator = 'set_triptype_preference'
     data_field = 'preference'
     target_field = 'triptype'
     choices = LEADER_TRIPTYPE_CHOICES
@@ -447,10 +468,10 @@ class LeaderSupplementForm(TripsYearModelForm):
         )
 
     def save(self):
-        application = super().save()
-
-        self.section_handler.save()
-        self.triptype_handler.save()
+        with transaction.atomic():
+            application = super().save()
+            self.section_handler.save()
+            self.triptype_handler.save()
 
         return application
 
@@ -502,6 +523,60 @@ class ApplicationAdminForm(TripsYearModelForm):
         return helper
 
 
+class BulkDecisionForm(forms.Form):
+    """
+    Score cutoffs for releasing the decisions of pending applications.
+    """
+
+    PREVIEW = 'preview'
+    RELEASE = 'release'
+
+    score = forms.ChoiceField(choices=decisions.SCORE_CHOICES, label='Rank by')
+    croo_cutoff = forms.FloatField(
+        required=False, help_text='Minimum croo score for croo members'
+    )
+    leader_cutoff = forms.FloatField(
+        required=False, help_text='Minimum leader score for trip leaders'
+    )
+    waitlist_cutoff = forms.FloatField(
+        required=False, help_text='Minimum leader score for the leader waitlist'
+    )
+    reject_rest = forms.BooleanField(
+        required=False, label='Reject all other pending applications'
+    )
+
+    def __init__(self, trips_year, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.form_id = 'bulk-decision-form'
+        self.helper.form_method = 'GET'
+        self.helper.add_input(Submit(self.PREVIEW, 'Preview'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        leader_cutoff = cleaned_data.get('leader_cutoff')
+        waitlist_cutoff = cleaned_data.get('waitlist_cutoff')
+        if (
+            leader_cutoff is not None
+            and waitlist_cutoff is not None
+            and waitlist_cutoff > leader_cutoff
+        ):
+            raise ValidationError(
+                {'waitlist_cutoff': 'Must not be above the leader cutoff'}
+            )
+        return cleaned_data
+
+    @property
+    def cutoffs(self):
+        return decisions.Cutoffs(
+            score=self.cleaned_data['score'],
+            croo=self.cleaned_data['croo_cutoff'],
+            leader=self.cleaned_data['leader_cutoff'],
+            waitlist=self.cleaned_data['waitlist_cutoff'],
+            reject_rest=self.cleaned_data['reject_rest'],
+        )
+
+
 class ApplicationLayout(Layout):
     def __init__(self):
         super().__init__(
@@ -699,7 +774,6 @@ class CommentHandler(PreferenceHandler):
     """
 
     through_qs_name = 'scorecomment_set'
-    through_creator = 'add_comment'
     data_field = 'comment'
     target_field = 'score_question'
     default = ''
@@ -783,8 +857,9 @@ def ScoreForm(application, grader, **kwargs):
             self.instance.grader = self.grader
             self.instance.application = self.application
             self.instance.trips_year = self.trips_year
-            score = super().save()
-            self.comment_handler.save()
+            with transaction.atomic():
+                score = super().save()
+                self.comment_handler.save()
             return score
 
     return _ScoreForm(application, grader, **kwargs)
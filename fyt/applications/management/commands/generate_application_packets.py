@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from fyt.applications import packets
+from fyt.core.models import TripsYear
+
+
+class Command(BaseCommand):
+    help = "Render the anonymized application packets to file storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trips-year',
+            type=int,
+            help='Generate packets for this trips year. Defaults to the current year.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=packets.FORMATS,
+            default=packets.HTML,
+            help='A single HTML page, or a zip of a page for each application.',
+        )
+        parser.add_argument(
+            '--scores', action='store_true', help='Include application scores.'
+        )
+
+    def handle(self, *args, **options):
+        if options['trips_year']:
+            trips_year = TripsYear.objects.get(year=options['trips_year'])
+        else:
+            trips_year = TripsYear.objects.current()
+
+        name = packets.save_packets(
+            trips_year, fmt=options['format'], show_scores=options['scores']
+        )
+        self.stdout.write('Saved application packets to {}'.format(name))
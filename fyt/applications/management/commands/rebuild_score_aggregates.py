@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from fyt.applications.models import Volunteer
+from fyt.core.models import TripsYear
+
+
+class Command(BaseCommand):
+    help = "Recompute the score averages and counts stored on each application"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trips-year',
+            type=int,
+            help='Rebuild scores for this trips year. Defaults to the current year.',
+        )
+
+    def handle(self, *args, **options):
+        if options['trips_year']:
+            trips_year = TripsYear.objects.get(year=options['trips_year'])
+        else:
+            trips_year = TripsYear.objects.current()
+
+        applications = Volunteer.objects.filter(trips_year=trips_year)
+        for application in applications:
+            application.update_score_aggregates()
+
+        self.stdout.write(
+            'Rebuilt score aggregates for {} applications'.format(applications.count())
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from fyt.applications.models import ScoreQueueEntry, Volunteer
+from fyt.core.models import TripsYear
+
+
+class Command(BaseCommand):
+    help = "Rebuild the scoring queue from the applications, scores and claims"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trips-year',
+            type=int,
+            help='Rebuild the queue for this trips year. Defaults to the current year.',
+        )
+
+    def handle(self, *args, **options):
+        if options['trips_year']:
+            trips_year = TripsYear.objects.get(year=options['trips_year'])
+        else:
+            trips_year = TripsYear.objects.current()
+
+        applications = Volunteer.objects.filter(trips_year=trips_year)
+        for application in applications:
+            ScoreQueueEntry.objects.refresh(application, create=True)
+
+        self.stdout.write(
+            'Rebuilt the scoring queue for {} applications'.format(applications.count())
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from fyt.applications.search import rebuild_search_index
+from fyt.core.models import TripsYear
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents of each application"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trips-year',
+            type=int,
+            help='Rebuild the index for this trips year. Defaults to the current year.',
+        )
+
+    def handle(self, *args, **options):
+        if options['trips_year']:
+            trips_year = TripsYear.objects.get(year=options['trips_year'])
+        else:
+            trips_year = TripsYear.objects.current()
+
+        count = rebuild_search_index(trips_year)
+
+        self.stdout.write('Rebuilt search index for {} applications'.format(count))
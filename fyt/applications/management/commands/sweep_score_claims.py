@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from fyt.applications.models import ScoreClaim, ScoreQueueEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete score claims which have expired or been scored or skipped, "
+        "and release the scores held by expired claims"
+    )
+
+    def handle(self, *args, **options):
+        count = ScoreClaim.objects.sweep()
+        self.stdout.write('Deleted {} score claims'.format(count))
+
+        count = ScoreQueueEntry.objects.refresh_expired()
+        self.stdout.write('Released {} queue entries'.format(count))
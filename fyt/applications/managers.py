@@ -1,14 +1,16 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.cache import cache
 from django.db import models
 from django.db.models import (
     Q,
-    Avg,
     Case,
     Count,
     Exists,
-    FilteredRelation,
+    F,
     Lookup,
+    Min,
     OuterRef,
     Prefetch,
     Subquery,
@@ -17,11 +19,12 @@ from django.db.models import (
     When,
 )
 from django.db.models.fields import Field
-from django.db.models.functions import Coalesce
+from django.db.models.functions import Coalesce, Least
 from django.utils import timezone
 
+from fyt.utils.cache import data_version
 from fyt.utils.choices import AVAILABLE, PREFER
-from fyt.utils.query import pks
+from fyt.utils.query import TrueIf, pks
 
 
 # TODO: refactor grade choices to query off the Volunteer
@@ -44,8 +47,14 @@ class NotEqual(Lookup):
 
 class BaseVolunteerManager(models.Manager):
     def get_queryset(self):
+        """
+        The search document and vector are large and only used by ``search``,
+        so they are not loaded unless accessed.
+        """
         qs = super().get_queryset()
-        return qs.select_related('applicant', 'croo_supplement', 'leader_supplement')
+        return qs.select_related(
+            'applicant', 'croo_supplement', 'leader_supplement'
+        ).defer('search_document', 'search_vector')
 
     def prospective_leaders_for_trip(self, trip):
         """
@@ -127,27 +136,67 @@ class BaseVolunteerManager(models.Manager):
 
     def score_progress(self, trips_year):
         """
-        Return a tuple containing the number of scores given so far for each
-        application and the total number of scores required to fully grade
-        all applications.
+        Return a dict containing the number of scores given so far and the
+        total number of scores required to fully grade all applications.
+
+        The progress is also broken down by application status, and for
+        croo applications which have been scored by a croo head. This
+        ignores scores more than NUM_SCORES per application.
 
-        This ignores scores more than NUM_SCORES per application.
+        The result is cached for SCORE_PROGRESS_TIMEOUT seconds since
+        graders reload the scoring pages constantly.
         """
+        key = 'score-progress:{}'.format(getattr(trips_year, 'pk', trips_year))
+        progress = cache.get(key)
+        if progress is None:
+            progress = self._score_progress(trips_year)
+            cache.set(key, progress, SCORE_PROGRESS_TIMEOUT)
+        return progress
+
+    def _score_progress(self, trips_year):
         NUM_SCORES = self.model.NUM_SCORES
+        scores = Least('score_count', V(NUM_SCORES))
+        croo = Q(croo_willing=True)
+
+        aggregates = {
+            'complete': Sum(scores),
+            'count': Count('pk'),
+            'croo_head_complete': Count(
+                'pk', filter=croo & Q(croo_head_score_count__gt=0)
+            ),
+            'croo_head_count': Count('pk', filter=croo),
+        }
+        for status, _ in self.model.STATUS_CHOICES:
+            aggregates[status + '_complete'] = Sum(scores, filter=Q(status=status))
+            aggregates[status + '_count'] = Count('pk', filter=Q(status=status))
 
-        qs = self.leader_or_croo_applications(trips_year)
+        totals = self.leader_or_croo_applications(trips_year).aggregate(**aggregates)
 
-        total = qs.count() * NUM_SCORES
+        def progress(prefix, required=NUM_SCORES):
+            return _progress(
+                totals[prefix + 'complete'] or 0, totals[prefix + 'count'] * required
+            )
 
-        complete = sum(
-            min(x.scores__count, NUM_SCORES) for x in qs.annotate(Count('scores'))
+        return dict(
+            progress(''),
+            by_status=OrderedDict(
+                (status, progress(status + '_'))
+                for status, _ in self.model.STATUS_CHOICES
+            ),
+            croo_head=progress('croo_head_', required=1),
         )
 
-        return {
-            'complete': complete,
-            'total': total,
-            'percentage': round(complete / total * 100) if total else 100,
-        }
+
+# Seconds to cache score progress for
+SCORE_PROGRESS_TIMEOUT = 5
+
+
+def _progress(complete, total):
+    return {
+        'complete': complete,
+        'total': total,
+        'percentage': round(complete / total * 100) if total else 100,
+    }
 
 
 class VolunteerQuerySet(models.QuerySet):
@@ -161,25 +210,81 @@ class VolunteerQuerySet(models.QuerySet):
 
     def with_avg_scores(self):
         """
-        Annotate the queryset with average scores.
+        Annotate the queryset with normalized average scores.
 
-        Scores are coalesced into the normalized attribute so that, when
-        ordering on Postgres, null values come after the actual scores.
-        Note that this issue won't appear on a dev sqlite database.
+        The averages are stored on the application; they are coalesced into
+        the normalized attribute so that, when ordering on Postgres, null
+        values come after the actual scores. Note that this issue won't
+        appear on a dev sqlite database.
         """
         return self.annotate(
-            avg_leader_score=Avg('scores__leader_score__value'),
-            avg_croo_score=Avg('scores__croo_score__value'),
-        ).annotate(
             norm_avg_leader_score=Coalesce('avg_leader_score', V(0.0)),
             norm_avg_croo_score=Coalesce('avg_croo_score', V(0.0)),
-        # Silence deprecation warning caused by
-        # https://docs.djangoproject.com/en/2.2/releases/2.2/#model-meta-ordering-will-no-longer-affect-group-by-queries
-        ).order_by(*self.model._meta.ordering)
+        )
 
-    def first_aid_complete(self):
+    def search(self, text):
         """
-        All volunteers with complete first aid certifications.
+        Full-text search of the answers and leader supplements of the
+        applications, ordered by relevance.
+
+        Annotates ``search_rank`` and ``search_snippet``, the matching parts
+        of the application with the matches marked.
+        """
+        from fyt.applications.search import SEARCH_CONFIG, Headline
+
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        return (
+            self.filter(search_vector=query)
+            .annotate(
+                search_rank=SearchRank(F('search_vector'), query),
+                search_snippet=Headline(F('search_document'), query),
+            )
+            .order_by('-search_rank', 'pk')
+        )
+
+    def with_questions_answered(self):
+        """
+        Annotate whether all the required leader and croo questions have
+        been answered, as ``leader_questions_answered`` and
+        ``croo_questions_answered``.
+
+        Each question is answered at most once, so this compares the number
+        of required questions with the number of non-blank answers to them.
+        """
+        from fyt.applications.models import Answer, Question
+
+        def count(qs, group_by):
+            qs = qs.order_by().values(group_by).annotate(count=Count('pk'))
+            return Coalesce(
+                Subquery(qs.values('count'), output_field=models.IntegerField()), V(0),
+            )
+
+        counts = {}
+        answered = {}
+        for type in [Question.LEADER, Question.CROO]:
+            types = [Question.ALL, type]
+            required_count = f'{type.lower()}_required_count'
+            answered_count = f'{type.lower()}_answered_count'
+
+            required = Question.objects.filter(
+                trips_year=OuterRef('trips_year'), type__in=types
+            )
+            answers = Answer.objects.filter(
+                application=OuterRef('pk'), question__type__in=types
+            ).exclude(answer='')
+
+            counts[required_count] = count(required, 'trips_year')
+            counts[answered_count] = count(answers, 'application')
+            answered[f'{type.lower()}_questions_answered'] = TrueIf(
+                **{f'{answered_count}__gte': F(required_count)}
+            )
+
+        return self.annotate(**counts).annotate(**answered)
+
+    def with_first_aid(self):
+        """
+        Annotate whether each volunteer has complete first aid
+        certifications, as ``first_aid_verified``.
 
         Complete certifications means a *verified* CPR certification, and
         a *verified* first aid certification, of some sort.
@@ -192,21 +297,58 @@ class VolunteerQuerySet(models.QuerySet):
             if k not in [FirstAidCertification.CPR, None]
         ]
 
-        return self.filter(
-            first_aid_certifications__name=FirstAidCertification.CPR,
-            first_aid_certifications__verified=True,
-        ).filter(
-            first_aid_certifications__name__in=non_cpr_options,
-            first_aid_certifications__verified=True,
+        verified = FirstAidCertification.objects.filter(
+            volunteer=OuterRef('pk'), verified=True
         )
 
+        return self.annotate(
+            has_verified_cpr=Exists(verified.filter(name=FirstAidCertification.CPR)),
+            has_verified_first_aid=Exists(verified.filter(name__in=non_cpr_options)),
+        ).annotate(
+            first_aid_verified=TrueIf(
+                has_verified_cpr=True, has_verified_first_aid=True
+            )
+        )
+
+    def with_completeness(self):
+        """
+        Annotate the completeness of each application.
+
+        This adds the annotations of ``with_questions_answered`` and
+        ``with_first_aid``, plus ``leader_complete``, ``croo_complete`` and
+        ``extension_active``. All of them are computed in the same query, and
+        the corresponding Volunteer properties use them instead of querying
+        each application separately.
+        """
+        return (
+            self.with_questions_answered()
+            .with_first_aid()
+            .annotate(
+                leader_complete=TrueIf(
+                    leader_willing=True, leader_questions_answered=True
+                ),
+                croo_complete=TrueIf(croo_willing=True, croo_questions_answered=True),
+                extension_active=TrueIf(deadline_extension__gt=timezone.now()),
+            )
+        )
+
+    def first_aid_complete(self):
+        """
+        All volunteers with complete first aid certifications.
+        """
+        qs = self
+        if 'first_aid_verified' not in qs.query.annotations:
+            qs = qs.with_first_aid()
+        return qs.filter(first_aid_verified=True)
+
     def first_aid_incomplete(self):
         """
         All volunteers missing first aid certifications.
         """
-        return self.exclude(
-            pk__in=self.model.objects.first_aid_complete().values_list('pk')
-        )
+        qs = self
+        if 'first_aid_verified' not in qs.query.annotations:
+            qs = qs.with_first_aid()
+        return qs.filter(first_aid_verified=False)
 
 
 VolunteerManager = BaseVolunteerManager.from_queryset(VolunteerQuerySet)
@@ -235,57 +377,18 @@ class GraderQuerySet(models.QuerySet):
     def with_statistics(self, trips_year):
         """
         Return all users who have scored applications this year.
-        """
-        LEADER_SCORE_LOOKUP = 'scores_for_year__leader_score'
-        CROO_SCORE_LOOKUP = 'scores_for_year__croo_score'
-
-        qs = (
-            self.annotate(
-                scores_for_year=FilteredRelation(
-                    'scores', condition=Q(scores__trips_year=trips_year)
-                )
-            )
-            .filter(scores_for_year__isnull=False)
-            .distinct()
-            .annotate(
-                score_count=Count('scores_for_year'),
-                avg_leader_score=Avg(LEADER_SCORE_LOOKUP + '__value'),
-                avg_croo_score=Avg(CROO_SCORE_LOOKUP + '__value'),
-            )
-        )
-
-        qs = qs._annotate_score_counts(LEADER_SCORE_LOOKUP, trips_year)
-        qs = qs._annotate_score_counts(CROO_SCORE_LOOKUP, trips_year)
-        qs = qs._attach_histogram(
-            'leader_score_histogram', LEADER_SCORE_LOOKUP, trips_year
-        )
-        qs = qs._attach_histogram('croo_score_histogram', CROO_SCORE_LOOKUP, trips_year)
-
-        return qs
-
-    def _annotate_score_counts(self, score_lookup, trips_year):
-        values = score_values(trips_year)
-        return self.annotate(
-            **{
-                _bin(score_lookup, value): Count(
-                    'scores_for_year', filter=Q(**{score_lookup: value})
-                )
-                for value in values
-            }
-        )
 
-    def _attach_histogram(self, histogram_name, score_lookup, trips_year):
-        values = score_values(trips_year)
-        for grader in self:
-            setattr(
-                grader,
-                histogram_name,
-                OrderedDict(
-                    (value, getattr(grader, _bin(score_lookup, value.value)))
-                    for value in values
-                ),
-            )
-        return self
+        Each grader has ``score_count``, ``avg_leader_score``,
+        ``avg_croo_score``, ``leader_score_histogram`` and
+        ``croo_score_histogram`` attributes. The statistics are cached until
+        a score is changed.
+        """
+        statistics = grader_statistics(trips_year)
+        graders = list(self.filter(pk__in=statistics))
+        for grader in graders:
+            for attr, value in statistics[grader.pk].items():
+                setattr(grader, attr, value)
+        return graders
 
 
 GraderManager = BaseGraderManager.from_queryset(GraderQuerySet)
@@ -297,8 +400,65 @@ def score_values(trips_year):
     return ScoreValue.objects.filter(trips_year=trips_year)
 
 
-def _bin(score_lookup, x):
-    return '{}_{}'.format(score_lookup, str(x).replace('.', '_'))
+def grader_statistics(trips_year):
+    """
+    Return a dict of grader pk -> scoring statistics for ``trips_year``.
+
+    The scores are counted in a single query, grouped by grader and the
+    values of the leader and croo scores.
+    """
+    from .models import Score, ScoreValue
+
+    key = 'grader-statistics:{}:{}'.format(
+        getattr(trips_year, 'pk', trips_year),
+        data_version(trips_year, Score, ScoreValue),
+    )
+    statistics = cache.get(key)
+    if statistics is not None:
+        return statistics
+
+    values = {value.value: value for value in score_values(trips_year)}
+
+    def empty_histogram():
+        return OrderedDict((value, 0) for value in values.values())
+
+    totals = defaultdict(
+        lambda: {
+            'score_count': 0,
+            'leader': [0, 0],
+            'croo': [0, 0],
+            'leader_score_histogram': empty_histogram(),
+            'croo_score_histogram': empty_histogram(),
+        }
+    )
+
+    groups = (
+        Score.objects.filter(trips_year=trips_year)
+        .order_by()
+        .values_list('grader', 'leader_score__value', 'croo_score__value')
+        .annotate(count=Count('pk'))
+    )
+
+    for grader, leader_score, croo_score, count in groups:
+        stats = totals[grader]
+        stats['score_count'] += count
+        for kind, score in [('leader', leader_score), ('croo', croo_score)]:
+            if score is None:
+                continue
+            if score in values:
+                stats[kind + '_score_histogram'][values[score]] += count
+            stats[kind][0] += score * count
+            stats[kind][1] += count
+
+    statistics = {}
+    for grader, stats in totals.items():
+        for kind in ['leader', 'croo']:
+            total, count = stats.pop(kind)
+            stats['avg_{}_score'.format(kind)] = total / count if count else None
+        statistics[grader] = stats
+
+    cache.set(key, statistics)
+    return statistics
 
 
 class ScoreQuerySet(models.QuerySet):
@@ -322,24 +482,205 @@ class ScoreClaimQuerySet(models.QuerySet):
         deadline and for which the user has not already scored or skipped
         the application.
         """
+        return self.filter(
+            resolved=False, claimed_at__gt=(timezone.now() - self.model.HOLD_DURATION),
+        )
+
+    def inactive(self):
+        """
+        Claims which have expired or been resolved.
+        """
+        return self.filter(
+            Q(resolved=True)
+            | Q(claimed_at__lte=(timezone.now() - self.model.HOLD_DURATION))
+        )
+
+    def resolve(self, grader, application):
+        """
+        Mark the claims of ``grader`` on ``application`` as resolved if the
+        grader has scored or skipped the application, and as unresolved
+        otherwise.
+        """
         from .models import Score, Skip
 
-        return (
-            self.filter(claimed_at__gt=(timezone.now() - self.model.HOLD_DURATION))
+        lookup = {'grader': grader, 'application': application}
+        resolved = (
+            Score.objects.filter(**lookup).exists()
+            or Skip.objects.filter(**lookup).exists()
+        )
+        return self.filter(**lookup).update(resolved=resolved)
+
+    def sweep(self):
+        """
+        Delete all inactive claims. Returns the number of claims deleted.
+        """
+        return self.inactive().delete()[0]
+
+
+class ScoreQueueQuerySet(models.QuerySet):
+    def refresh(self, application, create=False):
+        """
+        Recompute the queue entry for ``application`` from its scores and
+        active claims.
+
+        The entry is only created if ``create`` is True; otherwise
+        applications without an entry are ignored.
+        """
+        from .models import Score, ScoreClaim
+
+        NUM_SCORES = application.NUM_SCORES
+
+        scores = Score.objects.filter(application=application).aggregate(
+            total=Count('pk'), croo_head=Count('pk', filter=Q(croo_head=True))
+        )
+        claims = (
+            ScoreClaim.objects.active()
+            .filter(application=application)
+            .aggregate(
+                total=Count('pk'),
+                croo_head=Count('pk', filter=Q(croo_head=True)),
+                first_claimed_at=Min('claimed_at'),
+            )
+        )
+
+        submitted = application.submitted is not None
+        croo_application = submitted and application.croo_willing
+        croo_head_needed = (
+            croo_application and scores['croo_head'] == 0 and claims['croo_head'] == 0
+        )
+        priority = scores['total'] + claims['total']
+
+        values = {
+            'trips_year_id': application.trips_year_id,
+            'pending': (
+                submitted
+                and application.status == application.PENDING
+                and (application.leader_willing or application.croo_willing)
+            ),
+            'available_at': application.deadline_extension,
+            'croo_application': croo_application,
+            'score_count': scores['total'],
+            'croo_head_score_count': scores['croo_head'],
+            'claim_count': claims['total'],
+            'croo_head_claim_count': claims['croo_head'],
+            'claims_expire_at': (
+                claims['first_claimed_at'] + ScoreClaim.HOLD_DURATION
+                if claims['first_claimed_at']
+                else None
+            ),
+            'croo_head_needed': croo_head_needed,
+            'priority': priority,
+            'reserved_for_croo_head': (croo_head_needed and priority >= NUM_SCORES - 1),
+        }
+
+        if create:
+            self.update_or_create(application=application, defaults=values)
+        else:
+            self.filter(application=application).update(**values)
+
+    def add_claim(self, entry, claim):
+        """
+        Count a new ``claim`` on ``entry``, which must be locked.
+
+        This is equivalent to ``refresh``, without recounting the scores and
+        claims of the application.
+        """
+        from .models import Volunteer
+
+        entry.claim_count += 1
+        entry.croo_head_claim_count += claim.croo_head
+        entry.claims_expire_at = entry.claims_expire_at or claim.expires_at
+        entry.croo_head_needed = entry.croo_head_needed and not claim.croo_head
+        entry.priority += 1
+        entry.reserved_for_croo_head = (
+            entry.croo_head_needed and entry.priority >= Volunteer.NUM_SCORES - 1
+        )
+
+        self.filter(pk=entry.pk).update(
+            claim_count=entry.claim_count,
+            croo_head_claim_count=entry.croo_head_claim_count,
+            claims_expire_at=entry.claims_expire_at,
+            croo_head_needed=entry.croo_head_needed,
+            priority=entry.priority,
+            reserved_for_croo_head=entry.reserved_for_croo_head,
+        )
+
+    def refresh_expired(self):
+        """
+        Release the slots held by claims which have expired since the
+        entries were last written.
+
+        Entries are also refreshed when they are handed out by
+        ``next_for``; this is run by the ``sweep_score_claims`` command so
+        that the counts shown elsewhere are up to date.
+        """
+        expired = self.filter(claims_expire_at__lte=timezone.now()).select_related(
+            'application'
+        )
+
+        for entry in expired:
+            self.refresh(entry.application)
+        return len(expired)
+
+    def available_to(self, grader, trips_year):
+        """
+        Entries which ``grader`` can score, in the order they should be
+        scored.
+
+        Croo heads are given croo applications which still need a croo head
+        score first. Everyone else leaves the last open score on those
+        applications for a croo head.
+
+        Entries whose claims have expired since they were written are
+        included, and ranked by their scores alone; ``next_for`` refreshes
+        them before handing them out.
+        """
+        from .models import Volunteer
+
+        expired = Q(claims_expire_at__lte=timezone.now())
+        qs = (
+            self.filter(trips_year=trips_year, pending=True)
+            .filter(Q(priority__lt=Volunteer.NUM_SCORES) | expired)
+            .filter(Q(available_at__isnull=True) | Q(available_at__lte=timezone.now()))
+            .exclude(application__scores__grader=grader)
+            .exclude(application__skips__grader=grader)
             .annotate(
-                # Has the grader already added a score for this claim?
-                already_scored=Exists(
-                    Score.objects.filter(
-                        application=OuterRef('application'), grader=OuterRef('grader')
-                    )
-                ),
-                # Has the grader already skipped this claim?
-                already_skipped=Exists(
-                    Skip.objects.filter(
-                        application=OuterRef('application'), grader=OuterRef('grader')
-                    )
-                ),
+                current_priority=Case(
+                    When(expired, then=F('score_count')),
+                    default=F('priority'),
+                    output_field=models.IntegerField(),
+                )
             )
-            .exclude(already_scored=True)
-            .exclude(already_skipped=True)
         )
+
+        if grader.is_croo_head:
+            return qs.order_by(
+                '-croo_head_needed', 'current_priority', 'application_id'
+            )
+
+        return qs.filter(Q(reserved_for_croo_head=False) | expired).order_by(
+            'current_priority', 'application_id'
+        )
+
+    def next_for(self, grader, trips_year, lock=False):
+        """
+        Return the entry that ``grader`` should score next, or None.
+
+        With ``lock``, the entry is locked until the end of the transaction
+        and entries locked by other graders are skipped, so that concurrent
+        graders are never handed the same open score.
+
+        An entry whose claims have expired is refreshed first, and the
+        next entry is looked up again.
+        """
+        qs = self.available_to(grader, trips_year).select_related('application')
+        if lock:
+            qs = qs.select_for_update(skip_locked=True, of=('self',))
+
+        while True:
+            entry = qs.first()
+            if entry is None or entry.claims_expire_at is None:
+                return entry
+            if entry.claims_expire_at > timezone.now():
+                return entry
+            self.refresh(entry.application)
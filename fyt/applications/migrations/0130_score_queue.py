@@ -0,0 +1,118 @@
+# Generated by Django 2.2.6 on 2026-10-19 01:25
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+import django.db.models.deletion
+
+
+NUM_SCORES = 3
+HOLD_DURATION = timedelta(hours=2)
+
+
+def fill_score_queue(apps, schema_editor):
+    Volunteer = apps.get_model('applications', 'Volunteer')
+    Score = apps.get_model('applications', 'Score')
+    ScoreClaim = apps.get_model('applications', 'ScoreClaim')
+    ScoreQueueEntry = apps.get_model('applications', 'ScoreQueueEntry')
+
+    claims = ScoreClaim.objects.filter(
+        claimed_at__gt=timezone.now() - HOLD_DURATION, application=OuterRef('pk')
+    ).order_by()
+    scores = Score.objects.filter(application=OuterRef('pk')).order_by()
+
+    def count(qs):
+        qs = qs.values('application').annotate(count=Count('pk')).values('count')
+        return Coalesce(Subquery(qs, output_field=models.IntegerField()), 0)
+
+    applications = Volunteer.objects.annotate(
+        score_total=count(scores),
+        score_croo_head=count(scores.filter(croo_head=True)),
+        claim_total=count(claims),
+        claim_croo_head=count(claims.filter(croo_head=True)),
+        first_claimed_at=Subquery(
+            claims.order_by('claimed_at').values('claimed_at')[:1]
+        ),
+    )
+
+    entries = []
+    for application in applications.iterator():
+        submitted = application.submitted is not None
+        croo_application = submitted and application.croo_willing
+        croo_head_needed = (
+            croo_application
+            and application.score_croo_head == 0
+            and application.claim_croo_head == 0
+        )
+        priority = application.score_total + application.claim_total
+        entries.append(
+            ScoreQueueEntry(
+                trips_year_id=application.trips_year_id,
+                application_id=application.pk,
+                pending=(
+                    submitted
+                    and application.status == 'PENDING'
+                    and (application.leader_willing or application.croo_willing)
+                ),
+                available_at=application.deadline_extension,
+                croo_application=croo_application,
+                score_count=application.score_total,
+                croo_head_score_count=application.score_croo_head,
+                claim_count=application.claim_total,
+                croo_head_claim_count=application.claim_croo_head,
+                claims_expire_at=(
+                    application.first_claimed_at + HOLD_DURATION
+                    if application.first_claimed_at
+                    else None
+                ),
+                croo_head_needed=croo_head_needed,
+                priority=priority,
+                reserved_for_croo_head=(
+                    croo_head_needed and priority >= NUM_SCORES - 1
+                ),
+            )
+        )
+
+    ScoreQueueEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20180719_1052'),
+        ('applications', '0129_auto_20190214_1754'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreQueueEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pending', models.BooleanField(default=False)),
+                ('available_at', models.DateTimeField(null=True)),
+                ('croo_application', models.BooleanField(default=False)),
+                ('score_count', models.PositiveSmallIntegerField(default=0)),
+                ('croo_head_score_count', models.PositiveSmallIntegerField(default=0)),
+                ('claim_count', models.PositiveSmallIntegerField(default=0)),
+                ('croo_head_claim_count', models.PositiveSmallIntegerField(default=0)),
+                ('claims_expire_at', models.DateTimeField(null=True)),
+                ('croo_head_needed', models.BooleanField(default=False)),
+                ('reserved_for_croo_head', models.BooleanField(default=False)),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('application', models.OneToOneField(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='score_queue_entry', to='applications.Volunteer')),
+                ('trips_year', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='core.TripsYear')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='scorequeueentry',
+            index=models.Index(fields=['trips_year', 'pending', 'priority'], name='application_trips_y_bf49bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scorequeueentry',
+            index=models.Index(fields=['trips_year', 'claims_expire_at'], name='application_trips_y_630c8d_idx'),
+        ),
+        migrations.RunPython(fill_score_queue, migrations.RunPython.noop),
+    ]
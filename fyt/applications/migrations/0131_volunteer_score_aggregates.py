@@ -0,0 +1,66 @@
+# Generated by Django 2.2.6 on 2026-10-19 01:37
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Q
+
+
+def fill_score_aggregates(apps, schema_editor):
+    Volunteer = apps.get_model('applications', 'Volunteer')
+    Score = apps.get_model('applications', 'Score')
+
+    aggregates = (
+        Score.objects.order_by()
+        .values('application')
+        .annotate(
+            avg_leader_score=Avg('leader_score__value'),
+            avg_croo_score=Avg('croo_score__value'),
+            score_count=Count('pk'),
+            croo_head_score_count=Count('pk', filter=Q(croo_head=True)),
+        )
+    )
+
+    applications = []
+    for row in aggregates:
+        application = Volunteer(pk=row.pop('application'))
+        for field, value in row.items():
+            if field.startswith('avg_') and value is not None:
+                value = float(value)
+            setattr(application, field, value)
+        applications.append(application)
+
+    Volunteer.objects.bulk_update(
+        applications,
+        ['avg_leader_score', 'avg_croo_score', 'score_count', 'croo_head_score_count'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0130_score_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='volunteer',
+            name='avg_croo_score',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='avg_leader_score',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='croo_head_score_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='score_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_score_aggregates, migrations.RunPython.noop),
+    ]
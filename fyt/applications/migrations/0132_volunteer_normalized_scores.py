@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-19 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0131_volunteer_score_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='volunteer',
+            name='normalized_croo_score',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='normalized_leader_score',
+            field=models.FloatField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.6 on 2026-10-19 02:01
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def resolve_claims(apps, schema_editor):
+    ScoreClaim = apps.get_model('applications', 'ScoreClaim')
+    Score = apps.get_model('applications', 'Score')
+    Skip = apps.get_model('applications', 'Skip')
+
+    def matching(model):
+        return Exists(
+            model.objects.filter(
+                application=OuterRef('application'), grader=OuterRef('grader')
+            )
+        )
+
+    ScoreClaim.objects.annotate(
+        scored=matching(Score), skipped=matching(Skip)
+    ).filter(models.Q(scored=True) | models.Q(skipped=True)).update(resolved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0132_volunteer_normalized_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scoreclaim',
+            name='resolved',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='scoreclaim',
+            index=models.Index(fields=['grader', 'claimed_at'], name='application_grader__8f921c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scoreclaim',
+            index=models.Index(fields=['application', 'claimed_at'], name='application_applica_ee3963_idx'),
+        ),
+        migrations.RunPython(resolve_claims, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.6 on 2026-10-19 02:15
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+SEARCH_CONFIG = 'english'
+
+LEADER_SUPPLEMENT_FIELDS = [
+    'relevant_experience',
+    'co_leader',
+    'paddling_experience',
+    'climbing_experience',
+    'biking_experience',
+    'bike_maintenance_experience',
+    'hiking_experience',
+]
+
+
+def build_search_index(apps, schema_editor):
+    Volunteer = apps.get_model('applications', 'Volunteer')
+    LeaderSupplement = apps.get_model('applications', 'LeaderSupplement')
+
+    applications = list(
+        Volunteer.objects.select_related('leader_supplement').prefetch_related(
+            'answer_set'
+        )
+    )
+    for application in applications:
+        texts = [answer.answer for answer in application.answer_set.all()]
+        try:
+            supplement = application.leader_supplement
+        except LeaderSupplement.DoesNotExist:
+            pass
+        else:
+            texts += [getattr(supplement, field) for field in LEADER_SUPPLEMENT_FIELDS]
+        application.search_document = '\n\n'.join(filter(None, texts))
+
+    Volunteer.objects.bulk_update(applications, ['search_document'], batch_size=500)
+    Volunteer.objects.update(
+        search_vector=SearchVector('search_document', config=SEARCH_CONFIG)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0133_score_claim_resolved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='volunteer',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='volunteer',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='volunteer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='application_search__5c91f2_gin'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
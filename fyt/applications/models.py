@@ -1,22 +1,11 @@
-import random
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import (
-    F,
-    Q,
-    Avg,
-    Case,
-    Count,
-    Exists,
-    Min,
-    OuterRef,
-    Subquery,
-    Value as V,
-    When,
-)
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q, Avg, Count
 from django.utils import timezone
 from django.utils.functional import cached_property
 
@@ -25,6 +14,7 @@ from .managers import (
     QuestionManager,
     ScoreClaimQuerySet,
     ScoreQuerySet,
+    ScoreQueueQuerySet,
     VolunteerManager,
 )
 
@@ -32,10 +22,10 @@ from fyt.core.models import DatabaseModel, TripsYear
 from fyt.croos.models import Croo
 from fyt.trips.models import Section, Trip, TripType
 from fyt.users.models import DartmouthUser
+from fyt.utils.cache import bump_data_version
 from fyt.utils.choices import AVAILABLE, NOT_AVAILABLE, PREFER, TSHIRT_SIZE_CHOICES
 from fyt.utils.model_fields import NullYesNoField, YesNoField
 from fyt.utils.models import MedicalMixin
-from fyt.utils.query import TrueIf, pks
 
 
 """
@@ -248,6 +238,7 @@ class Volunteer(MedicalMixin, DatabaseModel):
     class Meta:
         ordering = ['applicant']
         unique_together = ['trips_year', 'applicant']
+        indexes = [GinIndex(fields=['search_vector'])]
 
     # We handle this validation outside the normal Django model/form
     # validation machinery so that users can save an incomplete application
@@ -299,6 +290,20 @@ class Volunteer(MedicalMixin, DatabaseModel):
     # Maximum number of scores for an application
     NUM_SCORES = 3
 
+    # Columns which are maintained by queryset updates when scores, answers
+    # and the leader supplement change. Saving an application never writes
+    # them, since the copy loaded with the application may be out of date.
+    DENORMALIZED_FIELDS = [
+        'avg_leader_score',
+        'avg_croo_score',
+        'score_count',
+        'croo_head_score_count',
+        'normalized_leader_score',
+        'normalized_croo_score',
+        'search_document',
+        'search_vector',
+    ]
+
     objects = VolunteerManager()
 
     PENDING = 'PENDING'
@@ -371,6 +376,23 @@ class Volunteer(MedicalMixin, DatabaseModel):
     )
     safety_lead = models.BooleanField(default=False)  # TODO: remove?
 
+    # Score aggregates, maintained by ``update_score_aggregates`` whenever a
+    # Score is saved or deleted.
+    avg_leader_score = models.FloatField(null=True, editable=False)
+    avg_croo_score = models.FloatField(null=True, editable=False)
+    score_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    croo_head_score_count = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    # Scores adjusted for harsh and lenient graders. These are recomputed
+    # for the whole year by ``fyt.applications.normalization``.
+    normalized_leader_score = models.FloatField(null=True, editable=False)
+    normalized_croo_score = models.FloatField(null=True, editable=False)
+
+    # Answers and leader supplement text, maintained for full-text search
+    # by ``fyt.applications.search``.
+    search_document = models.TextField(blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     # ----- general information, not shown to graders ------
     class_year = ClassYearField(blank=True, null=True)
 
@@ -546,7 +568,13 @@ class Volunteer(MedicalMixin, DatabaseModel):
         """
         Returns True if all the required dynamic questions are answered, for
         the given type of question.
+
+        Uses the annotation from ``VolunteerQuerySet.with_questions_answered``
+        if this application was loaded with it.
         """
+        annotation = '{}_questions_answered'.format(type.lower())
+        if annotation in self.__dict__:
+            return self.__dict__[annotation]
         return all(self.answered_questions(type).values())
 
     def answered_questions(self, type):
@@ -601,6 +629,27 @@ class Volunteer(MedicalMixin, DatabaseModel):
     def croo_application_submitted(self):
         return self.croo_willing and self.submitted is not None
 
+    def save(self, **kwargs):
+        """
+        Save every field except the ``DENORMALIZED_FIELDS``, unless the
+        application is new or ``update_fields`` is given.
+        """
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+                and field.attname not in deferred
+            ]
+
+        return super().save(**kwargs)
+
     def answer_question(self, question, text):
         """
         Utility function to answer a question; mainly used for testing.
@@ -613,19 +662,43 @@ class Volunteer(MedicalMixin, DatabaseModel):
     def get_available_trips(self):
         return self.leader_supplement.get_available_trips()
 
-    @cached_property
-    def _average_scores(self):
-        return self.scores.aggregate(
-            models.Avg('leader_score__value'), models.Avg('croo_score__value')
-        )
-
     def average_leader_score(self):
         """Average leader score."""
-        return self._average_scores['leader_score__value__avg']
+        return self.avg_leader_score
 
     def average_croo_score(self):
         """Average croo score."""
-        return self._average_scores['croo_score__value__avg']
+        return self.avg_croo_score
+
+    @transaction.atomic
+    def update_score_aggregates(self):
+        """
+        Recompute the stored score averages and counts.
+
+        The application row is locked first so that concurrent scores can't
+        overwrite each other's aggregates.
+        """
+        list(
+            Volunteer.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list('pk', flat=True)
+        )
+
+        aggregates = Score.objects.filter(application=self).aggregate(
+            avg_leader_score=Avg('leader_score__value'),
+            avg_croo_score=Avg('croo_score__value'),
+            score_count=Count('pk'),
+            croo_head_score_count=Count('pk', filter=Q(croo_head=True)),
+        )
+        for field in ['avg_leader_score', 'avg_croo_score']:
+            if aggregates[field] is not None:
+                aggregates[field] = float(aggregates[field])
+
+        Volunteer.objects.filter(pk=self.pk).update(**aggregates)
+        bump_data_version(self.trips_year_id, Volunteer)
+
+        for field, value in aggregates.items():
+            setattr(self, field, value)
 
     def first_aid_certifications_str(self):
         """Return a string of the volunteer's medical certifications.
@@ -643,13 +716,18 @@ class Volunteer(MedicalMixin, DatabaseModel):
 
     @property
     def first_aid_complete(self):
+        if 'first_aid_verified' in self.__dict__:
+            return self.first_aid_verified
         return Volunteer.objects.first_aid_complete().filter(pk=self.pk).exists()
 
     def within_deadline_extension(self):
         """
         Return True if the extended deadline has not passed.
         """
-        return Volunteer.objects.filter(pk=self.pk).within_deadline_extension().exists()
+        return (
+            self.deadline_extension is not None
+            and self.deadline_extension > timezone.now()
+        )
 
     def __str__(self):
         return self.name
@@ -986,9 +1064,13 @@ class Score(DatabaseModel):
                 {'croo_score': 'Score is required for croo applications'}
             )
 
+    @transaction.atomic
     def save(self, **kwargs):
         """
         Set croo_head.
+
+        Saving is atomic so that the aggregates stored on the application are
+        updated in the same transaction; see ``fyt.applications.signals``.
         """
         if self.pk is None:
             self.croo_head = self.grader.is_croo_head
@@ -1096,6 +1178,10 @@ class ScoreClaim(DatabaseModel):
     class Meta:
         ordering = ['claimed_at']
         unique_together = ['grader', 'application']
+        indexes = [
+            models.Index(fields=['grader', 'claimed_at']),
+            models.Index(fields=['application', 'claimed_at']),
+        ]
 
     grader = models.ForeignKey(
         'Grader', editable=False, related_name='score_claims', on_delete=models.CASCADE
@@ -1107,6 +1193,8 @@ class ScoreClaim(DatabaseModel):
         'is the grader a croo head?', default=False, editable=False
     )
     claimed_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Set once the grader has scored or skipped the application
+    resolved = models.BooleanField(default=False, editable=False)
 
     objects = ScoreClaimQuerySet.as_manager()
 
@@ -1177,7 +1265,7 @@ class Grader(DartmouthUser):
         claim, _ = ScoreClaim.objects.update_or_create(
             grader=self,
             application=application,
-            trips_year=application.trips_year,
+            trips_year_id=application.trips_year_id,
             defaults={'claimed_at': timezone.now()},
         )
         return claim
@@ -1215,14 +1303,22 @@ class Grader(DartmouthUser):
             'croo_score__value__avg'
         ]
 
+    @transaction.atomic
     def claim_next_to_score(self):
         """
         Find the next available application to score, and claim it.
 
-        Note that there is a race condition here. In the case of duplicated
-        POST requests, it is possible for a grader to get two active claims
-        for different applications.
+        Requests by the same grader are serialized by locking the grader, so
+        duplicated POST requests can't claim two applications. Other graders
+        skip the application while it is being claimed.
+
+        A new claim is inserted without signals, and counted on the locked
+        queue entry instead of recounting the claims of the application.
+        Entries holding expired claims are refreshed by ``next_for`` when
+        they come up.
         """
+        Grader.objects.select_for_update().get(pk=self.pk)
+
         claim = self.current_claim()
         if claim is not None:
             # Update the claim time - this is for the case in which a grader
@@ -1232,13 +1328,30 @@ class Grader(DartmouthUser):
             self.claim_score(claim.application)
             return claim.application
 
-        application = self.next_to_score()
+        entry = ScoreQueueEntry.objects.next_for(
+            self, TripsYear.objects.current(), lock=True
+        )
 
-        if application is None:
+        if entry is None:
             return None
 
-        self.claim_score(application)
-        return application
+        claim = ScoreClaim(
+            trips_year_id=entry.trips_year_id,
+            grader=self,
+            application=entry.application,
+            croo_head=self.is_croo_head,
+        )
+        try:
+            with transaction.atomic():
+                ScoreClaim.objects.bulk_create([claim])
+        except IntegrityError:
+            # An expired claim on the application has not been swept yet
+            self.claim_score(entry.application)
+        else:
+            ScoreQueueEntry.objects.add_claim(entry, claim)
+            bump_data_version(entry.trips_year_id, ScoreClaim)
+
+        return entry.application
 
     def next_to_score(self):
         """
@@ -1260,64 +1373,60 @@ class Grader(DartmouthUser):
         * Applications with fewer scores are prioritized.
         * Applications claims are included when counting scores for the
           application.
+
+        See ``ScoreQueueEntry`` for how these are tracked.
         """
-        trips_year = TripsYear.objects.current()
+        entry = ScoreQueueEntry.objects.next_for(self, TripsYear.objects.current())
+        if entry is None:
+            return None
+        return entry.application
 
-        croo_app_pks = pks(Volunteer.objects.croo_applications(trips_year))
 
-        NUM_SCORES = Volunteer.NUM_SCORES
+class ScoreQueueEntry(DatabaseModel):
+    """
+    The scoring status of an application.
 
-        active_claims = (
-            ScoreClaim.objects.active().filter(application=OuterRef('pk')).values('pk')
-        )
+    There is one entry per application, which is updated whenever the
+    application, or a Score, ScoreClaim or Skip for the application, is
+    saved or deleted. Finding the next application to score is then a
+    single indexed query on this table.
+    """
 
-        active_croo_head_claims = active_claims.filter(croo_head=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['trips_year', 'pending', 'priority']),
+            models.Index(fields=['trips_year', 'claims_expire_at']),
+        ]
 
-        qs = (
-            Volunteer.objects.leader_or_croo_applications(trips_year=trips_year)
-            .exclude(pk__in=pks(Volunteer.objects.within_deadline_extension()))
-            .filter(status=Volunteer.PENDING)
-            .exclude(scores__grader=self)
-            .exclude(skips__grader=self)
-            .annotate(Count('scores'))
-            .annotate(active_claims_count=Count(Subquery(active_claims)))
-            .annotate(scores_and_claims=F('scores__count') + F('active_claims_count'))
-            .filter(scores_and_claims__lt=NUM_SCORES)
-            .annotate(
-                croo_head_scores_count=Count('pk', filter=Q(scores__croo_head=True)),
-                croo_head_claims_count=Count(Subquery(active_croo_head_claims)),
-                needs_croo_score=TrueIf(
-                    pk__in=croo_app_pks,
-                    croo_head_scores_count=0,
-                    croo_head_claims_count=0,
-                ),
-            )
-        )
+    application = models.OneToOneField(
+        Volunteer,
+        editable=False,
+        related_name='score_queue_entry',
+        on_delete=models.CASCADE,
+    )
 
-        # Croo head: try and pick a croo app which needs a croo head score
-        if self.is_croo_head:
-            needs_croo_head_score = qs.filter(needs_croo_score=True)
-            if needs_croo_head_score.exists():
-                qs = needs_croo_head_score
+    # Is the application submitted and still waiting for a decision?
+    pending = models.BooleanField(default=False)
+    # The application can't be scored until its deadline extension passes
+    available_at = models.DateTimeField(null=True)
+    croo_application = models.BooleanField(default=False)
 
-        # Otherwise, reserve one score on each app for a croo head
-        else:
-            qs = qs.filter(
-                scores_and_claims__lt=Case(
-                    When(needs_croo_score=True, then=V(NUM_SCORES - 1)),
-                    default=V(NUM_SCORES),
-                    output_field=models.IntegerField(),
-                )
-            )
+    score_count = models.PositiveSmallIntegerField(default=0)
+    croo_head_score_count = models.PositiveSmallIntegerField(default=0)
 
-        # Pick an app with least scores and claims
-        qs = qs.filter(
-            scores_and_claims=qs.aggregate(fewest=Min('scores_and_claims'))['fewest']
-        )
+    # Active claims, which hold a score until they expire
+    claim_count = models.PositiveSmallIntegerField(default=0)
+    croo_head_claim_count = models.PositiveSmallIntegerField(default=0)
+    claims_expire_at = models.DateTimeField(null=True)
 
-        if not qs.exists():
-            return None
+    # Croo applications need at least one score or claim by a croo head
+    croo_head_needed = models.BooleanField(default=False)
+    # The last open score is held back for a croo head
+    reserved_for_croo_head = models.BooleanField(default=False)
+    # Scores plus active claims; lower numbers are scored first
+    priority = models.PositiveSmallIntegerField(default=0)
 
-        # Manually choose random element because .order_by('?') is buggy
-        # See https://code.djangoproject.com/ticket/26390
-        return random.choice(qs)
+    objects = ScoreQueueQuerySet.as_manager()
+
+    def __str__(self):
+        return str(self.application)
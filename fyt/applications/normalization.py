@@ -0,0 +1,132 @@
+"""
+Per-grader normalization of application scores.
+
+Some graders score harshly and others leniently, which skews the raw
+averages. Each score is converted to a z-score relative to the other scores
+given by the same grader; the z-scores of an application are averaged and
+mapped back onto the scale of all scores given this year, so that normalized
+scores can be read like the raw ones.
+
+A full year is a few thousand scores, so this is recomputed in plain Python
+once a saved or deleted score is committed. Renormalizing touches many
+applications, so it runs in its own short transaction instead of the one
+which saved the score.
+"""
+from collections import defaultdict
+from statistics import mean, pstdev
+
+from django.db import connection, transaction
+
+from fyt.applications.models import Score, Volunteer
+from fyt.utils.cache import bump_data_version
+
+
+# Graders with fewer scores than this are compared against all scores from
+# the year, since there is too little data to tell how harsh they are.
+MIN_GRADER_SCORES = 5
+
+# Key of the advisory lock which serializes normalization of a year
+LOCK_KEY = 7301
+
+
+def _normalize(triples):
+    """
+    Normalize a list of (grader, application, value) triples.
+
+    Returns a dict of application -> normalized score.
+    """
+    if not triples:
+        return {}
+
+    overall = [value for _, _, value in triples]
+    overall_mean = mean(overall)
+    overall_std = pstdev(overall, overall_mean)
+
+    by_grader = defaultdict(list)
+    for grader, _, value in triples:
+        by_grader[grader].append(value)
+
+    stats = {}
+    for grader, values in by_grader.items():
+        if len(values) >= MIN_GRADER_SCORES:
+            grader_mean = mean(values)
+            stats[grader] = (grader_mean, pstdev(values, grader_mean))
+        else:
+            stats[grader] = (overall_mean, overall_std)
+
+    zscores = defaultdict(list)
+    for grader, application, value in triples:
+        grader_mean, grader_std = stats[grader]
+        zscores[application].append(
+            (value - grader_mean) / grader_std if grader_std else 0.0
+        )
+
+    return {
+        application: overall_mean + overall_std * mean(z)
+        for application, z in zscores.items()
+    }
+
+
+def normalize_scores(trips_year):
+    """
+    Recompute the normalized scores of every application in ``trips_year``.
+
+    Only applications whose normalized scores changed are written. They are
+    locked in pk order, so that normalization never deadlocks with another
+    transaction updating the same applications.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)', [LOCK_KEY, trips_year]
+            )
+        return _normalize_scores(trips_year)
+
+
+def _normalize_scores(trips_year):
+    leader_triples = []
+    croo_triples = []
+
+    scores = Score.objects.filter(trips_year=trips_year).values_list(
+        'grader', 'application', 'leader_score__value', 'croo_score__value'
+    )
+    for grader, application, leader_score, croo_score in scores:
+        if leader_score is not None:
+            leader_triples.append((grader, application, float(leader_score)))
+        if croo_score is not None:
+            croo_triples.append((grader, application, float(croo_score)))
+
+    leader_scores = _normalize(leader_triples)
+    croo_scores = _normalize(croo_triples)
+
+    applications = (
+        Volunteer.objects.filter(trips_year=trips_year)
+        .select_related(None)
+        .only('normalized_leader_score', 'normalized_croo_score')
+    )
+
+    changed = []
+    for application in applications:
+        leader_score = leader_scores.get(application.pk)
+        croo_score = croo_scores.get(application.pk)
+        if (
+            application.normalized_leader_score != leader_score
+            or application.normalized_croo_score != croo_score
+        ):
+            application.normalized_leader_score = leader_score
+            application.normalized_croo_score = croo_score
+            changed.append(application)
+
+    list(
+        Volunteer.objects.filter(pk__in=[application.pk for application in changed])
+        .select_related(None)
+        .order_by('pk')
+        .select_for_update()
+        .values_list('pk', flat=True)
+    )
+    Volunteer.objects.bulk_update(
+        changed, ['normalized_leader_score', 'normalized_croo_score']
+    )
+    if changed:
+        bump_data_version(trips_year, Volunteer)
+    return len(changed)
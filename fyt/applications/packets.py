@@ -0,0 +1,134 @@
+"""
+Anonymized packets of every submitted application, for reading offline.
+
+Applications are identified by number instead of by name, as they are when
+they are scored. The packets are rendered one application at a time, with
+answers and scores prefetched a chunk of applications at a time, so that
+memory use does not grow with the number of applications.
+"""
+import tempfile
+import zipfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from fyt.applications.models import Answer, Score, Volunteer
+from fyt.utils.query import chunked_iterator
+
+
+HTML = 'html'
+ZIP = 'zip'
+FORMATS = [HTML, ZIP]
+
+PAGE_TEMPLATE = 'applications/packets.html'
+APPLICATION_TEMPLATE = 'applications/_packet.html'
+FILE_TEMPLATE = 'applications/packet_file.html'
+
+# Marks where the applications go in the rendered page
+PLACEHOLDER = '<!-- packets -->'
+
+# Number of applications to prefetch answers and scores for at a time
+CHUNK_SIZE = 50
+
+
+def prefetch(show_scores):
+    lookups = [
+        Prefetch('answer_set', queryset=Answer.objects.select_related('question'))
+    ]
+    if show_scores:
+        lookups.append(
+            Prefetch('scores', queryset=Score.objects.prefetch_display_data())
+        )
+    return lookups
+
+
+def packet_applications(trips_year):
+    """
+    All submitted applications for ``trips_year``, in the order they were
+    submitted.
+    """
+    return (
+        Volunteer.objects.filter(trips_year=trips_year, submitted__isnull=False)
+        .select_related(None)
+        .order_by('submitted', 'pk')
+    )
+
+
+def render_applications(trips_year, show_scores=False):
+    """
+    Yield each application with its rendered packet. Scores are only
+    included if ``show_scores`` is True.
+    """
+    template = get_template(APPLICATION_TEMPLATE)
+    applications = chunked_iterator(
+        packet_applications(trips_year), *prefetch(show_scores), chunk_size=CHUNK_SIZE
+    )
+    for application in applications:
+        yield application, template.render(
+            {'application': application, 'show_scores': show_scores}
+        )
+
+
+def stream_packets(trips_year, show_scores=False, context=None, request=None):
+    """
+    Yield a page of the packets for ``trips_year``, one application at a
+    time.
+
+    ``context`` and ``request`` are used to render the page around the
+    packets.
+    """
+    context = dict(context or {}, packets=mark_safe(PLACEHOLDER))
+    page = render_to_string(PAGE_TEMPLATE, context, request=request)
+    head, tail = page.split(PLACEHOLDER)
+
+    yield head
+    for _, packet in render_applications(trips_year, show_scores):
+        yield packet
+    yield tail
+
+
+def write_zip(f, trips_year, show_scores=False):
+    """
+    Write a zip archive with a page for each application to the file ``f``.
+    """
+    template = get_template(FILE_TEMPLATE)
+    with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for application, packet in render_applications(trips_year, show_scores):
+            archive.writestr(
+                'application-{}.html'.format(application.pk),
+                template.render(
+                    {'application': application, 'packet': mark_safe(packet)}
+                ),
+            )
+
+
+def packet_path(trips_year, fmt, show_scores=False):
+    return 'packets/{}/applications{}.{}'.format(
+        trips_year.pk, '-scored' if show_scores else '', fmt
+    )
+
+
+def save_packets(trips_year, fmt=HTML, show_scores=False, storage=default_storage):
+    """
+    Render the application packets for ``trips_year`` to ``storage`` as a
+    single HTML page or a zip of pages, replacing any previously saved copy.
+
+    Returns the name of the saved file.
+    """
+    name = packet_path(trips_year, fmt, show_scores)
+
+    with tempfile.TemporaryFile() as f:
+        if fmt == ZIP:
+            write_zip(f, trips_year, show_scores)
+        else:
+            context = {'trips_year': trips_year, 'show_scores': show_scores}
+            for chunk in stream_packets(trips_year, show_scores, context=context):
+                f.write(chunk.encode('utf-8'))
+        f.seek(0)
+
+        if storage.exists(name):
+            storage.delete(name)
+        return storage.save(name, File(f))
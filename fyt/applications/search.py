@@ -0,0 +1,118 @@
+"""
+Full-text search over application answers.
+
+Each application stores a search document made of its answers to the
+application questions and the free-text fields of its leader supplement,
+along with a GIN-indexed ``tsvector`` of the document. The document is
+rebuilt whenever an answer or the leader supplement is saved, and is used to
+highlight matching snippets in search results.
+"""
+from django.contrib.postgres.search import SearchVector
+from django.db.models import Func, TextField, Value as V
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from fyt.applications.models import LeaderSupplement, Volunteer
+from fyt.utils.cache import bump_data_version
+
+
+SEARCH_CONFIG = 'english'
+
+# Free-text fields of the leader supplement which are included in the document
+LEADER_SUPPLEMENT_FIELDS = [
+    'relevant_experience',
+    'co_leader',
+    'paddling_experience',
+    'climbing_experience',
+    'biking_experience',
+    'bike_maintenance_experience',
+    'hiking_experience',
+]
+
+# Marks matches in snippets. Control characters won't appear in answers, so
+# snippets can be escaped before the marks are replaced with HTML.
+START_SEL = '\x02'
+STOP_SEL = '\x03'
+
+HEADLINE_OPTIONS = (
+    'StartSel={}, StopSel={}, MaxFragments=2, MaxWords=20, MinWords=8, '
+    'FragmentDelimiter=" ... "'.format(START_SEL, STOP_SEL)
+)
+
+
+class Headline(Func):
+    """
+    Snippets of ``expression`` which match ``query``, as computed by
+    Postgres' ``ts_headline``.
+    """
+
+    function = 'ts_headline'
+    output_field = TextField()
+
+    def __init__(self, expression, query, **extra):
+        super().__init__(
+            V(SEARCH_CONFIG), expression, query, V(HEADLINE_OPTIONS), **extra
+        )
+
+
+def highlight(snippet):
+    """
+    Escape a snippet and highlight the matches in it.
+    """
+    if not snippet:
+        return ''
+    return mark_safe(
+        escape(snippet).replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>')
+    )
+
+
+def search_document(application):
+    """
+    The searchable text of an application.
+    """
+    texts = [answer.answer for answer in application.answer_set.all()]
+
+    try:
+        supplement = application.leader_supplement
+    except LeaderSupplement.DoesNotExist:
+        pass
+    else:
+        texts += [getattr(supplement, field) for field in LEADER_SUPPLEMENT_FIELDS]
+
+    return '\n\n'.join(filter(None, texts))
+
+
+def update_search_document(application):
+    """
+    Rebuild the search document and vector of a single application.
+    """
+    document = search_document(application)
+    Volunteer.objects.filter(pk=application.pk).update(
+        search_document=document,
+        search_vector=SearchVector(
+            V(document, output_field=TextField()), config=SEARCH_CONFIG
+        ),
+    )
+    bump_data_version(application.trips_year_id, Volunteer)
+
+
+def rebuild_search_index(trips_year):
+    """
+    Rebuild the search documents and vectors of every application in
+    ``trips_year``.
+    """
+    applications = list(
+        Volunteer.objects.filter(trips_year=trips_year)
+        .select_related(None)
+        .select_related('leader_supplement')
+        .prefetch_related('answer_set')
+    )
+    for application in applications:
+        application.search_document = search_document(application)
+
+    Volunteer.objects.bulk_update(applications, ['search_document'], batch_size=500)
+    Volunteer.objects.filter(trips_year=trips_year).update(
+        search_vector=SearchVector('search_document', config=SEARCH_CONFIG)
+    )
+    bump_data_version(trips_year, Volunteer)
+    return len(applications)
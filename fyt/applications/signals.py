@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from fyt.applications.models import (
+    Answer,
+    LeaderSupplement,
+    Score,
+    ScoreClaim,
+    ScoreQueueEntry,
+    Skip,
+    Volunteer,
+)
+from fyt.applications.normalization import normalize_scores
+from fyt.applications.search import update_search_document
+
+
+@receiver(post_save, sender=Volunteer)
+def update_score_queue_for_application(instance, raw=False, **kwargs):
+    """
+    Keep the scoring queue in sync with the status of the application.
+    """
+    if not raw:
+        ScoreQueueEntry.objects.refresh(instance, create=True)
+
+
+@receiver(post_save, sender=Score)
+@receiver(post_delete, sender=Score)
+def update_score_aggregates(instance, raw=False, **kwargs):
+    """
+    Update the averages and counts stored on the application.
+
+    This runs inside the transaction which saves or deletes the score.
+    """
+    if not raw:
+        instance.application.update_score_aggregates()
+
+
+@receiver(post_save, sender=Score)
+@receiver(post_delete, sender=Score)
+def update_normalized_scores(instance, raw=False, **kwargs):
+    """
+    Renormalize the scores of the year, since a change to one grader's
+    scores affects every application they have scored.
+
+    This runs once the score is committed, so that the transaction saving
+    the score does not hold locks on the other applications.
+    """
+    if not raw:
+        trips_year = instance.trips_year_id
+        transaction.on_commit(lambda: normalize_scores(trips_year))
+
+
+@receiver(post_save, sender=Score)
+@receiver(post_delete, sender=Score)
+@receiver(post_save, sender=Skip)
+@receiver(post_delete, sender=Skip)
+def resolve_score_claims(instance, raw=False, **kwargs):
+    """
+    Claims are resolved once the grader scores or skips the application.
+
+    This must run before the queue is updated, since resolved claims no
+    longer hold a score.
+    """
+    if not raw:
+        ScoreClaim.objects.resolve(instance.grader_id, instance.application_id)
+
+
+@receiver(post_save, sender=Score)
+@receiver(post_delete, sender=Score)
+@receiver(post_save, sender=ScoreClaim)
+@receiver(post_delete, sender=ScoreClaim)
+@receiver(post_save, sender=Skip)
+@receiver(post_delete, sender=Skip)
+def update_score_queue_for_scoring(instance, raw=False, **kwargs):
+    """
+    Recount the scores and claims of the application.
+    """
+    if not raw:
+        ScoreQueueEntry.objects.refresh(instance.application)
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+@receiver(post_save, sender=LeaderSupplement)
+def update_search_index(instance, raw=False, **kwargs):
+    """
+    Rebuild the search document of the application.
+    """
+    if not raw:
+        update_search_document(instance.application)
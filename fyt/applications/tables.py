@@ -1,6 +1,8 @@
 import django_tables2 as tables
+from django.db.models import F
 from django.urls import reverse
 
+from fyt.applications.search import highlight
 from fyt.core.templatetags.links import detail_link, make_link
 from fyt.utils.templatetags.icons import ok_if_true
 
@@ -17,6 +19,8 @@ class _ApplicationTable(tables.Table):
     avg_croo_score = tables.Column(
         verbose_name='Croo Score', order_by='-norm_avg_croo_score'
     )
+    normalized_leader_score = tables.Column(verbose_name='Normalized Leader Score')
+    normalized_croo_score = tables.Column(verbose_name='Normalized Croo Score')
     leader_application = tables.Column(
         verbose_name='Leader app',
         accessor='leader_application_submitted',
@@ -25,6 +29,12 @@ class _ApplicationTable(tables.Table):
     croo_application = tables.Column(
         verbose_name='Croo app', accessor='croo_application_submitted', orderable=False
     )
+    first_aid = tables.Column(
+        verbose_name='First Aid',
+        accessor='first_aid_complete',
+        order_by='-first_aid_verified',
+    )
+    search_snippet = tables.Column(verbose_name='Matches', orderable=False)
 
     class Meta:
         attrs = {"class": "table table-condensed"}  # bootstrap class
@@ -43,15 +53,47 @@ class _ApplicationTable(tables.Table):
     def render_avg_croo_score(self, value):
         return "%.1f" % value
 
+    def render_normalized_leader_score(self, value):
+        return "%.1f" % value
+
+    def render_normalized_croo_score(self, value):
+        return "%.1f" % value
+
+    def order_normalized_leader_score(self, queryset, is_descending):
+        return _order_nulls_last(queryset, 'normalized_leader_score', is_descending)
+
+    def order_normalized_croo_score(self, queryset, is_descending):
+        return _order_nulls_last(queryset, 'normalized_croo_score', is_descending)
+
     def render_leader_application(self, value):
         return ok_if_true(value)
 
     def render_croo_application(self, value):
         return ok_if_true(value)
 
+    def render_first_aid(self, value):
+        return ok_if_true(value)
+
+    def render_search_snippet(self, value):
+        return highlight(value)
+
+
+def _order_nulls_last(queryset, field, is_descending):
+    """
+    Order by ``field`` like the average score columns: highest scores first
+    by default, and unscored applications always last.
+    """
+    if is_descending:
+        order = F(field).asc(nulls_last=True)
+    else:
+        order = F(field).desc(nulls_last=True)
+    return queryset.order_by(order), True
+
 
 def ApplicationTable(qs, request):
     """Configure and return an ``_ApplicationTable`` for this request."""
-    table = _ApplicationTable(qs)
+    # Only show search matches when searching
+    exclude = [] if 'search_snippet' in qs.query.annotations else ['search_snippet']
+    table = _ApplicationTable(qs, exclude=exclude)
     tables.RequestConfig(request, paginate=False).configure(table)
     return table
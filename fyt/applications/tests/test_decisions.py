@@ -0,0 +1,191 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from model_mommy import mommy
+
+from .tests import ApplicationTestMixin
+
+from fyt.applications import decisions
+from fyt.applications.decisions import AVERAGE, NORMALIZED, Cutoffs
+from fyt.applications.models import ScoreQueueEntry, Volunteer
+from fyt.test import FytTestCase
+from fyt.timetable.models import Timetable
+from fyt.training.models import Attendee
+
+
+class CutoffsTestCase(FytTestCase):
+    def volunteer(self, leader=None, croo=None, leader_willing=True, croo_willing=True):
+        return Volunteer(
+            avg_leader_score=leader,
+            avg_croo_score=croo,
+            normalized_leader_score=-1,
+            normalized_croo_score=-1,
+            leader_willing=leader_willing,
+            croo_willing=croo_willing,
+        )
+
+    def test_decide(self):
+        cutoffs = Cutoffs(AVERAGE, croo=4, leader=3, waitlist=2, reject_rest=False)
+        self.assertEqual(cutoffs.decide(self.volunteer(croo=4)), Volunteer.CROO)
+        self.assertEqual(
+            cutoffs.decide(self.volunteer(leader=4, croo=3)), Volunteer.LEADER
+        )
+        self.assertEqual(
+            cutoffs.decide(self.volunteer(leader=2.5)), Volunteer.LEADER_WAITLIST
+        )
+        self.assertEqual(cutoffs.decide(self.volunteer(leader=1)), Volunteer.PENDING)
+        self.assertEqual(cutoffs.decide(self.volunteer()), Volunteer.PENDING)
+
+    def test_decide_respects_willingness(self):
+        cutoffs = Cutoffs(AVERAGE, croo=4, leader=3, waitlist=2, reject_rest=True)
+        self.assertEqual(
+            cutoffs.decide(self.volunteer(leader=5, croo=5, croo_willing=False)),
+            Volunteer.LEADER,
+        )
+        self.assertEqual(
+            cutoffs.decide(self.volunteer(leader=5, croo=5, leader_willing=False)),
+            Volunteer.CROO,
+        )
+        self.assertEqual(
+            cutoffs.decide(
+                self.volunteer(leader=5, croo_willing=False, leader_willing=False)
+            ),
+            Volunteer.REJECTED,
+        )
+
+    def test_missing_cutoffs_give_no_one_the_status(self):
+        cutoffs = Cutoffs(AVERAGE, croo=None, leader=3, waitlist=None, reject_rest=True)
+        self.assertEqual(
+            cutoffs.decide(self.volunteer(leader=5, croo=5)), Volunteer.LEADER
+        )
+        self.assertEqual(cutoffs.decide(self.volunteer(leader=2)), Volunteer.REJECTED)
+
+    def test_decide_by_normalized_score(self):
+        cutoffs = Cutoffs(
+            NORMALIZED, croo=None, leader=0, waitlist=None, reject_rest=True
+        )
+        app = self.volunteer(leader=5)
+        self.assertEqual(cutoffs.decide(app), Volunteer.REJECTED)
+        app.normalized_leader_score = 0.5
+        self.assertEqual(cutoffs.decide(app), Volunteer.LEADER)
+
+
+class ReleaseTestCase(ApplicationTestMixin, FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.init_old_trips_year()
+        self.cutoffs = Cutoffs(AVERAGE, croo=4, leader=3, waitlist=2, reject_rest=True)
+
+    def test_plan_ranks_pending_applications(self):
+        low = self.make_application(avg_leader_score=1)
+        high = self.make_application(avg_leader_score=4.5, croo_willing=False)
+        unscored = self.make_application()
+        self.make_application(status=Volunteer.LEADER, avg_leader_score=5)
+        self.make_application(avg_leader_score=5, submitted=None)
+        self.make_application(trips_year=self.old_trips_year, avg_leader_score=5)
+
+        self.assertEqual(
+            decisions.plan(self.trips_year, self.cutoffs),
+            [
+                (high, Volunteer.LEADER),
+                (low, Volunteer.REJECTED),
+                (unscored, Volunteer.REJECTED),
+            ],
+        )
+
+    def test_count_statuses(self):
+        self.assertEqual(
+            decisions.count_statuses(
+                [Volunteer.LEADER, Volunteer.REJECTED, Volunteer.LEADER]
+            ),
+            [('Leader', 2), ('Rejected', 1)],
+        )
+
+    def test_release(self):
+        croo = self.make_application(avg_croo_score=4)
+        leader = self.make_application(avg_leader_score=3)
+        waitlist = self.make_application(avg_leader_score=2)
+        rejected = self.make_application(avg_leader_score=1)
+        decided = self.make_application(status=Volunteer.LEADER, avg_leader_score=1)
+        # Attendees are normally created along with the application
+        Attendee.objects.filter(volunteer=leader).delete()
+        self.assertTrue(ScoreQueueEntry.objects.get(application=croo).pending)
+
+        with self.assertNumQueries(7):
+            changed = decisions.release(self.trips_year, self.cutoffs)
+        self.assertEqual(set(changed), {croo, leader, waitlist, rejected})
+
+        for app, status in [
+            (croo, Volunteer.CROO),
+            (leader, Volunteer.LEADER),
+            (waitlist, Volunteer.LEADER_WAITLIST),
+            (rejected, Volunteer.REJECTED),
+            (decided, Volunteer.LEADER),
+        ]:
+            app.refresh_from_db()
+            self.assertEqual(app.status, status)
+            self.assertFalse(ScoreQueueEntry.objects.get(application=app).pending)
+        self.assertEqual(Attendee.objects.filter(volunteer=leader).count(), 1)
+        self.assertEqual(Attendee.objects.filter(volunteer=croo).count(), 1)
+
+        # Nothing is left to release
+        self.assertEqual(decisions.release(self.trips_year, self.cutoffs), [])
+
+    def test_release_locks_applications_in_pk_order(self):
+        self.make_application(avg_leader_score=1)
+        self.make_application(avg_leader_score=3)
+
+        with CaptureQueriesContext(connection) as queries:
+            decisions.release(self.trips_year, self.cutoffs)
+        locking = [q['sql'] for q in queries if ' FOR UPDATE' in q['sql']]
+        self.assertEqual(len(locking), 1)
+        self.assertIn('ORDER BY "applications_volunteer"."id" ASC', locking[0])
+
+
+class BulkDecisionViewTestCase(ApplicationTestMixin, FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.init_old_trips_year()
+        mommy.make(Timetable)
+        self.url = reverse(
+            'core:volunteer:decisions', kwargs={'trips_year': self.trips_year}
+        )
+
+    def test_permissions(self):
+        self.app.get(self.url, user=self.make_director())
+        self.app.get(self.url, user=self.make_directorate(), status=403)
+        url = reverse(
+            'core:volunteer:decisions', kwargs={'trips_year': self.old_trips_year}
+        )
+        self.app.get(url, user=self.make_tlt(), status=403)
+
+    def test_preview_and_release(self):
+        leader = self.make_application(avg_leader_score=4)
+        pending = self.make_application(avg_leader_score=1)
+
+        res = self.app.get(self.url, user=self.make_director())
+        form = res.forms['bulk-decision-form']
+        form['leader_cutoff'] = 3
+        res = form.submit()
+        self.assertContains(res, str(leader))
+        self.assertContains(res, str(pending))
+
+        # Previewing doesn't change anything
+        leader.refresh_from_db()
+        self.assertEqual(leader.status, Volunteer.PENDING)
+
+        res = res.forms['release-form'].submit('release').follow()
+        self.assertContains(res, 'Released 1 decisions: 1 Leader')
+
+        leader.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual(leader.status, Volunteer.LEADER)
+        self.assertEqual(pending.status, Volunteer.PENDING)
+
+    def test_waitlist_cutoff_cannot_be_above_leader_cutoff(self):
+        res = self.app.get(
+            self.url,
+            {'score': AVERAGE, 'leader_cutoff': 2, 'waitlist_cutoff': 3},
+            user=self.make_director(),
+        )
+        self.assertContains(res, 'Must not be above the leader cutoff')
@@ -99,3 +99,24 @@ class GraderViewsTestCase(ApplicationTestMixin, FytTestCase):
                 self.V5: 0,
             },
         )
+
+    def test_with_statistics_is_cached_until_scores_change(self):
+        self.make_score_values()
+        mommy.make(
+            Score, trips_year=self.trips_year, grader=self.grader, leader_score=self.V1
+        )
+        graders = Grader.objects.with_statistics(self.trips_year)
+        self.assertEqual(graders[0].score_count, 1)
+
+        # Only the data version and graders are queried the second time
+        with self.assertNumQueries(2):
+            Grader.objects.with_statistics(self.trips_year)
+
+        mommy.make(
+            Score, trips_year=self.trips_year, grader=self.grader, leader_score=self.V3
+        )
+        self.run_commit_hooks()
+        graders = Grader.objects.with_statistics(self.trips_year)
+        self.assertEqual(graders[0].score_count, 2)
+        self.assertEqual(graders[0].avg_leader_score, 2)
+        self.assertEqual(graders[0].leader_score_histogram[self.V3], 1)
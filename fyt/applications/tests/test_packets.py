@@ -0,0 +1,85 @@
+import tempfile
+import zipfile
+
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from model_mommy import mommy
+
+from .tests import ApplicationTestMixin
+
+from fyt.applications import packets
+from fyt.applications.models import Grader, Question, Score
+from fyt.test import FytTestCase
+
+
+class ApplicationPacketTestCase(ApplicationTestMixin, FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.init_old_trips_year()
+        self.make_score_values()
+        self.question = mommy.make(Question, trips_year=self.trips_year)
+        self.apps = []
+        for i in range(3):
+            app = self.make_application()
+            app.answer_question(self.question, 'I love canoeing')
+            self.apps.append(app)
+        self.make_application(submitted=None)
+
+        self.make_director()
+        mommy.make(
+            Score,
+            trips_year=self.trips_year,
+            application=self.apps[0],
+            grader=Grader.objects.from_user(self.director),
+            leader_score=self.V4,
+            general='A secret score comment',
+        )
+
+    def test_packets_are_anonymized(self):
+        html = ''.join(packets.stream_packets(self.trips_year))
+        self.assertEqual(html.count('I love canoeing'), 3)
+        for app in self.apps:
+            self.assertIn('Application #{}'.format(app.pk), html)
+            self.assertNotIn(app.applicant.name, html)
+        self.assertNotIn('A secret score comment', html)
+
+    def test_scores_are_shown_to_directors(self):
+        url = reverse('applications:score:packets')
+        res = self.app.get(url, user=self.director)
+        self.assertContains(res, 'I love canoeing', count=3)
+        self.assertContains(res, 'A secret score comment')
+
+        res = self.app.get(url, user=self.make_grader())
+        self.assertContains(res, 'I love canoeing', count=3)
+        self.assertNotContains(res, 'A secret score comment')
+
+    def test_answers_and_scores_are_prefetched(self):
+        with self.assertNumQueries(4):
+            list(packets.render_applications(self.trips_year, show_scores=True))
+
+    def test_save_packets(self):
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+        name = packets.save_packets(self.trips_year, storage=storage)
+        self.assertEqual(name, packets.packet_path(self.trips_year, packets.HTML))
+
+        # Saving again replaces the old copy
+        self.assertEqual(name, packets.save_packets(self.trips_year, storage=storage))
+        with storage.open(name) as f:
+            html = f.read().decode('utf-8')
+        self.assertEqual(html.count('I love canoeing'), 3)
+
+    def test_save_zip_of_packets(self):
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+        name = packets.save_packets(
+            self.trips_year, fmt=packets.ZIP, show_scores=True, storage=storage
+        )
+        self.assertEqual(
+            name, packets.packet_path(self.trips_year, packets.ZIP, show_scores=True)
+        )
+        with storage.open(name) as f, zipfile.ZipFile(f) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                sorted('application-{}.html'.format(app.pk) for app in self.apps),
+            )
+            html = archive.read('application-{}.html'.format(self.apps[0].pk))
+        self.assertIn(b'A secret score comment', html)
@@ -1,11 +1,17 @@
+import io
 import unittest
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.test import TransactionTestCase
 from django.urls import reverse
 from django.utils import timezone
 from model_mommy import mommy
 
+from .. import normalization
 from ..forms import SKIP, ScoreForm, ScoreQuestionFormset
 from ..models import (
     Grader,
@@ -13,13 +19,15 @@ from ..models import (
     Score,
     ScoreClaim,
     ScoreQuestion,
+    ScoreQueueEntry,
     ScoreValue,
     Volunteer,
 )
 from ..views.scoring import SHOW_SCORE_AVG_INTERVAL
 from . import ApplicationTestMixin
 
-from fyt.test import FytTestCase
+from fyt.core.models import TripsYear
+from fyt.test import FytTestCase, run_concurrently
 from fyt.users.models import DartmouthUser
 
 
@@ -52,6 +60,21 @@ class ScoreModelTestCase(ApplicationTestMixin, FytTestCase):
         )  # Croo head
         self.assertTrue(score.croo_head)
 
+    def test_saving_a_stale_application_keeps_score_aggregates(self):
+        app = self.make_application(trips_year=self.trips_year)
+        stale = Volunteer.objects.get(pk=app.pk)
+        mommy.make(Grader).add_score(app, self.V3, self.V4)
+        self.run_commit_hooks()
+
+        stale.status = Volunteer.LEADER
+        stale.save()
+
+        app.refresh_from_db()
+        self.assertEqual(app.status, Volunteer.LEADER)
+        self.assertEqual(app.score_count, 1)
+        self.assertEqual(app.avg_leader_score, 3)
+        self.assertEqual(app.normalized_croo_score, 4)
+
     def test_leader_application_requires_leader_score(self):
         for leader_willing, leader_score, ok in [
             [True, self.V3, True],
@@ -163,6 +186,36 @@ class ScoreClaimModelTestCase(ApplicationTestMixin, FytTestCase):
 
         self.assertQsEqual(ScoreClaim.objects.active(), [active])
 
+    def test_claims_are_resolved_by_scores_and_skips(self):
+        grader = _get_grader(self.make_grader())
+        claim = mommy.make(ScoreClaim, grader=grader)
+        other = mommy.make(ScoreClaim, application=claim.application)
+        self.assertFalse(claim.resolved)
+
+        score = grader.add_score(claim.application)
+        claim.refresh_from_db()
+        other.refresh_from_db()
+        self.assertTrue(claim.resolved)
+        self.assertFalse(other.resolved)
+
+        score.delete()
+        claim.refresh_from_db()
+        self.assertFalse(claim.resolved)
+
+        grader.skip(claim.application)
+        claim.refresh_from_db()
+        self.assertTrue(claim.resolved)
+
+    def test_sweep_inactive_claims(self):
+        grader = _get_grader(self.make_grader())
+        active = mommy.make(ScoreClaim)
+        expired = _expire_claim(mommy.make(ScoreClaim))
+        scored = mommy.make(ScoreClaim, grader=grader)
+        grader.add_score(scored.application)
+
+        call_command('sweep_score_claims', stdout=io.StringIO())
+        self.assertQsEqual(ScoreClaim.objects.all(), [active])
+
 
 class GraderModelTestCase(ApplicationTestMixin, FytTestCase):
     def setUp(self):
@@ -462,13 +515,278 @@ class GraderModelTestCase(ApplicationTestMixin, FytTestCase):
         # 0/3 scores
         app3 = self.make_application()
 
-        progress = {'complete': 4, 'total': 9, 'percentage': 44}
-        self.assertEqual(progress, Volunteer.objects.score_progress(self.trips_year))
+        progress = Volunteer.objects.score_progress(self.trips_year)
+        self.assertEqual(progress['complete'], 4)
+        self.assertEqual(progress['total'], 9)
+        self.assertEqual(progress['percentage'], 44)
 
     def test_score_progress_with_no_scores(self):
         # Don't divide by zero
-        progress = {'complete': 0, 'total': 0, 'percentage': 100}
-        self.assertEqual(progress, Volunteer.objects.score_progress(self.trips_year))
+        progress = Volunteer.objects.score_progress(self.trips_year)
+        self.assertEqual(progress['complete'], 0)
+        self.assertEqual(progress['total'], 0)
+        self.assertEqual(progress['percentage'], 100)
+        self.assertEqual(
+            progress['croo_head'], {'complete': 0, 'total': 0, 'percentage': 100}
+        )
+
+    def test_score_progress_breakdowns(self):
+        app1 = self.make_application(status=Volunteer.LEADER)
+        self.make_scores(app1, 2)
+        app2 = self.make_application()
+        self.croo_head.add_score(app2)
+        self.make_application(croo_willing=False)
+
+        progress = Volunteer.objects.score_progress(self.trips_year)
+        self.assertEqual(
+            progress['by_status'][Volunteer.LEADER],
+            {'complete': 2, 'total': 3, 'percentage': 67},
+        )
+        self.assertEqual(
+            progress['by_status'][Volunteer.PENDING],
+            {'complete': 1, 'total': 6, 'percentage': 17},
+        )
+        self.assertEqual(
+            progress['croo_head'], {'complete': 1, 'total': 2, 'percentage': 50}
+        )
+
+    def test_score_progress_is_cached(self):
+        Volunteer.objects.score_progress(self.trips_year)
+        with self.assertNumQueries(0):
+            Volunteer.objects.score_progress(self.trips_year)
+
+
+class ScoreQueueEntryTestCase(ApplicationTestMixin, FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.grader = _get_grader(self.make_grader())
+        self.croo_head = _get_grader(self.make_croo_head())
+
+    def entry(self, app):
+        return ScoreQueueEntry.objects.get(application=app)
+
+    def test_entry_created_with_application(self):
+        app = self.make_application()
+        entry = self.entry(app)
+        self.assertEqual(entry.trips_year, self.trips_year)
+        self.assertTrue(entry.pending)
+        self.assertTrue(entry.croo_application)
+        self.assertTrue(entry.croo_head_needed)
+        self.assertEqual(entry.priority, 0)
+
+    def test_entry_tracks_application_status(self):
+        app = self.make_application()
+        app.status = Volunteer.REJECTED
+        app.save()
+        self.assertFalse(self.entry(app).pending)
+
+    def test_entry_counts_scores_and_claims(self):
+        app = self.make_application()
+        self.grader.claim_score(app)
+        entry = self.entry(app)
+        self.assertEqual(entry.claim_count, 1)
+        self.assertEqual(entry.priority, 1)
+
+        self.croo_head.add_score(app)
+        entry = self.entry(app)
+        self.assertEqual(entry.score_count, 1)
+        self.assertEqual(entry.croo_head_score_count, 1)
+        self.assertFalse(entry.croo_head_needed)
+        self.assertEqual(entry.priority, 2)
+
+        self.grader.skip(app)
+        entry = self.entry(app)
+        self.assertEqual(entry.claim_count, 0)
+        self.assertEqual(entry.priority, 1)
+
+    def test_reserve_last_score_for_croo_head(self):
+        app = self.make_application()
+        self.grader.add_score(app)
+        self.assertFalse(self.entry(app).reserved_for_croo_head)
+
+        mommy.make(Score, croo_head=False, trips_year=self.trips_year, application=app)
+        self.assertTrue(self.entry(app).reserved_for_croo_head)
+
+    def test_expired_claims_are_released(self):
+        app = self.make_application()
+        self.grader.claim_score(app)
+        self.assertEqual(self.entry(app).claim_count, 1)
+
+        # Expire the claim without saving it, as happens in real life
+        ScoreClaim.objects.update(
+            claimed_at=timezone.now() - 1.1 * ScoreClaim.HOLD_DURATION
+        )
+        ScoreQueueEntry.objects.filter(application=app).update(
+            claims_expire_at=timezone.now()
+        )
+        ScoreQueueEntry.objects.refresh_expired()
+        entry = self.entry(app)
+        self.assertEqual(entry.claim_count, 0)
+        self.assertIsNone(entry.claims_expire_at)
+
+    def test_claim_next_to_score_claims_distinct_applications(self):
+        app1 = self.make_application(croo_willing=False)
+        app2 = self.make_application(croo_willing=False)
+        director = _get_grader(self.make_director())
+
+        claimed = {self.grader.claim_next_to_score(), director.claim_next_to_score()}
+        self.assertEqual(claimed, {app1, app2})
+
+    def test_claim_next_to_score_counts_the_claim(self):
+        self.make_application()
+        self.make_application()
+        for grader in [self.grader, self.croo_head]:
+            app = grader.claim_next_to_score()
+            entry = self.entry(app)
+            ScoreQueueEntry.objects.refresh(app)
+            self.assertEqual(model_to_dict(entry), model_to_dict(self.entry(app)))
+            self.assertEqual(entry.claim_count, 1)
+
+    def test_claim_next_to_score_replaces_unswept_claim(self):
+        app = self.make_application()
+        _expire_claim(self.grader.claim_score(app))
+        ScoreQueueEntry.objects.refresh(app)
+
+        self.assertEqual(self.grader.claim_next_to_score(), app)
+        self.assertEqual(self.grader.current_claim().application, app)
+        self.assertEqual(self.entry(app).claim_count, 1)
+
+    def test_claim_next_to_score_releases_expired_claims(self):
+        app = self.make_application(croo_willing=False)
+        for _ in range(Volunteer.NUM_SCORES - 1):
+            mommy.make(Score, trips_year=self.trips_year, application=app)
+        self.croo_head.claim_next_to_score()
+        self.assertIsNone(self.grader.claim_next_to_score())
+
+        # Expire the claim without refreshing the entry
+        ScoreClaim.objects.update(
+            claimed_at=timezone.now() - 1.1 * ScoreClaim.HOLD_DURATION
+        )
+        ScoreQueueEntry.objects.update(claims_expire_at=timezone.now())
+
+        self.assertEqual(self.grader.claim_next_to_score(), app)
+        entry = self.entry(app)
+        self.assertEqual(entry.claim_count, 1)
+        self.assertEqual(entry.priority, Volunteer.NUM_SCORES)
+
+    def test_sweep_releases_expired_claims(self):
+        app = self.make_application()
+        self.grader.claim_next_to_score()
+        ScoreClaim.objects.update(
+            claimed_at=timezone.now() - 1.1 * ScoreClaim.HOLD_DURATION
+        )
+        self.assertEqual(self.entry(app).claim_count, 1)
+
+        call_command('sweep_score_claims', stdout=io.StringIO())
+        self.assertEqual(self.entry(app).claim_count, 0)
+
+    def test_claim_next_to_score_query_count(self):
+        self.make_application()
+        self.make_application()
+        self.croo_head.claim_next_to_score()
+        # The data version is bumped once the claim is committed
+        with self.assertNumQueries(12):
+            self.grader.claim_next_to_score()
+
+    def test_rebuild_score_queue(self):
+        app = self.make_application()
+        self.grader.add_score(app)
+        ScoreQueueEntry.objects.all().delete()
+
+        call_command('rebuild_score_queue', stdout=io.StringIO())
+        self.assertEqual(self.entry(app).score_count, 1)
+
+
+class NormalizationTestCase(ApplicationTestMixin, FytTestCase):
+    def test_normalize_adjusts_for_harsh_graders(self):
+        # The harsh grader gives everything a point less than the lenient one
+        triples = []
+        for app in range(5):
+            triples.append(('harsh', app, 1.0 + app / 2))
+            triples.append(('lenient', app, 2.0 + app / 2))
+        # Scored once by each grader
+        triples.append(('harsh', 'a', 2.0))
+        triples.append(('lenient', 'b', 3.0))
+
+        normalized = normalization._normalize(triples)
+        self.assertAlmostEqual(normalized['a'], normalized['b'])
+        self.assertLess(normalized[0], normalized[4])
+
+    def test_normalize_graders_with_few_scores_against_everyone(self):
+        triples = [('a', 1, 1.0), ('b', 2, 3.0), ('a', 3, 5.0)]
+        normalized = normalization._normalize(triples)
+        for app, score in {1: 1.0, 2: 3.0, 3: 5.0}.items():
+            self.assertAlmostEqual(normalized[app], score)
+
+    def test_normalize_with_no_scores(self):
+        self.assertEqual(normalization._normalize([]), {})
+
+    def test_normalized_scores_are_updated_with_scores(self):
+        self.init_trips_year()
+        self.make_score_values()
+        app1 = self.make_application()
+        app2 = self.make_application(croo_willing=False)
+        grader = _get_grader(self.make_grader())
+        grader.add_score(app1, self.V2, self.V3)
+        score = grader.add_score(app2, self.V4)
+
+        # Normalization waits for the scores to be committed
+        app1.refresh_from_db()
+        self.assertIsNone(app1.normalized_leader_score)
+        self.run_commit_hooks()
+
+        app1.refresh_from_db()
+        app2.refresh_from_db()
+        self.assertEqual(app1.normalized_leader_score, 2)
+        self.assertEqual(app1.normalized_croo_score, 3)
+        self.assertEqual(app2.normalized_leader_score, 4)
+        self.assertIsNone(app2.normalized_croo_score)
+
+        score.delete()
+        self.run_commit_hooks()
+        app2.refresh_from_db()
+        self.assertIsNone(app2.normalized_leader_score)
+
+
+class ConcurrentScoringTestCase(ApplicationTestMixin, TransactionTestCase):
+    def setUp(self):
+        self.trips_year = mommy.make(TripsYear, year=2014, is_current=True)
+        self.make_score_values()
+
+    def test_scores_saved_at_the_same_time(self):
+        apps = [self.make_application(), self.make_application()]
+        graders = [
+            _get_grader(mommy.make(DartmouthUser, netid=netid))
+            for netid in ['grader1', 'grader2']
+        ]
+        # Give the graders enough scores to be normalized separately
+        values = [self.V1, self.V2, self.V3, self.V4, self.V5]
+        for app in [self.make_application() for _ in values]:
+            for grader, value in zip(graders, values):
+                grader.add_score(app, value, value)
+            values.reverse()
+        # Each grader has scored the other's application, so each new score
+        # renormalizes the application scored by the other connection
+        for grader, app in zip(graders, reversed(apps)):
+            grader.add_score(app, self.V2, self.V2)
+
+        def score(grader, app, value):
+            # Scores are saved in a transaction, as by the score form
+            def add_score():
+                with transaction.atomic():
+                    grader.add_score(app, value, value)
+
+            return add_score
+
+        run_concurrently(
+            score(graders[0], apps[0], self.V4), score(graders[1], apps[1], self.V3)
+        )
+
+        self.assertEqual(Score.objects.count(), 14)
+        for app in apps:
+            app.refresh_from_db()
+            self.assertIsNotNone(app.normalized_leader_score)
+            self.assertIsNotNone(app.normalized_croo_score)
 
 
 class ScoreViewsTestCase(ApplicationTestMixin, FytTestCase):
@@ -503,6 +821,16 @@ class ScoreViewsTestCase(ApplicationTestMixin, FytTestCase):
             self.app.get(url, user=self.director)
             self.app.get(url, user=self.user, status=403)
 
+    def test_scoring_progress_json(self):
+        app = self.make_application()
+        url = reverse('applications:score:progress')
+        self.app.get(url, user=self.user, status=403)
+
+        resp = self.app.get(url, user=self.director)
+        self.assertEqual(resp.json['complete'], 0)
+        self.assertEqual(resp.json['total'], 3)
+        self.assertEqual(resp.json['by_status']['PENDING']['total'], 3)
+
     def test_score_application(self):
         app = self.make_application(trips_year=self.trips_year)
         self.make_score_values()
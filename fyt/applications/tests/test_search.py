@@ -0,0 +1,89 @@
+import io
+
+from django.core.management import call_command
+from django.urls import reverse
+from model_mommy import mommy
+
+from .tests import ApplicationTestMixin
+
+from fyt.applications.models import Question, Volunteer
+from fyt.applications.search import highlight, rebuild_search_index
+from fyt.test import FytTestCase
+from fyt.timetable.models import Timetable
+
+
+class SearchTestCase(ApplicationTestMixin, FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.init_old_trips_year()
+        self.question = mommy.make(Question, trips_year=self.trips_year)
+
+    def test_search_document_tracks_answers_and_supplement(self):
+        app = self.make_application()
+        answer = app.answer_question(self.question, 'I love canoeing')
+        app.leader_supplement.hiking_experience = 'Climbed Moosilauke'
+        app.leader_supplement.save()
+
+        app.refresh_from_db()
+        self.assertEqual(app.search_document, 'I love canoeing\n\nClimbed Moosilauke')
+        self.assertQsEqual(Volunteer.objects.search('canoe'), [app])
+        self.assertQsEqual(Volunteer.objects.search('moosilauke'), [app])
+
+        answer.delete()
+        self.assertQsEqual(Volunteer.objects.search('canoe'), [])
+
+    def test_search_columns_are_not_loaded(self):
+        self.make_application()
+        self.assertEqual(
+            Volunteer.objects.get().get_deferred_fields(),
+            {'search_document', 'search_vector'},
+        )
+
+    def test_search_is_ranked(self):
+        app1 = self.make_application()
+        app1.answer_question(self.question, 'I like hiking and swimming')
+        app2 = self.make_application()
+        app2.answer_question(self.question, 'Hiking, hiking and more hiking')
+        app3 = self.make_application()
+        app3.answer_question(self.question, 'Swimming')
+
+        results = Volunteer.objects.search('hiking')
+        self.assertEqual(list(results), [app2, app1])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_search_snippet(self):
+        app = self.make_application()
+        app.answer_question(self.question, 'Paddling the "Connecticut" river')
+
+        result = Volunteer.objects.search('river').get()
+        self.assertEqual(
+            highlight(result.search_snippet),
+            'Paddling the &quot;Connecticut&quot; <mark>river</mark>',
+        )
+
+    def test_rebuild_search_index(self):
+        app = self.make_application()
+        old_app = self.make_application(trips_year=self.old_trips_year)
+        app.answer_question(self.question, 'Canoeing')
+        Volunteer.objects.update(search_document='', search_vector=None)
+
+        self.assertEqual(rebuild_search_index(self.trips_year), 1)
+        self.assertQsEqual(Volunteer.objects.search('canoeing'), [app])
+
+        output = io.StringIO()
+        call_command(
+            'rebuild_search_index', trips_year=self.trips_year.year, stdout=output
+        )
+        self.assertIn('1 applications', output.getvalue())
+
+    def test_search_filter(self):
+        mommy.make(Timetable)
+        app = self.make_application()
+        app.answer_question(self.question, 'A long answer about kayaking')
+        other_app = self.make_application()
+
+        url = reverse('core:volunteer:index', kwargs={'trips_year': self.trips_year})
+        res = self.app.get(url, {'search': 'kayak'}, user=self.make_director())
+        self.assertContains(res, str(app))
+        self.assertNotContains(res, str(other_app))
+        self.assertContains(res, '<mark>kayaking</mark>')
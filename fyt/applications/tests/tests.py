@@ -1,6 +1,9 @@
+import io
+import unittest
 from datetime import date, timedelta
 
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.urls import reverse
 from django.utils import timezone
 from model_mommy import mommy
@@ -23,6 +26,7 @@ from ..models import (
     Volunteer,
     validate_class_year,
 )
+from ..views.application import ApplicationIndex
 
 from fyt.croos.models import Croo
 from fyt.test import FytTestCase
@@ -298,6 +302,74 @@ class VolunteerModelTestCase(ApplicationTestMixin, FytTestCase):
         self.assertTrue(app.croo_application_complete)
         self.assertTrue(app.croo_application_submitted)
 
+    def test_with_completeness(self):
+        trips_year = self.init_trips_year()
+        old_trips_year = self.init_old_trips_year()
+        question1 = mommy.make(Question, trips_year=trips_year, type=Question.ALL)
+        question2 = mommy.make(Question, trips_year=trips_year, type=Question.LEADER)
+        mommy.make(Question, trips_year=trips_year, type=Question.OPTIONAL)
+        mommy.make(Question, trips_year=old_trips_year, type=Question.CROO)
+
+        leader = make_application(
+            trips_year=trips_year,
+            leader_willing=True,
+            croo_willing=True,
+            deadline_extension=timezone.now() + timedelta(1),
+        )
+        leader.answer_question(question1, 'Answer')
+        leader.answer_question(question2, 'Answer')
+        for name in [FirstAidCertification.CPR, 'WFA']:
+            mommy.make(
+                FirstAidCertification,
+                trips_year=trips_year,
+                volunteer=leader,
+                name=name,
+                verified=True,
+            )
+
+        incomplete = make_application(
+            trips_year=trips_year,
+            leader_willing=True,
+            croo_willing=False,
+            deadline_extension=timezone.now() - timedelta(1),
+        )
+        incomplete.answer_question(question1, 'Answer')
+        incomplete.answer_question(question2, '')
+        mommy.make(
+            FirstAidCertification,
+            trips_year=trips_year,
+            volunteer=incomplete,
+            name=FirstAidCertification.CPR,
+            verified=True,
+        )
+
+        with self.assertNumQueries(1):
+            apps = {
+                app.pk: app
+                for app in Volunteer.objects.filter(
+                    trips_year=trips_year
+                ).with_completeness()
+            }
+
+        with self.assertNumQueries(0):
+            leader = apps[leader.pk]
+            self.assertTrue(leader.leader_complete)
+            self.assertTrue(leader.leader_application_complete)
+            self.assertTrue(leader.croo_complete)
+            self.assertTrue(leader.croo_application_complete)
+            self.assertTrue(leader.first_aid_complete)
+            self.assertTrue(leader.extension_active)
+            self.assertTrue(leader.within_deadline_extension())
+
+            incomplete = apps[incomplete.pk]
+            self.assertFalse(incomplete.leader_complete)
+            self.assertFalse(incomplete.leader_application_complete)
+            self.assertFalse(incomplete.croo_complete)
+            self.assertFalse(incomplete.croo_application_complete)
+            self.assertFalse(incomplete.first_aid_complete)
+            self.assertFalse(incomplete.extension_active)
+            self.assertFalse(incomplete.within_deadline_extension())
+
     def test_answer_question(self):
         trips_year = self.init_trips_year()
         app = make_application(trips_year=trips_year)
@@ -335,6 +407,44 @@ class VolunteerModelTestCase(ApplicationTestMixin, FytTestCase):
         self.assertEqual(app.average_leader_score(), 3.5)
         self.assertEqual(app.average_croo_score(), 1.5)
 
+    def test_score_aggregates_are_stored(self):
+        trips_year = self.init_trips_year()
+        self.make_score_values()
+        app = make_application(trips_year=trips_year)
+        score1 = mommy.make(Grader).add_score(app, self.V3, self.V1)
+        croo_head = Grader.objects.from_user(self.make_croo_head())
+        score2 = croo_head.add_score(app, self.V4, None)
+
+        app.refresh_from_db()
+        self.assertEqual(app.avg_leader_score, 3.5)
+        self.assertEqual(app.avg_croo_score, 1)
+        self.assertEqual(app.score_count, 2)
+        self.assertEqual(app.croo_head_score_count, 1)
+
+        score2.delete()
+        app.refresh_from_db()
+        self.assertEqual(app.avg_leader_score, 3)
+        self.assertEqual(app.score_count, 1)
+        self.assertEqual(app.croo_head_score_count, 0)
+
+        score1.delete()
+        app.refresh_from_db()
+        self.assertIsNone(app.avg_leader_score)
+        self.assertIsNone(app.avg_croo_score)
+        self.assertEqual(app.score_count, 0)
+
+    def test_rebuild_score_aggregates(self):
+        trips_year = self.init_trips_year()
+        self.make_score_values()
+        app = make_application(trips_year=trips_year)
+        mommy.make(Grader).add_score(app, self.V3, self.V1)
+        Volunteer.objects.update(avg_leader_score=None, score_count=0)
+
+        call_command('rebuild_score_aggregates', stdout=io.StringIO())
+        app.refresh_from_db()
+        self.assertEqual(app.avg_leader_score, 3)
+        self.assertEqual(app.score_count, 1)
+
     def test_class_year_validation(self):
         validate_class_year(2015)
         with self.assertRaises(ValidationError):
@@ -629,6 +739,31 @@ class ApplicationFormTestCase(FytTestCase):
         self.assertEqual(answers[0].question, self.question)
         self.assertEqual(answers[0].answer, 'Blueberries')
 
+    def test_answers_are_saved_in_bulk(self):
+        # The question made with pk=1 in setUp does not advance the sequence
+        self.question.delete()
+        questions = mommy.make(Question, 5, trips_year=self.trips_year)
+        self.app.answer_question(questions[0], 'Apples')
+        self.app.answer_question(questions[1], 'Pears')
+
+        data = {'question_{}'.format(q.pk): 'Answer {}'.format(q.pk) for q in questions}
+        data['question_{}'.format(questions[0].pk)] = 'Apples'
+        form = QuestionForm(instance=self.app, data=data)
+        self.assertTrue(form.is_valid())
+
+        with self.assertNumQueries(7):
+            form.save()
+
+        self.assertEqual(
+            {a.question: a.answer for a in self.app.answer_set.all()},
+            {
+                q: 'Apples' if q == questions[0] else 'Answer {}'.format(q.pk)
+                for q in questions
+            },
+        )
+        self.app.refresh_from_db()
+        self.assertIn('Answer {}'.format(questions[4].pk), self.app.search_document)
+
     def test_question_field_word_count(self):
         form = QuestionForm(instance=self.app, data={'question_1': 'word ' * 301})
         self.assertFalse(form.is_valid())
@@ -803,10 +938,42 @@ class DbVolunteerViewsTestCase(ApplicationTestMixin, FytTestCase):
             self.make_application()
 
         user = self.make_director()
-        with self.assertNumQueries(20):
-            url = reverse('core:volunteer:index', kwargs={'trips_year': self.trips_year})
+        url = reverse('core:volunteer:index', kwargs={'trips_year': self.trips_year})
+        with self.assertNumQueries(21):
             self.app.get(url, user=user)
 
+        # The count is cached
+        with self.assertNumQueries(13):
+            self.app.get(url, user=user)
+
+    @unittest.mock.patch.object(ApplicationIndex, 'table_page_size', 4)
+    def test_volunteer_index_is_paginated(self):
+        mommy.make(Timetable)
+        apps = [
+            self.make_application(normalized_leader_score=score)
+            for score in [None, 1, 2, None, 3, 2, 4, None, 1, 2]
+        ]
+        user = self.make_director()
+
+        url = reverse('core:volunteer:index', kwargs={'trips_year': self.trips_year})
+        res = self.app.get(url, {'sort': 'normalized_leader_score'}, user=user)
+        self.assertContains(res, '<span class="badge"> 10 </span>')
+        self.assertNotContains(res, '&larr; First')
+
+        pages = [res]
+        while 'Next &rarr;' in pages[-1]:
+            pages.append(pages[-1].click(description='Next', href='after='))
+        self.assertEqual(len(pages), 3)
+        self.assertContains(pages[-1], '&larr; First')
+
+        html = ''.join(page.text for page in pages)
+        links = ['href="{}"'.format(app.detail_url()) for app in apps]
+        for link in links:
+            self.assertEqual(html.count(link), 1)
+        # Highest scores first, unscored applications last
+        self.assertLess(html.index(links[6]), html.index(links[4]))
+        self.assertGreater(html.index(links[0]), html.index(links[8]))
+
     def test_old_applications_are_hidden(self):
         mommy.make(Timetable)
         mommy.make(ApplicationInformation, trips_year=self.old_trips_year)
@@ -7,6 +7,7 @@ from fyt.applications.views.application import (
     ApplicationIndex,
     ApplicationStatusUpdate,
     ApplicationUpdate,
+    BulkDecisions,
     ContinueApplication,
     EditQuestions,
     NewApplication,
@@ -20,12 +21,14 @@ from fyt.applications.views.portal import (
     VolunteerPortalView,
 )
 from fyt.applications.views.scoring import (
+    ApplicationPackets,
     ClaimNextApplication,
     DeleteScore,
     EditScoreQuestions,
     NoApplicationsLeftToScore,
     ScoreApplication,
     Scoring,
+    ScoringProgress,
 )
 from fyt.core.urlhelpers import DB_REGEX
 
@@ -34,6 +37,8 @@ score_urlpatterns = [
     url(r'^$', Scoring.as_view(), name='scoring'),
     url(r'^none/$', NoApplicationsLeftToScore.as_view(), name='no_applications_left'),
     url(r'^next/$', ClaimNextApplication.as_view(), name='next'),
+    url(r'^progress/$', ScoringProgress.as_view(), name='progress'),
+    url(r'^packets/$', ApplicationPackets.as_view(), name='packets'),
     url(r'^(?P<pk>[0-9]+)/$', ScoreApplication.as_view(), name='add'),
 ]
 
@@ -58,6 +63,7 @@ urlpatterns = [
 
 application_urlpatterns = [
     url(DB_REGEX['LIST'], ApplicationIndex.as_view(), name='index'),
+    url(r'^decisions/$', BulkDecisions.as_view(), name='decisions'),
     url(DB_REGEX['DETAIL'], ApplicationDetail.as_view(), name='detail'),
     url(DB_REGEX['UPDATE'], ApplicationUpdate.as_view(), name='update'),
     url(
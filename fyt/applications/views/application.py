@@ -7,6 +7,7 @@ from braces.views import (
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Submit
 from django import forms
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import PermissionDenied, ValidationError
@@ -19,12 +20,14 @@ from django.utils.functional import cached_property
 from django.views import View
 from vanilla import DetailView, FormView, ListView, TemplateView, UpdateView
 
+from fyt.applications import decisions
 from fyt.applications.filters import ApplicationFilterSet
 from fyt.applications.forms import (
     AgreementForm,
     ApplicationAdminForm,
     ApplicationForm,
     ApplicationStatusForm,
+    BulkDecisionForm,
     CrooSupplementForm,
     LeaderSupplementForm,
     QuestionForm,
@@ -34,11 +37,12 @@ from fyt.applications.models import (
     CrooSupplement,
     LeaderSupplement,
     Question,
+    Score,
     Volunteer,
 )
 from fyt.applications.tables import ApplicationTable
 from fyt.core.models import TripsYear
-from fyt.core.views import CrispyFormMixin, TripsYearMixin
+from fyt.core.views import CrispyFormMixin, TableListMixin, TripsYearMixin
 from fyt.croos.models import Croo
 from fyt.permissions.views import (
     ApplicationEditPermissionRequired,
@@ -47,6 +51,7 @@ from fyt.permissions.views import (
 )
 from fyt.timetable.models import Timetable
 from fyt.training.forms import FirstAidCertificationFormset
+from fyt.training.models import Attendee, FirstAidCertification
 from fyt.trips.models import TripType
 from fyt.utils.forms import crispify
 from fyt.utils.views import ExtraContextMixin, MultiFormMixin
@@ -448,11 +453,27 @@ class ApplicationIndex(
     BlockDirectorate,
     BlockOldApplications,
     TripsYearMixin,
+    TableListMixin,
     ExtraContextMixin,
     ListView,
 ):
     model = Volunteer
     template_name = 'applications/application_index.html'
+    version_models = [
+        LeaderSupplement,
+        CrooSupplement,
+        Score,
+        FirstAidCertification,
+        Attendee,
+    ]
+    only_fields = [
+        'applicant__name',
+        'trips_year',
+        'leader_willing',
+        'croo_willing',
+        'submitted',
+        'deadline_extension',
+    ]
 
     def get_queryset(self):
         return (
@@ -460,16 +481,7 @@ class ApplicationIndex(
             .select_related(None)  # Clear leader_supplement, croo_supplement selects
             .select_related('applicant')
             .with_avg_scores()
-            .only(
-                'applicant__netid',
-                'applicant__name',
-                'trips_year_id',
-                'status',
-                'gender',
-                'leader_willing',
-                'croo_willing',
-                'submitted',
-            )
+            .with_completeness()
         )
 
     def extra_context(self):
@@ -479,8 +491,8 @@ class ApplicationIndex(
         )
         table = ApplicationTable(filter.qs, self.request)
         return {
-            'table': table,
-            'application_count': len(filter.qs),
+            'table': self.paginate_table(table),
+            'application_count': self.get_count(filter.qs),
             'applications_filter': filter,
         }
 
@@ -617,6 +629,45 @@ class ApplicationStatusUpdate(
     template_name = 'applications/status_update.html'
 
 
+class BulkDecisions(
+    ApplicationEditPermissionRequired, BlockOldApplications, TripsYearMixin, FormView
+):
+    """
+    Release the decisions of all pending applications at once, by score.
+
+    Submitting the form with GET previews the decisions, and POSTing it
+    applies them.
+    """
+
+    form_class = BulkDecisionForm
+    template_name = 'applications/decisions.html'
+
+    def get(self, request, *args, **kwargs):
+        form = self.get_form(data=request.GET or None)
+        context = {'form': form}
+        if form.is_valid():
+            context['decisions'] = decisions.plan(self.trips_year, form.cutoffs)
+            context['counts'] = decisions.count_statuses(
+                status for _, status in context['decisions']
+            )
+        return self.render_to_response(self.get_context_data(**context))
+
+    def form_valid(self, form):
+        released = decisions.release(self.trips_year, form.cutoffs)
+        counts = decisions.count_statuses(app.status for app in released)
+        messages.success(
+            self.request,
+            'Released {} decisions: {}'.format(
+                len(released),
+                ', '.join('{} {}'.format(count, label) for label, count in counts),
+            ),
+        )
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get_success_url(self):
+        return reverse('core:volunteer:index', kwargs={'trips_year': self.trips_year})
+
+
 class ApplicationAdminUpdate(
     ApplicationEditPermissionRequired,
     BlockDirectorate,
@@ -3,12 +3,14 @@ import logging
 from braces.views import FormMessagesMixin, SetHeadlineMixin
 from django import forms
 from django.db import models
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse, reverse_lazy
 from django.utils.functional import cached_property
+from django.views.generic import View
 from vanilla import CreateView, FormView, RedirectView, TemplateView
 
+from fyt.applications import packets
 from fyt.applications.forms import SKIP, ScoreForm, ScoreQuestionFormset
 from fyt.applications.models import Grader, Score, ScoreClaim, ScoreQuestion, Volunteer
 from fyt.core.models import TripsYear
@@ -42,6 +44,41 @@ class Scoring(GraderPermissionRequired, ExtraContextMixin, TemplateView):
         }
 
 
+class ScoringProgress(GraderPermissionRequired, View):
+    """
+    Scoring progress as JSON, for refreshing the progress bar.
+    """
+
+    def get(self, request, *args, **kwargs):
+        trips_year = TripsYear.objects.current()
+        return JsonResponse(Volunteer.objects.score_progress(trips_year))
+
+
+class ApplicationPackets(GraderPermissionRequired, View):
+    """
+    Every submitted application for the current year, on one page, for
+    reading before deliberations.
+
+    The packets are anonymized and streamed to the browser one application
+    at a time. Scores are only shown to users who can make decisions.
+    """
+
+    score_permissions = [
+        'permissions.can_edit_db',
+        'permissions.can_edit_applications_and_assign_leaders',
+    ]
+
+    def get(self, request, *args, **kwargs):
+        trips_year = TripsYear.objects.current()
+        show_scores = any(request.user.has_perm(p) for p in self.score_permissions)
+        context = {'trips_year': trips_year, 'show_scores': show_scores}
+        return StreamingHttpResponse(
+            packets.stream_packets(
+                trips_year, show_scores, context=context, request=request
+            )
+        )
+
+
 class IfScoringAvailable:
     """
     Only allow grading once applications are closed
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'fyt.core'
+
+    def ready(self):
+        # Register signals
+        from . import signals
+
+
+default_app_config = 'fyt.core.CoreConfig'
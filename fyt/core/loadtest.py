@@ -0,0 +1,370 @@
+"""
+Load testing for the application and registration deadlines.
+
+Most volunteer applications and trippee registrations are saved and
+submitted in the hour before they close. This seeds a trips year with
+applicants and incoming students, then has each of them fill out and submit
+their forms concurrently, recording the latency, query count and time spent
+waiting on database locks of each request.
+
+Requests are made with the Django test client, so they go through the full
+middleware and view stack, but not a network socket. Each user runs in a
+thread with its own database connection. The POST data is built from the
+same forms that the views render.
+"""
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django import forms
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from model_mommy import mommy
+
+from fyt.applications.forms import AgreementForm, ApplicationForm
+from fyt.applications.models import (
+    ApplicationInformation,
+    CrooSupplement,
+    LeaderSupplement,
+    Question,
+    Volunteer,
+)
+from fyt.applications.views.application import ContinueApplication
+from fyt.core.models import TripsYear
+from fyt.incoming.forms import RegistrationForm
+from fyt.incoming.models import IncomingStudent, Settings
+from fyt.timetable.models import Timetable
+from fyt.trips.models import Section, TripType
+from fyt.users.models import DartmouthUser
+
+
+WORDS = (
+    'trips hiking canoeing climbing outdoors leadership community friends '
+    'dartmouth moosilauke lodge river trail campfire adventure first-year '
+    'students mountain biking kayaking cabin experience wilderness safety'
+).split()
+
+PERCENTILES = [50, 95, 99]
+
+
+def essay(words=100):
+    return ' '.join(random.choice(WORDS) for _ in range(words))
+
+
+def seed(applicants, incoming, sections=6, triptypes=8, questions=5):
+    """
+    Seed the current trips year for the deadline.
+
+    Applications and registrations close an hour from now. Returns the
+    applicant and incoming student users.
+    """
+    trips_year = mommy.make_recipe('fyt.core.trips_year')
+
+    now = timezone.now()
+    Timetable(
+        applications_open=now - timedelta(days=14),
+        applications_close=now + timedelta(hours=1),
+        trippee_registrations_open=now - timedelta(days=14),
+        trippee_registrations_close=now + timedelta(hours=1),
+    ).save()
+    mommy.make(ApplicationInformation, trips_year=trips_year)
+    mommy.make(Settings, trips_year=trips_year)
+
+    for i in range(sections):
+        mommy.make(Section, trips_year=trips_year, name=chr(ord('A') + i))
+    mommy.make(TripType, triptypes, trips_year=trips_year, hidden=False)
+
+    types = [Question.ALL, Question.LEADER, Question.CROO, Question.OPTIONAL]
+    for i in range(questions):
+        mommy.make(Question, trips_year=trips_year, index=i, type=types[i % 4])
+
+    applicant_users = make_users('applicant', applicants)
+    for user in applicant_users:
+        application = Volunteer.objects.create(applicant=user, trips_year=trips_year)
+        LeaderSupplement.objects.create(application=application, trips_year=trips_year)
+        CrooSupplement.objects.create(application=application, trips_year=trips_year)
+
+    incoming_users = make_users('incoming', incoming)
+    for user in incoming_users:
+        mommy.make(IncomingStudent, trips_year=trips_year, netid=user.netid)
+
+    return applicant_users, incoming_users
+
+
+def make_users(name, count):
+    users = []
+    for i in range(count):
+        netid = '{}{}'.format(name, i)
+        users.append(
+            DartmouthUser.objects.create(
+                netid=netid, name=netid, email=netid + '@dartmouth.edu'
+            )
+        )
+    return users
+
+
+def form_data(form, **values):
+    """
+    POST data for a form or formset, as rendered with its initial data.
+
+    ``values`` override the initial data of the named (unprefixed) fields.
+    Any ``PreferenceHandler`` fields are given random choices.
+    """
+    if hasattr(form, 'management_form'):
+        data = form_data(form.management_form)
+        for f in form.forms:
+            data.update(form_data(f))
+        return data
+
+    for handler in vars(form).values():
+        if hasattr(handler, 'formfield_names') and handler.choices:
+            for name in handler.formfield_names():
+                values.setdefault(name, random.choice(handler.choices)[0])
+
+    data = {}
+    for bf in form:
+        value = values.get(bf.name, bf.value())
+        if isinstance(bf.field.widget, forms.CheckboxInput):
+            if value:
+                data[bf.html_name] = 'on'
+        elif value is not None:
+            data[bf.html_name] = value
+    return data
+
+
+class Stats:
+    """
+    Latencies, query counts and lock waits of each endpoint.
+
+    Lock waits are sampled from ``pg_stat_activity``, which shows the
+    endpoint because each request sets its connection's ``application_name``.
+    """
+
+    def __init__(self, sample_interval=0.01):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_waits = defaultdict(float)
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_lock_waits)
+
+    def __enter__(self):
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample_lock_waits(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop.wait(self.sample_interval):
+                    cursor.execute(
+                        "SELECT application_name FROM pg_stat_activity "
+                        "WHERE wait_event_type = 'Lock' "
+                        "AND datname = current_database()"
+                    )
+                    names = cursor.fetchall()
+                    with self._lock:
+                        for (name,) in names:
+                            self.lock_waits[name] += self.sample_interval
+        finally:
+            connection.close()
+
+    def request(self, client, endpoint, method, url, data=None, expect=200):
+        """
+        Make a request with ``client``, recording it under ``endpoint``.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SET application_name = %s', [endpoint])
+
+        count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            latency = time.perf_counter() - start
+
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            self.queries[endpoint].append(count)
+            if response.status_code != expect:
+                self.errors[endpoint] += 1
+
+        return response
+
+    def report(self):
+        """
+        Return an OrderedDict of endpoint -> summary statistics. Latencies
+        and lock waits are in milliseconds.
+        """
+        summary = OrderedDict()
+        with self._lock:
+            for endpoint, latencies in self.latencies.items():
+                latencies = sorted(latencies)
+                queries = self.queries[endpoint]
+                summary[endpoint] = OrderedDict(
+                    [('requests', len(latencies)), ('errors', self.errors[endpoint])]
+                    + [
+                        ('p{}'.format(p), percentile(latencies, p) * 1000)
+                        for p in PERCENTILES
+                    ]
+                    + [
+                        ('queries', sum(queries) / len(queries)),
+                        ('max queries', max(queries)),
+                        ('lock wait', self.lock_waits[endpoint] * 1000),
+                    ]
+                )
+        return summary
+
+
+def percentile(values, p):
+    """
+    The ``p``th percentile of sorted ``values``, by the nearest-rank method.
+    """
+    rank = max(1, -(-len(values) * p // 100))
+    return values[rank - 1]
+
+
+def apply(stats, user):
+    """
+    Save and submit a volunteer application, as an applicant would.
+    """
+    client = Client()
+    client.force_login(user)
+    url = reverse('applications:continue')
+
+    stats.request(client, 'GET continue', 'get', url)
+    view = ContinueApplication(request=SimpleNamespace(user=user))
+    forms = view.get_forms(instances=view.get_instances())
+
+    data = {}
+    for form in forms.values():
+        data.update(form_data(form))
+    data.update(
+        form_data(
+            forms['form'],
+            class_year=2023,
+            gender='NON_BINARY',
+            race_ethnicity='WHITE',
+            hinman_box=str(random.randint(1000, 9999)),
+            tshirt_size='M',
+            hometown='Hanover, NH',
+            leader_willing=True,
+            croo_willing=random.random() < 0.5,
+        )
+    )
+    question_form = forms['question_form']
+    data.update(
+        form_data(
+            question_form,
+            **{
+                name: essay(random.randint(50, 200))
+                for name in question_form.question_handler.formfield_names()
+            }
+        )
+    )
+
+    stats.request(
+        client,
+        'POST continue (save)',
+        'post',
+        url,
+        dict(data, **{ApplicationForm.SAVE_APPLICATION: 'Save'}),
+        expect=302,
+    )
+    stats.request(
+        client,
+        'POST continue (submit)',
+        'post',
+        url,
+        dict(data, **{ApplicationForm.SUBMIT_APPLICATION: 'Submit'}),
+        expect=302,
+    )
+
+    url = reverse('applications:submit')
+    stats.request(client, 'GET submit', 'get', url)
+    data = form_data(
+        AgreementForm(instance=view.object),
+        trippee_confidentiality=True,
+        in_goodstanding_with_college=True,
+        trainings=True,
+    )
+    stats.request(client, 'POST submit', 'post', url, data, expect=302)
+
+
+def register(stats, user):
+    """
+    Register for trips, as an incoming student would.
+    """
+    client = Client()
+    client.force_login(user)
+    url = reverse('incoming:register')
+
+    stats.request(client, 'GET register', 'get', url)
+    data = form_data(
+        RegistrationForm(trips_year=TripsYear.objects.current()),
+        name=user.name,
+        gender='female',
+        previous_school='Hanover High School',
+        phone='603-646-1234',
+        email=user.email,
+        tshirt_size='M',
+        regular_exercise=True,
+        swimming_ability='BEGINNER',
+        camping_experience=True,
+        hiking_experience=True,
+        financial_assistance=False,
+        waiver=True,
+        doc_membership=False,
+        green_fund_donation=0,
+    )
+    stats.request(client, 'POST register', 'post', url, data, expect=302)
+
+
+def _run(scenario, stats, user):
+    try:
+        scenario(stats, user)
+    finally:
+        connection.close()
+
+
+def run(applicants, incoming, concurrency=50):
+    """
+    Run the application and registration scenarios for the seeded users.
+
+    Returns the ``Stats`` of the run.
+    """
+    tasks = [(apply, user) for user in applicants] + [
+        (register, user) for user in incoming
+    ]
+    random.shuffle(tasks)
+
+    with Stats() as stats:
+        if concurrency == 1:
+            for scenario, user in tasks:
+                scenario(stats, user)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = [
+                    executor.submit(_run, scenario, stats, user)
+                    for scenario, user in tasks
+                ]
+                for future in futures:
+                    future.result()
+
+    return stats
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from fyt.core import loadtest
+
+
+LOCMEM_EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate the application and registration deadline rush against a "
+        "freshly seeded test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--applicants', type=int, default=200, help='Number of applicants.'
+        )
+        parser.add_argument(
+            '--incoming', type=int, default=200, help='Number of incoming students.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=50,
+            help='Number of users making requests at the same time.',
+        )
+        parser.add_argument(
+            '--noinput',
+            '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Destroy an existing test database without asking.',
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(
+            verbosity=options['verbosity'],
+            autoclobber=not options['interactive'],
+            serialize=False,
+        )
+        try:
+            self.stdout.write('Seeding applicants and incoming students...')
+            applicants, incoming = loadtest.seed(
+                options['applicants'], options['incoming']
+            )
+
+            self.stdout.write('Running...')
+            # Don't send emails or render the debug toolbar
+            with override_settings(DEBUG=False, EMAIL_BACKEND=LOCMEM_EMAIL_BACKEND):
+                stats = loadtest.run(
+                    applicants, incoming, concurrency=options['concurrency']
+                )
+            self.write_report(stats.report())
+        finally:
+            connection.creation.destroy_test_db(old_name, options['verbosity'])
+
+    def write_report(self, report):
+        columns = ['requests', 'errors', 'p50', 'p95', 'p99', 'queries']
+        columns += ['max queries', 'lock wait']
+        row = '{:<24}' + '{:>13}' * len(columns)
+
+        self.stdout.write('Latencies and lock waits are in milliseconds')
+        self.stdout.write(row.format('endpoint', *columns))
+        for endpoint, stats in report.items():
+            values = [stats[column] for column in columns]
+            self.stdout.write(
+                row.format(
+                    endpoint,
+                    *('{:.1f}'.format(v) if isinstance(v, float) else v for v in values)
+                )
+            )
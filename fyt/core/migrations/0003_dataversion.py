@@ -0,0 +1,26 @@
+# Generated by Django 2.2.6 on 2026-10-19 04:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20180719_1052'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=255)),
+                ('version', models.BigIntegerField()),
+                ('trips_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.TripsYear')),
+            ],
+            options={
+                'unique_together': {('trips_year', 'model')},
+            },
+        ),
+    ]
@@ -1,9 +1,55 @@
+from functools import lru_cache
+
 from django.db import models
-from django.urls import reverse
+from django.urls import get_script_prefix, get_urlconf, reverse
 
 from fyt.core.managers import TripsYearManager
 
 
+# An arbitrary pk which is swapped out of memoized urls
+_PK_PLACEHOLDER = 987654321
+
+
+@lru_cache(maxsize=None)
+def _url_format(urlpattern, trips_year, script_prefix, urlconf):
+    url = reverse(
+        urlpattern,
+        urlconf=urlconf,
+        kwargs={'trips_year': trips_year, 'pk': _PK_PLACEHOLDER},
+    )
+    return url.replace(str(_PK_PLACEHOLDER), '{pk}')
+
+
+def reverse_object_url(urlpattern, trips_year, pk):
+    """
+    Reverse the url of a single database object.
+
+    Each url pattern is only reversed once per ``trips_year``, so building
+    links for every cell of a large matrix is just string formatting.
+    """
+    fmt = _url_format(urlpattern, trips_year, get_script_prefix(), get_urlconf())
+    return fmt.format(pk=pk)
+
+
+class DataVersion(models.Model):
+    """
+    The version counter of a model in a trips year.
+
+    See ``fyt.utils.cache``. The counters are kept in the database so that
+    every process sees the same version.
+    """
+
+    class Meta:
+        unique_together = ['trips_year', 'model']
+
+    trips_year = models.ForeignKey('TripsYear', on_delete=models.CASCADE)
+    model = models.CharField(max_length=255)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return '{} {}: {}'.format(self.trips_year_id, self.model, self.version)
+
+
 class TripsYear(models.Model):
     """
     Global config object. Each year of trips has one such object.
@@ -53,19 +99,13 @@ class DatabaseModel(models.Model):
         return self.detail_url()
 
     def detail_url(self):
-        return reverse(
-            'core:{}:detail'.format(self.model_name_lower()), kwargs=self.obj_kwargs()
-        )
+        return self._object_url('detail')
 
     def update_url(self):
-        return reverse(
-            'core:{}:update'.format(self.model_name_lower()), kwargs=self.obj_kwargs()
-        )
+        return self._object_url('update')
 
     def delete_url(self):
-        return reverse(
-            'core:{}:delete'.format(self.model_name_lower()), kwargs=self.obj_kwargs()
-        )
+        return self._object_url('delete')
 
     def index_url(self):
         return reverse(
@@ -87,3 +127,10 @@ class DatabaseModel(models.Model):
 
     def obj_kwargs(self):
         return {'trips_year': self.trips_year_id, 'pk': self.pk}
+
+    def _object_url(self, view):
+        return reverse_object_url(
+            'core:{}:{}'.format(self.model_name_lower(), view),
+            self.trips_year_id,
+            self.pk,
+        )
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from fyt.core.models import DatabaseModel
+from fyt.utils.cache import bump_data_version
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_data_version_for_changes(sender, instance, raw=False, **kwargs):
+    """
+    Invalidate cached fragments which depend on the changed model.
+    """
+    if isinstance(instance, DatabaseModel) and not raw:
+        bump_data_version(instance.trips_year_id, sender)
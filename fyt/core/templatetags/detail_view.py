@@ -1,5 +1,8 @@
+from functools import lru_cache
+
 from django import template
 from django.db import models
+from django.db.models import prefetch_related_objects
 from django.db.models.fields import FieldDoesNotExist
 
 from fyt.core.templatetags.links import *
@@ -9,23 +12,82 @@ from fyt.users.models import DartmouthUser
 register = template.Library()
 
 
-@register.simple_tag
-def detail(db_object, fields=None):
-    """
-    Output a generic detail view of a database object.
+FILE_TEMPLATE = """<a href="{{ file.url }}">{{ file }}</a>"""
 
-    Fields is an iterable of strings. Each string is either the
-    name of a field or a method of the object. Fields can be
-    passed as (label, accessor) tuples, eg ('Section', 'get_section_name').
+RELATED_TEMPLATE = """{% for o in queryset %} <a href="{{ o.get_absolute_url }}"> {{ o }}</a>{% if not forloop.last %},{% endif %}{% endfor %}"""
+
+
+@lru_cache(maxsize=None)
+def compiled_template(source):
+    return template.Template(source)
+
+
+def _render_attribute(value):
+    # Handle related managers
+    if isinstance(value, models.Manager):
+        value = value.all()
+    elif callable(value):
+        value = value()
+    # Else, use the raw value
+
+    # Link to object, if possible
+    # (Added for Registration section & triptype M2M fields)
+    try:
+        return detail_link(value)
+    except AttributeError:
+        return value
+
+
+def _render_file(value):
+    if not value:
+        return value
+    return compiled_template(FILE_TEMPLATE).render(template.Context({'file': value}))
+
+
+def _render_user(value):
+    # no detail views for users.
+    return str(value)
+
+
+def _render_link(value):
+    if value is None:
+        return value
+    return detail_link(value)
+
+
+def _render_many(value):
+    return compiled_template(RELATED_TEMPLATE).render(
+        template.Context({'queryset': value.all()})
+    )
+
+
+def _render_boolean(value):
+    return 'yes' if value else 'no'
+
+
+def _render_value(value):
+    return value
+
+
+class DetailRenderer:
     """
+    Renders the detail view of a list of fields of a model.
 
-    # TODO: fix this
-    if not fields:
-        fields = db_object._meta.get_all_field_names()
+    The fields are resolved against the model once, when the renderer is
+    built. The renderer also knows which relations the fields traverse, so
+    they can be loaded with ``select_related`` and ``prefetch_related``
+    instead of with a query for each field.
+    """
 
-    display_fields = []
-    for field_name in fields:
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = []
+        self.select_related = []
+        self.prefetch_related = []
+        for field_name in fields:
+            self.add_field(field_name)
 
+    def add_field(self, field_name):
         # allow tuple of (name, accessor) in the field list
         if isinstance(field_name, tuple) and len(field_name) == 2:
             (label, field_name) = field_name
@@ -33,75 +95,107 @@ def detail(db_object, fields=None):
             label = None
 
         if field_name in ['id', 'trips_year'] or field_name.endswith('_id'):
-            continue
-
-        # Implement multi-object lookups
-        if '__' in field_name:
-            value = db_object
-            for intermediate in field_name.split('__'):
-                field = value._meta.get_field(intermediate)
-                value = getattr(value, intermediate)
-        else:
-            try:
-                field = db_object._meta.get_field(field_name)
-                value = getattr(db_object, field_name)
-            except FieldDoesNotExist:
-
-                value = getattr(db_object, field_name)
-
-                # Handle related managers
-                if isinstance(value, models.Manager):
-                    value = value.all()
-                elif callable(value):
-                    value = value()
-                # Else, use the raw value
-
-                # Link to object, if possible
-                # (Added for Registration section & triptype M2M fields)
-                try:
-                    value = detail_link(value)
-                except AttributeError:
-                    pass
-
-                if label is None:
-                    label = field_name
-                display_fields.append((label, value))
-                continue
-
-        if isinstance(field, models.FileField) and value:
-            t = template.Template("""<a href="{{ file.url }}">{{ file }}</a>""")
-            c = template.Context({'file': value})
-            value = t.render(c)
-
-        if field.many_to_one or field.one_to_one:
+            return
+
+        path = field_name.split('__')
+        try:
+            # Implement multi-object lookups
+            model = self.model
+            for intermediate in path:
+                field = model._meta.get_field(intermediate)
+                model = field.related_model
+        except FieldDoesNotExist:
+            if len(path) > 1:
+                raise
+            self.fields.append((label or field_name, path, _render_attribute))
+            return
+
+        if isinstance(field, models.FileField):
+            render = _render_file
+        elif field.many_to_one or field.one_to_one:
             if field.related_model == DartmouthUser:
-                # no detail views for users.
-                value = str(value)
-
-            elif value is not None:
-                value = detail_link(value)
+                render = _render_user
+            else:
+                render = _render_link
+        elif field.many_to_many or field.one_to_many:
+            render = _render_many
+        elif isinstance(field, models.BooleanField):
+            render = _render_boolean
+        else:
+            render = _render_value
 
-        if field.is_relation:
+        if label is None:
             # related objects don't have a verbose_name
-            if not hasattr(field, 'verbose_name'):
-                field.verbose_name = field.get_accessor_name()
+            if hasattr(field, 'verbose_name'):
+                label = field.verbose_name
+            else:
+                label = field.get_accessor_name()
 
+        self.fields.append((label, path, render))
+        self.add_lookup(path, field)
+
+    def add_lookup(self, path, field):
         if field.many_to_many or field.one_to_many:
-            t = template.Template(
-                """{% for o in queryset %} <a href="{{ o.get_absolute_url }}"> {{ o }}</a>{% if not forloop.last %},{% endif %}{% endfor %}"""
-            )
-            c = template.Context({'queryset': value.get_queryset()})
-            value = t.render(c)
-
-        if isinstance(field, models.BooleanField):
-            if value:
-                value = "yes"
-            else:
-                value = "no"
+            self.prefetch_related.append('__'.join(path))
+            return
 
-        if label is None:
-            label = field.verbose_name
-        display_fields.append((label, value))
+        if not field.is_relation:
+            path = path[:-1]
+        if path:
+            self.select_related.append('__'.join(path))
+
+    def optimize(self, queryset):
+        """
+        Load the relations traversed by the fields along with ``queryset``.
+        """
+        return queryset.select_related(*self.select_related).prefetch_related(
+            *self.prefetch_related
+        )
+
+    def resolve(self, db_object, path):
+        value = db_object
+        for intermediate in path:
+            if value is None:
+                return None
+            value = getattr(value, intermediate)
+        return value
+
+    def render(self, db_object):
+        # Many-valued relations which were already loaded by ``optimize``
+        # are not fetched again.
+        prefetch_related_objects([db_object], *self.prefetch_related)
+
+        display_fields = []
+        for label, path, render in self.fields:
+            display_fields.append((label, render(self.resolve(db_object, path))))
+
+        t = template.loader.get_template('core/_detail_view_tag.html')
+        return t.render({'fields': display_fields})
+
+
+@lru_cache(maxsize=None)
+def _detail_renderer(model, fields):
+    return DetailRenderer(model, fields)
+
+
+def detail_renderer(model, fields):
+    """
+    The ``DetailRenderer`` of ``fields`` of ``model``, which is only built
+    once per process.
+    """
+    return _detail_renderer(model, tuple(fields))
+
+
+@register.simple_tag
+def detail(db_object, fields=None):
+    """
+    Output a generic detail view of a database object.
+
+    Fields is an iterable of strings. Each string is either the
+    name of a field or a method of the object. Fields can be
+    passed as (label, accessor) tuples, eg ('Section', 'get_section_name').
+    """
+    if not fields:
+        fields = [field.name for field in db_object._meta.fields]
 
-    t = template.loader.get_template('core/_detail_view_tag.html')
-    return t.render({'fields': display_fields})
+    return detail_renderer(type(db_object), fields).render(db_object)
@@ -0,0 +1,37 @@
+from fyt.applications.models import Volunteer
+from fyt.core import loadtest
+from fyt.incoming.models import Registration
+from fyt.test import FytTestCase
+
+
+class LoadTestTestCase(FytTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 95), 95)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([7], 99), 7)
+
+    def test_scenarios_submit_applications_and_registrations(self):
+        applicants, incoming = loadtest.seed(2, 2)
+        stats = loadtest.run(applicants, incoming, concurrency=1)
+
+        self.assertEqual(Volunteer.objects.filter(submitted__isnull=False).count(), 2)
+        self.assertEqual(Registration.objects.count(), 2)
+
+        report = stats.report()
+        self.assertEqual(
+            set(report),
+            {
+                'GET continue',
+                'POST continue (save)',
+                'POST continue (submit)',
+                'GET submit',
+                'POST submit',
+                'GET register',
+                'POST register',
+            },
+        )
+        for endpoint in report.values():
+            self.assertEqual(endpoint['errors'], 0)
+            self.assertEqual(endpoint['requests'], 2)
@@ -3,9 +3,11 @@ import unittest
 from django.template import Context, Template
 from model_mommy import mommy
 
+from fyt.core.templatetags.detail_view import detail_renderer
 from fyt.core.templatetags.links import pass_null
+from fyt.incoming.models import IncomingStudent
 from fyt.test import FytTestCase
-from fyt.trips.models import Section
+from fyt.trips.models import Section, Trip
 
 
 class NullPassThroughDecorator(unittest.TestCase):
@@ -72,3 +74,67 @@ class LinkTagTestCase(FytTestCase):
             Context({'model': Section, 'trips_year': trips_year})
         )
         self.assertEqual(out, obj.create_url(trips_year))
+
+
+class DetailTagTestCase(FytTestCase):
+    fields = [
+        'section',
+        'template__triptype',
+        'template__swimtest_required',
+        'trippees',
+        ('Dropoff', 'get_dropoff_route'),
+    ]
+
+    def setUp(self):
+        self.init_trips_year()
+        self.trip = mommy.make(Trip, trips_year=self.trips_year)
+
+    def render(self, trip):
+        return Template("{% load detail_view %}{% detail trip fields %}").render(
+            Context({'trip': trip, 'fields': self.fields})
+        )
+
+    def test_detail(self):
+        trippee = mommy.make(
+            IncomingStudent, trips_year=self.trips_year, trip_assignment=self.trip
+        )
+        out = self.render(self.trip)
+        self.assertInHTML('<strong>Section</strong>', out)
+        self.assertIn(self.trip.section.detail_url(), out)
+        self.assertIn(self.trip.template.triptype.detail_url(), out)
+        self.assertIn('<strong>Swimtest required</strong>', out)
+        self.assertIn('<strong>Trippees</strong>', out)
+        self.assertIn(
+            '<a href="{}"> {}</a>'.format(trippee.get_absolute_url(), trippee), out
+        )
+        self.assertIn('<strong>Dropoff</strong>', out)
+
+    def test_renderer_is_cached(self):
+        self.assertIs(
+            detail_renderer(Trip, self.fields), detail_renderer(Trip, self.fields)
+        )
+
+    def test_renderer_plans_lookups(self):
+        renderer = detail_renderer(Trip, self.fields)
+        self.assertEqual(
+            renderer.select_related, ['section', 'template__triptype', 'template']
+        )
+        self.assertEqual(renderer.prefetch_related, ['trippees'])
+
+    def test_constant_queries(self):
+        mommy.make(
+            IncomingStudent, trips_year=self.trips_year, trip_assignment=self.trip
+        )
+        with self.assertNumQueries(4):
+            self.render(Trip.objects.get(pk=self.trip.pk))
+
+        mommy.make(
+            IncomingStudent, 5, trips_year=self.trips_year, trip_assignment=self.trip
+        )
+        with self.assertNumQueries(4):
+            self.render(Trip.objects.get(pk=self.trip.pk))
+
+        renderer = detail_renderer(Trip, self.fields)
+        trip = renderer.optimize(Trip.objects.all()).get(pk=self.trip.pk)
+        with self.assertNumQueries(1):  # dropoff route
+            self.render(trip)
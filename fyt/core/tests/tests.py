@@ -1,14 +1,17 @@
 import io
 
+from django.core.cache import cache
 from django.core.management import call_command
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
+from django.test import TransactionTestCase
 from django.urls import reverse
 from model_mommy import mommy
 
 from fyt.core.forms import tripsyear_modelform_factory
 from fyt.core.models import TripsYear
-from fyt.test import FytTestCase
-from fyt.trips.models import Campsite, TripTemplate
+from fyt.test import FytTestCase, run_concurrently
+from fyt.trips.models import Campsite, Section, Trip, TripTemplate
+from fyt.utils.cache import data_version
 
 
 class InitialDataTestCase(FytTestCase):
@@ -32,6 +35,85 @@ class DatabaseModelTestCase(FytTestCase):
         triptemplate = TripTemplate.objects.defer('name').get()
         self.assertEqual(triptemplate.model_name_lower(), 'triptemplate')
 
+    def test_object_urls(self):
+        trips_year = self.init_trips_year()
+        campsite = mommy.make(Campsite, trips_year=trips_year)
+        kwargs = {'trips_year': trips_year.pk, 'pk': campsite.pk}
+        self.assertEqual(
+            campsite.detail_url(), reverse('core:campsite:detail', kwargs=kwargs)
+        )
+        self.assertEqual(
+            campsite.update_url(), reverse('core:campsite:update', kwargs=kwargs)
+        )
+        self.assertEqual(
+            campsite.delete_url(), reverse('core:campsite:delete', kwargs=kwargs)
+        )
+
+
+class DataVersionTestCase(FytTestCase):
+    def test_version_changes_on_save_and_delete(self):
+        trips_year = self.init_trips_year()
+        version = data_version(trips_year, Campsite)
+        self.assertEqual(version, data_version(trips_year, Campsite))
+
+        campsite = mommy.make(Campsite, trips_year=trips_year)
+        # The version is bumped once the change is committed
+        self.assertEqual(version, data_version(trips_year, Campsite))
+        self.run_commit_hooks()
+        saved = data_version(trips_year, Campsite)
+        self.assertNotEqual(version, saved)
+
+        campsite.delete()
+        self.run_commit_hooks()
+        self.assertNotEqual(saved, data_version(trips_year, Campsite))
+
+    def test_version_is_shared_by_processes(self):
+        trips_year = self.init_trips_year()
+        mommy.make(Campsite, trips_year=trips_year)
+        self.run_commit_hooks()
+        version = data_version(trips_year, Campsite)
+        # Another process has its own cache, but reads the same version
+        cache.clear()
+        self.assertEqual(version, data_version(trips_year, Campsite))
+
+    def test_version_is_per_model(self):
+        trips_year = self.init_trips_year()
+        version = data_version(trips_year, Campsite)
+        mommy.make(Section, trips_year=trips_year)
+        self.assertEqual(version, data_version(trips_year, Campsite))
+
+    def test_cached_matrix_fragment(self):
+        trips_year = self.init_trips_year()
+        director = self.make_director()
+        campsite = mommy.make(Campsite, trips_year=trips_year, name='Moose')
+        url = reverse('core:campsite:index', kwargs={'trips_year': trips_year})
+
+        self.assertIn('Moose', self.app.get(url, user=director))
+        with self.assertNumQueries(8):
+            self.assertIn('Moose', self.app.get(url, user=director))
+
+        campsite.name = 'Bear'
+        campsite.save()
+        self.run_commit_hooks()
+        self.assertIn('Bear', self.app.get(url, user=director))
+
+
+class ConcurrentDataVersionTestCase(TransactionTestCase):
+    def test_writers_do_not_wait_for_each_other(self):
+        trips_year = mommy.make(TripsYear, year=2014, is_current=True)
+        mommy.make(Campsite, trips_year=trips_year)
+        version = data_version(trips_year, Campsite)
+
+        def save_campsite():
+            with connection.cursor() as cursor:
+                cursor.execute("SET lock_timeout = '1s'")
+            mommy.make(Campsite, trips_year=trips_year)
+
+        with transaction.atomic():
+            mommy.make(Campsite, trips_year=trips_year)
+            run_concurrently(save_campsite)
+        self.assertEqual(int(data_version(trips_year, Campsite)), int(version) + 2)
+
 
 class DatabaseMixinTestCase(FytTestCase):
     """ DatabaseMixin integration tests """
@@ -1,4 +1,6 @@
+import hashlib
 import logging
+from urllib.parse import urlencode
 
 from braces.views import FormInvalidMessageMixin, SetHeadlineMixin
 from crispy_forms.bootstrap import FormActions
@@ -6,12 +8,15 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import HTML, Submit
 from django import forms
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.exceptions import NON_FIELD_ERRORS, ImproperlyConfigured
 from django.db import IntegrityError, models, transaction
+from django.db.models.fields import FieldDoesNotExist
 from django.http import Http404, HttpResponseRedirect
 from django.urls import reverse, reverse_lazy
 from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
+from django_tables2.rows import BoundRows
 from vanilla import (
     CreateView,
     DeleteView,
@@ -27,11 +32,14 @@ from . import forward
 from .forms import tripsyear_modelform_factory
 from .models import TripsYear
 
+from fyt.core.templatetags.detail_view import detail_renderer
 from fyt.permissions.views import (
     DatabaseEditPermissionRequired,
     DatabaseReadPermissionRequired,
     SettingsPermissionRequired,
 )
+from fyt.utils.cache import data_version
+from fyt.utils.pagination import KeysetPaginator
 from fyt.utils.views import CrispyFormMixin, ExtraContextMixin, SetExplanationMixin
 
 
@@ -147,6 +155,117 @@ class TripsYearMixin:
         return context
 
 
+class DataVersionMixin:
+    """
+    Mixin for views with ``{% cache %}`` fragments.
+
+    Adds a ``data_version`` to the context which changes whenever an object
+    of one of the ``version_models`` is saved or deleted in the
+    ``trips_year``, and a default ``cache_timeout`` for the fragments.
+
+    Pass expensive context as ``SimpleLazyObject`` so that it is only
+    computed when the fragment is not already cached.
+    """
+
+    version_models = []
+    cache_timeout = 60 * 60 * 24
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['data_version'] = data_version(self.trips_year, *self.version_models)
+        context['cache_timeout'] = self.cache_timeout
+        return context
+
+
+class TableListMixin:
+    """
+    Mixin for list views which display a filtered django-tables2 table.
+
+    ``paginate_table`` loads a single page of the table, found by keyset on
+    the columns the table is sorted by, and ``get_count`` caches the number
+    of filtered objects until an object of one of the ``version_models`` is
+    saved or deleted in the ``trips_year``.
+
+    If ``only_fields`` is not None, only the fields displayed by the table's
+    columns are loaded, along with ``only_fields``. List any fields used by
+    render methods or properties in ``only_fields``.
+    """
+
+    table_page_size = 100
+    cursor_kwarg = 'after'
+    version_models = []
+    count_cache_timeout = 60 * 60
+    only_fields = None
+
+    def paginate_table(self, table):
+        """
+        Replace the rows of ``table`` with a page of rows.
+
+        The table must be ordered by ``RequestConfig`` before it is paginated.
+        """
+        queryset = table.data.data
+        if self.only_fields is not None:
+            queryset = queryset.only(*table_fields(table), *self.only_fields)
+
+        paginator = KeysetPaginator(queryset, self.table_page_size)
+        table.page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        table.page.cursor_kwarg = self.cursor_kwarg
+        table.page.object_list = BoundRows(data=table.page.object_list, table=table)
+        table.template_name = 'core/_table.html'
+        return table
+
+    def get_count(self, queryset):
+        """
+        The number of objects in ``queryset``, which is filtered by the
+        request's query parameters.
+        """
+        params = self.request.GET.copy()
+        for name in [self.cursor_kwarg, 'sort']:
+            params.pop(name, None)
+        signature = hashlib.md5(
+            urlencode(sorted(params.lists()), doseq=True).encode()
+        ).hexdigest()
+        key = 'list-count:{}:{}:{}:{}'.format(
+            self.model._meta.label,
+            self.trips_year.pk,
+            signature,
+            data_version(self.trips_year, self.model, *self.version_models),
+        )
+
+        count = cache.get(key)
+        if count is None:
+            count = queryset.order_by().values('pk').count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+
+def table_fields(table):
+    """
+    The field lookups of the model of ``table`` which its columns display.
+
+    Columns which access methods or properties are skipped, as are any
+    parts of the accessor after a method or property.
+    """
+    fields = []
+    for column in table.columns:
+        opts = table.data.model._meta
+        path = []
+        for name in column.accessor.split('.'):
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                break
+            if not field.concrete:
+                break
+            path.append(name)
+            if not field.is_relation:
+                break
+            opts = field.related_model._meta
+        if path:
+            fields.append('__'.join(path))
+    return fields
+
+
 class DatabaseListView(
     DatabaseReadPermissionRequired, ExtraContextMixin, TripsYearMixin, ListView
 ):
@@ -303,6 +422,12 @@ class DatabaseDetailView(
     # Fields to display in the view. Passed in the template.
     fields = None
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.fields:
+            qs = detail_renderer(self.model, self.fields).optimize(qs)
+        return qs
+
     def get_context_data(self, **kwargs):
         kwargs['update_url'] = self.object.update_url()
         kwargs['delete_url'] = self.object.delete_url()
@@ -50,7 +50,6 @@ class OneWayStopChoiceField(forms.ModelChoiceField):
 
 class SectionPreferenceHandler(PreferenceHandler):
     through_qs_name = 'registrationsectionchoice_set'
-    through_creator = 'set_section_preference'
     data_field = 'preference'
     target_field = 'section'
     choices = REGISTRATION_SECTION_CHOICES
@@ -62,7 +61,6 @@ class SectionPreferenceHandler(PreferenceHandler):
 
 class TripTypePreferenceHandler(PreferenceHandler):
     through_qs_name = 'registrationtriptypechoice_set'
-    through_creator = 'set_triptype_preference'
     data_field = 'preference'
     target_field = 'triptype'
     choices = REGISTRATION_TRIPTYPE_CHOICES
@@ -1,9 +1,11 @@
 import csv
 
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
 
 from fyt.core.models import TripsYear
+from fyt.utils.cache import data_version
 
 
 def get_netids(incoming_students):
@@ -11,7 +13,94 @@ def get_netids(incoming_students):
     return set(x.netid for x in incoming_students)
 
 
-class IncomingStudentManager(models.Manager):
+# Charges are in dollars and cents
+MONEY = models.DecimalField(max_digits=8, decimal_places=2)
+
+CHARGE_FIELDS = ['trip', 'bus', 'doc_membership', 'green_fund', 'cancellation']
+
+
+def _money(value):
+    return Cast(value, MONEY)
+
+
+def _adjust(value):
+    """
+    Adjust a cost by each trippee's financial aid.
+    """
+    return _money(
+        ExpressionWrapper(
+            _money(value) * (100 - F('financial_aid')) / 100, output_field=MONEY
+        )
+    )
+
+
+class IncomingStudentQuerySet(models.QuerySet):
+    def charged(self):
+        """
+        All trippees who are charged for trips, a DOC membership, or a
+        green fund donation.
+        """
+        return self.filter(
+            Q(trip_assignment__isnull=False)
+            | Q(cancelled=True)
+            | Q(registration__doc_membership=True)
+            | Q(registration__green_fund_donation__gt=0)
+        )
+
+    def with_charges(self, costs):
+        """
+        Annotate the charges to each trippee, as computed by
+        ``IncomingStudent.compute_cost``, as ``<field>_charge`` for each
+        field in ``CHARGE_FIELDS`` and the sum of them as ``total_charge``.
+
+        ``costs`` is a ``Settings`` instance
+        """
+        zero = _money(Value(0))
+        trips_cost = _adjust(Value(costs.trips_cost))
+
+        return self.annotate(
+            trip_charge=Case(
+                When(trip_assignment__isnull=False, then=trips_cost),
+                default=zero,
+                output_field=MONEY,
+            ),
+            bus_charge=Case(
+                When(
+                    bus_assignment_round_trip__isnull=False,
+                    then=_adjust(
+                        Coalesce('bus_assignment_round_trip__cost_round_trip', 0)
+                    ),
+                ),
+                default=_adjust(
+                    Coalesce('bus_assignment_to_hanover__cost_one_way', 0)
+                    + Coalesce('bus_assignment_from_hanover__cost_one_way', 0)
+                ),
+                output_field=MONEY,
+            ),
+            doc_membership_charge=Case(
+                When(
+                    registration__doc_membership=True,
+                    then=_adjust(Value(costs.doc_membership_cost)),
+                ),
+                default=zero,
+                output_field=MONEY,
+            ),
+            green_fund_charge=_money(Coalesce('registration__green_fund_donation', 0)),
+            cancellation_charge=Case(
+                When(cancelled=False, then=zero),
+                When(cancelled_fee__isnull=True, then=trips_cost),
+                default=_money('cancelled_fee'),
+                output_field=MONEY,
+            ),
+        ).annotate(
+            total_charge=sum(
+                (F('{}_charge'.format(field)) for field in CHARGE_FIELDS[1:]),
+                F('trip_charge'),
+            )
+        )
+
+
+class BaseIncomingStudentManager(models.Manager):
     def unregistered(self, trips_year):
         return self.filter(trips_year=trips_year, registration__isnull=True)
 
@@ -180,6 +269,87 @@ class IncomingStudentManager(models.Manager):
         return self.filter(trips_year=trips_year, cancelled=True)
 
 
+IncomingStudentManager = BaseIncomingStudentManager.from_queryset(
+    IncomingStudentQuerySet
+)
+
+
+class ChargeQuerySet(models.QuerySet):
+    def totals(self):
+        """
+        The sum of each charge, and of the total charges.
+        """
+        totals = self.aggregate(
+            total=Sum('total'), **{field: Sum(field) for field in CHARGE_FIELDS}
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+
+class BaseChargeManager(models.Manager):
+    def snapshot(self, trips_year):
+        """
+        Replace the charges for ``trips_year`` with the charges to each
+        trippee as they are now.
+
+        The ``Settings`` row of the year is locked while the ledger is
+        replaced, so that concurrent snapshots run one after the other.
+        """
+        from fyt.incoming.models import IncomingStudent, Settings
+
+        with transaction.atomic():
+            costs = Settings.objects.select_for_update().get(trips_year=trips_year)
+            version = self.ledger_version(trips_year)
+            fields = ['{}_charge'.format(field) for field in CHARGE_FIELDS]
+            students = (
+                IncomingStudent.objects.filter(trips_year=trips_year)
+                .charged()
+                .with_charges(costs)
+                .order_by()
+                .values_list('pk', 'financial_aid', 'total_charge', *fields)
+            )
+
+            charges = [
+                self.model(
+                    trips_year=trips_year,
+                    incoming_student_id=pk,
+                    version=version,
+                    financial_aid=financial_aid,
+                    total=total,
+                    **dict(zip(CHARGE_FIELDS, values))
+                )
+                for pk, financial_aid, total, *values in students
+            ]
+            self.filter(trips_year=trips_year).delete()
+            return self.bulk_create(charges)
+
+    def ledger_version(self, trips_year):
+        """
+        The data version of everything which charges are computed from.
+        """
+        from fyt.incoming.models import IncomingStudent, Registration, Settings
+        from fyt.transport.models import Stop
+        from fyt.trips.models import Trip
+
+        return data_version(
+            trips_year, IncomingStudent, Registration, Settings, Trip, Stop
+        )
+
+    def is_stale(self, trips_year):
+        """
+        Whether the charges may have changed since the last snapshot of
+        ``trips_year``.
+        """
+        from fyt.incoming.models import IncomingStudent
+
+        charges = self.filter(trips_year=trips_year)
+        if charges.exists():
+            return not charges.filter(version=self.ledger_version(trips_year)).exists()
+        return IncomingStudent.objects.filter(trips_year=trips_year).charged().exists()
+
+
+ChargeManager = BaseChargeManager.from_queryset(ChargeQuerySet)
+
+
 class RegistrationManager(models.Manager):
     def get_queryset(self):
         qs = super().get_queryset()
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.6 on 2026-10-19 03:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20180719_1052'),
+        ('incoming', '0038_auto_20190524_0723'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Charge',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(editable=False, max_length=255)),
+                ('financial_aid', models.PositiveSmallIntegerField()),
+                ('trip', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('bus', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('doc_membership', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('green_fund', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('cancellation', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('incoming_student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='charge', to='incoming.IncomingStudent')),
+                ('trips_year', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, to='core.TripsYear')),
+            ],
+            options={
+                'ordering': ['incoming_student__name'],
+            },
+        ),
+    ]
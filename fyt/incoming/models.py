@@ -8,7 +8,7 @@ from django.db import models
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
-from .managers import IncomingStudentManager, RegistrationManager
+from .managers import ChargeManager, IncomingStudentManager, RegistrationManager
 
 from fyt.core.models import DatabaseModel
 from fyt.trips.models import Section, Trip, TripType
@@ -808,3 +808,34 @@ class Settings(DatabaseModel):
 
     class Meta:
         unique_together = ['trips_year']
+
+
+class Charge(DatabaseModel):
+    """
+    A snapshot of the charges to a trippee, which is exported to the bursar.
+
+    The ledger for a trips year is replaced by ``Charge.objects.snapshot``,
+    which is run from the trippee index or by the report worker. ``version``
+    is the data version of the trippees, their registrations, trips, bus
+    stops and costs when the snapshot was taken.
+    """
+
+    objects = ChargeManager()
+
+    class Meta:
+        ordering = ['incoming_student__name']
+
+    incoming_student = models.OneToOneField(
+        IncomingStudent, on_delete=models.CASCADE, related_name='charge'
+    )
+    version = models.CharField(max_length=255, editable=False)
+    financial_aid = models.PositiveSmallIntegerField()
+    trip = models.DecimalField(max_digits=8, decimal_places=2)
+    bus = models.DecimalField(max_digits=8, decimal_places=2)
+    doc_membership = models.DecimalField(max_digits=8, decimal_places=2)
+    green_fund = models.DecimalField(max_digits=8, decimal_places=2)
+    cancellation = models.DecimalField(max_digits=8, decimal_places=2)
+    total = models.DecimalField(max_digits=8, decimal_places=2)
+
+    def __str__(self):
+        return '{}: ${}'.format(self.incoming_student, self.total)
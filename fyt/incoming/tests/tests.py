@@ -1,19 +1,24 @@
 import os
 from datetime import date, timedelta
+from decimal import Decimal
 
 import pyexcel
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from model_mommy import mommy
 
+from fyt.core.models import TripsYear
 from fyt.incoming.forms import PyExcelFileForm, RegistrationForm
 from fyt.incoming.models import (
     AVAILABLE,
     FIRST_CHOICE,
     NOT_AVAILABLE,
     PREFER,
+    Charge,
     IncomingStudent,
     Registration,
     RegistrationSectionChoice,
@@ -21,7 +26,7 @@ from fyt.incoming.models import (
     Settings,
     sort_by_lastname,
 )
-from fyt.test import FytTestCase
+from fyt.test import FytTestCase, run_concurrently
 from fyt.timetable.models import Timetable
 from fyt.transport.models import Route, Stop
 from fyt.trips.models import Section, Trip, TripType
@@ -820,6 +825,121 @@ class IncomingStudentsManagerTestCase(FytTestCase):
         )
 
 
+class ChargeTestCase(FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.costs = mommy.make(
+            Settings, trips_year=self.trips_year, trips_cost=250, doc_membership_cost=91
+        )
+        self.students = [
+            mommy.make(
+                IncomingStudent,
+                trips_year=self.trips_year,
+                trip_assignment__trips_year=self.trips_year,
+                bus_assignment_round_trip__cost_round_trip=100,
+                financial_aid=15,
+                registration__doc_membership=True,
+                registration__green_fund_donation=20,
+            ),
+            mommy.make(
+                IncomingStudent,
+                trips_year=self.trips_year,
+                trip_assignment__trips_year=self.trips_year,
+                bus_assignment_to_hanover__cost_one_way=Decimal('32.50'),
+                financial_aid=33,
+            ),
+            mommy.make(
+                IncomingStudent,
+                trips_year=self.trips_year,
+                bus_assignment_from_hanover__cost_one_way=40,
+                cancelled=True,
+                financial_aid=50,
+            ),
+            mommy.make(
+                IncomingStudent,
+                trips_year=self.trips_year,
+                cancelled=True,
+                cancelled_fee=13,
+                registration__doc_membership=False,
+            ),
+        ]
+        # Not charged
+        mommy.make(IncomingStudent, trips_year=self.trips_year)
+
+    def test_charges_match_compute_cost(self):
+        charged = (
+            IncomingStudent.objects.filter(trips_year=self.trips_year)
+            .charged()
+            .with_charges(self.costs)
+        )
+        self.assertQsEqual(charged, self.students)
+        for incoming in charged:
+            self.assertEqual(incoming.total_charge, incoming.compute_cost())
+            self.assertEqual(incoming.trip_charge, incoming.trip_cost(self.costs))
+            self.assertEqual(incoming.bus_charge, incoming.bus_cost())
+            self.assertEqual(
+                incoming.doc_membership_charge,
+                incoming.doc_membership_cost(self.costs),
+            )
+            self.assertEqual(incoming.green_fund_charge, incoming.green_fund_donation())
+            self.assertEqual(
+                incoming.cancellation_charge, incoming.cancellation_cost(self.costs)
+            )
+
+    def test_snapshot(self):
+        self.assertTrue(Charge.objects.is_stale(self.trips_year))
+        Charge.objects.snapshot(self.trips_year)
+        self.assertFalse(Charge.objects.is_stale(self.trips_year))
+        self.assertEqual(
+            {charge.incoming_student: charge.total for charge in Charge.objects.all()},
+            {incoming: incoming.compute_cost() for incoming in self.students},
+        )
+
+        incoming = self.students[0]
+        old_total = incoming.compute_cost()
+        incoming.financial_aid = 0
+        incoming.save()
+        self.run_commit_hooks()
+        self.assertTrue(Charge.objects.is_stale(self.trips_year))
+        # The ledger is only changed by a new snapshot
+        self.assertEqual(Charge.objects.get(incoming_student=incoming).total, old_total)
+
+        Charge.objects.snapshot(self.trips_year)
+        charge = Charge.objects.get(incoming_student=incoming)
+        self.assertEqual(charge.total, incoming.compute_cost())
+        self.assertEqual(charge.financial_aid, 0)
+
+    def test_totals(self):
+        Charge.objects.snapshot(self.trips_year)
+        totals = Charge.objects.filter(trips_year=self.trips_year).totals()
+        self.assertEqual(
+            totals['total'], sum(incoming.compute_cost() for incoming in self.students),
+        )
+        self.assertEqual(
+            totals['bus'], sum(incoming.bus_cost() for incoming in self.students)
+        )
+        self.assertEqual(Charge.objects.none().totals()['total'], 0)
+
+
+class ConcurrentChargeTestCase(TransactionTestCase):
+    def test_concurrent_snapshots(self):
+        trips_year = mommy.make(TripsYear, year=2014, is_current=True)
+        mommy.make(Settings, trips_year=trips_year, trips_cost=100)
+        mommy.make(
+            IncomingStudent,
+            10,
+            trips_year=trips_year,
+            trip_assignment__trips_year=trips_year,
+        )
+
+        def snapshot():
+            for _ in range(5):
+                Charge.objects.snapshot(trips_year)
+
+        run_concurrently(snapshot, snapshot)
+        self.assertEqual(Charge.objects.count(), 10)
+
+
 class RegistrationViewsTestCase(FytTestCase):
 
     csrf_checks = False
@@ -982,6 +1102,44 @@ class IncomingStudentViewsTestCase(FytTestCase):
         with self.assertRaises(IncomingStudent.DoesNotExist):
             IncomingStudent.objects.get(pk=incoming.pk)
 
+    def make_trippees(self, n):
+        for _ in range(n):
+            trip = mommy.make(Trip, trips_year=self.trips_year)
+            reg = mommy.make(Registration, trips_year=self.trips_year)
+            mommy.make(
+                IncomingStudent,
+                trips_year=self.trips_year,
+                registration=reg,
+                trip_assignment=trip,
+            )
+
+    def assertConstantQueries(self, url):
+        user = self.make_director()
+        self.app.get(url, user=user)
+
+        self.make_trippees(2)
+        with CaptureQueriesContext(connection) as few:
+            self.app.get(url, user=user)
+
+        self.make_trippees(5)
+        with CaptureQueriesContext(connection) as many:
+            res = self.app.get(url, user=user)
+
+        self.assertEqual(len(few), len(many))
+        for trippee in IncomingStudent.objects.all():
+            self.assertContains(res, trippee.name)
+
+    def test_incoming_student_index_queries(self):
+        url = reverse(
+            'core:incomingstudent:index', kwargs={'trips_year': self.trips_year}
+        )
+        self.assertConstantQueries(url)
+
+    def test_registration_index_queries(self):
+        self.assertConstantQueries(
+            reverse('core:registration:index', kwargs={'trips_year': self.trips_year})
+        )
+
 
 class RegistrationManagerTestCase(FytTestCase):
     def setUp(self):
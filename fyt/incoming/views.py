@@ -29,6 +29,7 @@ from fyt.core.views import (
     DatabaseDetailView,
     DatabaseListView,
     DatabaseUpdateView,
+    TableListMixin,
     TripsYearMixin,
 )
 from fyt.permissions.views import DatabaseEditPermissionRequired
@@ -217,7 +218,7 @@ class IncomingStudentPortal(LoginRequiredMixin, ExtraContextMixin, TemplateView)
 # ----- database internal views --------
 
 
-class RegistrationIndex(DatabaseListView):
+class RegistrationIndex(TableListMixin, DatabaseListView):
     """
     All trippee registrations.
     """
@@ -225,10 +226,12 @@ class RegistrationIndex(DatabaseListView):
     model = Registration
     template_name = 'incoming/registration_index.html'
     context_object_name = 'registrations'
+    only_fields = ['name', 'trips_year']
 
     def get_queryset(self):
         qs = super().get_queryset()
         return qs.select_related(
+            'user',
             'trippee',
             'trippee__trip_assignment__section',
             'trippee__trip_assignment__template',
@@ -239,9 +242,9 @@ class RegistrationIndex(DatabaseListView):
             self.request.GET, queryset=self.get_queryset(), trips_year=self.trips_year
         )
         return {
-            'table': RegistrationTable(filter.qs, self.request),
+            'table': self.paginate_table(RegistrationTable(filter.qs, self.request)),
             'filter': filter,
-            'registration_count': len(filter.qs),
+            'registration_count': self.get_count(filter.qs),
             'unmatched': Registration.objects.unmatched(self.trips_year),
         }
 
@@ -370,16 +373,15 @@ class RegistrationDelete(DatabaseDeleteView):
     success_url_pattern = 'core:registration:index'
 
 
-class IncomingStudentIndex(tables.views.SingleTableMixin, DatabaseListView):
+class IncomingStudentIndex(TableListMixin, DatabaseListView):
     """
     All incoming students
     """
 
     model = IncomingStudent
-    table_class = IncomingStudentTable
-    table_pagination = False
     template_name = 'incoming/trippee_index.html'
     context_object_name = 'trippees'
+    only_fields = ['trips_year']
 
     def get_queryset(self):
         return (
@@ -394,6 +396,14 @@ class IncomingStudentIndex(tables.views.SingleTableMixin, DatabaseListView):
             )
         )
 
+    def extra_context(self):
+        table = IncomingStudentTable(self.object_list)
+        tables.RequestConfig(self.request, paginate=False).configure(table)
+        return {
+            'table': self.paginate_table(table),
+            'trippee_count': self.get_count(self.object_list),
+        }
+
 
 class IncomingStudentDetail(DatabaseDetailView):
     model = IncomingStudent
@@ -0,0 +1,139 @@
+"""
+Counts of volunteers, registrations and incoming students for reports.
+
+Each breakdown is computed with a single grouped query on its model and is
+cached until the data version of the model changes, so these can be shown
+on any page without recounting.
+"""
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from fyt.applications.models import Volunteer
+from fyt.incoming.models import IncomingStudent, Registration
+from fyt.utils.cache import data_version
+from fyt.utils.choices import TSHIRT_SIZES
+
+
+def _cache_key(name, trips_year, model):
+    return 'report-aggregates:{}:{}:{}'.format(
+        name, getattr(trips_year, 'pk', trips_year), data_version(trips_year, model)
+    )
+
+
+def _tshirt_counts():
+    return OrderedDict((size, 0) for size in TSHIRT_SIZES)
+
+
+def volunteer_counts(trips_year):
+    """
+    The number of t-shirts of each size needed by leaders and croo members,
+    keyed by status.
+    """
+    key = _cache_key('volunteers', trips_year, Volunteer)
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    statuses = [Volunteer.LEADER, Volunteer.CROO]
+    counts = {status: _tshirt_counts() for status in statuses}
+    groups = (
+        Volunteer.objects.filter(trips_year=trips_year, status__in=statuses)
+        .order_by()
+        .values_list('status', 'tshirt_size')
+        .annotate(count=Count('pk'))
+    )
+    for status, size, count in groups:
+        if size in counts[status]:
+            counts[status][size] = count
+
+    cache.set(key, counts)
+    return counts
+
+
+def registration_counts(trips_year):
+    """
+    The number of registrations, t-shirts of each size, and registrations
+    requesting financial aid or an external bus.
+    """
+    key = _cache_key('registrations', trips_year, Registration)
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    counts = {
+        'total': 0,
+        'tshirts': _tshirt_counts(),
+        'financial_aid': 0,
+        'bus_requests': 0,
+    }
+    wants_bus = (
+        Q(bus_stop_round_trip__isnull=False)
+        | Q(bus_stop_to_hanover__isnull=False)
+        | Q(bus_stop_from_hanover__isnull=False)
+    )
+    groups = (
+        Registration.objects.filter(trips_year=trips_year)
+        .order_by()
+        .values_list('tshirt_size')
+        .annotate(
+            count=Count('pk'),
+            financial_aid=Count('pk', filter=Q(financial_assistance=True)),
+            bus_requests=Count('pk', filter=wants_bus),
+        )
+    )
+    for size, count, financial_aid, bus_requests in groups:
+        counts['total'] += count
+        counts['financial_aid'] += financial_aid
+        counts['bus_requests'] += bus_requests
+        if size in counts['tshirts']:
+            counts['tshirts'][size] = count
+
+    cache.set(key, counts)
+    return counts
+
+
+def incoming_counts(trips_year):
+    """
+    The number of incoming students who went on a trip, and who cancelled,
+    by incoming status.
+    """
+    key = _cache_key('incoming', trips_year, IncomingStudent)
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    def empty():
+        return {
+            'firstyear_count': 0,
+            'transfer_count': 0,
+            'exchange_count': 0,
+            'unlabeled': 0,
+            'total': 0,
+        }
+
+    status_keys = {
+        IncomingStudent.FIRSTYEAR: 'firstyear_count',
+        IncomingStudent.TRANSFER: 'transfer_count',
+        IncomingStudent.EXCHANGE: 'exchange_count',
+        '': 'unlabeled',
+    }
+    counts = {'with_trip': empty(), 'cancelled': empty()}
+    groups = (
+        IncomingStudent.objects.filter(trips_year=trips_year)
+        .order_by()
+        .values_list('incoming_status')
+        .annotate(
+            with_trip=Count('pk', filter=Q(trip_assignment__isnull=False)),
+            cancelled=Count('pk', filter=Q(cancelled=True)),
+        )
+    )
+    for status, with_trip, cancelled in groups:
+        for name, count in [('with_trip', with_trip), ('cancelled', cancelled)]:
+            counts[name]['total'] += count
+            if status in status_keys:
+                counts[name][status_keys[status]] += count
+
+    cache.set(key, counts)
+    return counts
@@ -0,0 +1,29 @@
+from crispy_forms.helper import FormHelper
+from crispy_forms.layout import Submit
+from django import forms
+
+from fyt.reports.jobs import REPORTS
+from fyt.reports.workbook import SHEETS
+
+
+class ReportJobForm(forms.Form):
+    report = forms.ChoiceField(choices=REPORTS.items())
+
+    def __init__(self, trips_year, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.add_input(Submit('submit', 'Export'))
+
+
+class WorkbookForm(forms.Form):
+    reports = forms.MultipleChoiceField(
+        choices=[(report, REPORTS[report]) for report in SHEETS],
+        initial=SHEETS,
+        widget=forms.CheckboxSelectMultiple,
+    )
+
+    def __init__(self, trips_year, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper(self)
+        self.helper.form_id = 'workbook-form'
+        self.helper.add_input(Submit('submit', 'Download Workbook'))
@@ -0,0 +1,174 @@
+"""
+Running reports out of band.
+
+Large reports can take longer than the router allows for a request. Instead
+of streaming them, a ``ReportJob`` is queued and the ``run_report_jobs``
+worker renders the report to file storage, recording how many rows have
+been written as it goes.
+
+Reports are the ``GenericReportView`` views of the reports urls, run without
+a request.
+"""
+import logging
+import tempfile
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from fyt.reports.models import ReportJob
+
+
+logger = logging.getLogger(__name__)
+
+
+# The url names of reports which can be run in the background
+REPORTS = OrderedDict(
+    [
+        ('all_apps', 'All Applications'),
+        ('leaders', 'Trip Leaders'),
+        ('croo_members', 'Croo Members'),
+        ('dietary', 'Dietary Restrictions'),
+        ('medical', 'Medical Info'),
+        ('gear_requests', 'Gear Requests'),
+        ('registrations', 'Registrations'),
+        ('financial_aid', 'Financial Aid'),
+        ('doc_members', 'DOC Members'),
+        ('feelings', 'Feelings'),
+        ('trippees', 'Trippees'),
+        ('charges', 'Charges'),
+        ('housing', 'Housing'),
+        ('bus_stops', 'External Bus Requests'),
+        ('foodboxes', 'Foodboxes'),
+    ]
+)
+
+# Update the progress of a job every this many rows
+PROGRESS_INTERVAL = 500
+
+# Running jobs which were started longer ago than this are assumed to have
+# been abandoned by a worker which was killed, and are run again
+STALE_AFTER = timedelta(hours=1)
+
+
+def report_view(trips_year, report):
+    """
+    An instance of the report view for ``report``, set up as if it was
+    handling a request.
+    """
+    url = reverse(
+        'core:reports:{}'.format(report), kwargs={'trips_year': trips_year.pk}
+    )
+    match = resolve(url)
+    view = match.func.view_class()
+    view.request = None
+    view.args = match.args
+    view.kwargs = match.kwargs
+    return view
+
+
+def request_report(trips_year, report, user=None):
+    """
+    Queue a job for ``report``.
+
+    If an earlier job for the report ran against the same data, and did not
+    fail, that job is returned instead.
+    """
+    version = report_view(trips_year, report).get_version()
+    if version:
+        job = (
+            ReportJob.objects.filter(
+                trips_year=trips_year, report=report, version=version
+            )
+            .exclude(status=ReportJob.FAILED)
+            .first()
+        )
+        if job is not None:
+            return job
+
+    return ReportJob.objects.create(
+        trips_year=trips_year, report=report, version=version, requested_by=user
+    )
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running, and return it.
+
+    Stale running jobs are claimed again. Jobs which are being claimed by
+    other workers are skipped.
+    """
+    stale = Q(status=ReportJob.RUNNING, started_at__lt=timezone.now() - STALE_AFTER)
+    with transaction.atomic():
+        job = (
+            ReportJob.objects.filter(Q(status=ReportJob.QUEUED) | stale)
+            .order_by('created_at')
+            .select_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = ReportJob.RUNNING
+        job.started_at = timezone.now()
+        job.rows_written = 0
+        job.save()
+    return job
+
+
+def run_job(job):
+    """
+    Render the report of a running ``job`` to file storage.
+    """
+    try:
+        view = report_view(job.trips_year, job.report)
+        view.prepare()
+        # The version is kept from when the job was requested, so that
+        # requests for the report of unchanged data reuse the job. The
+        # report reflects at least the data of that version.
+        queryset = view.get_queryset()
+        if isinstance(queryset, QuerySet):
+            job.total_rows = queryset.count()
+        job.save()
+
+        rows_written = 0
+        with tempfile.TemporaryFile() as f:
+            # The first row is the header
+            for rows_written, row in enumerate(view.rows()):
+                f.write(row.encode('utf-8'))
+                if rows_written and rows_written % PROGRESS_INTERVAL == 0:
+                    ReportJob.objects.filter(pk=job.pk).update(
+                        rows_written=rows_written
+                    )
+
+            f.seek(0)
+            job.file.save(view.get_filename(), File(f), save=False)
+
+    except Exception as e:
+        logger.exception('Report job %s failed', job.pk)
+        job.status = ReportJob.FAILED
+        job.error = str(e)
+    else:
+        job.status = ReportJob.DONE
+        job.rows_written = rows_written
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def run_queued_jobs():
+    """
+    Run jobs until the queue is empty. Returns the number of jobs run.
+    """
+    count = 0
+    job = claim_next_job()
+    while job is not None:
+        run_job(job)
+        count += 1
+        job = claim_next_job()
+    return count
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from fyt.reports import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued report jobs, polling for new jobs until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait between polls of an empty queue.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            count = jobs.run_queued_jobs()
+            if count:
+                self.stdout.write('Ran {} report jobs'.format(count))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+
+from fyt.core.models import DatabaseModel
+
+
+class ReportJob(DatabaseModel):
+    """
+    A report which is run out of band by the ``run_report_jobs`` worker.
+
+    The finished CSV is saved to file storage. ``version`` is the data
+    version of the models which the report depends on, so a later request
+    for the same report of an unchanged trips year can reuse the file.
+    """
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    report = models.CharField(max_length=50, editable=False)
+    version = models.CharField(max_length=255, blank=True, editable=False)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED, editable=False
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, editable=False, on_delete=models.SET_NULL,
+    )
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    started_at = models.DateTimeField(null=True, editable=False)
+    finished_at = models.DateTimeField(null=True, editable=False)
+
+    rows_written = models.PositiveIntegerField(default=0, editable=False)
+    total_rows = models.PositiveIntegerField(null=True, editable=False)
+
+    file = models.FileField(upload_to='reports/', blank=True, editable=False)
+    error = models.TextField(blank=True, editable=False)
+
+    @property
+    def label(self):
+        from fyt.reports.jobs import REPORTS
+
+        return REPORTS.get(self.report, self.report)
+
+    @property
+    def finished(self):
+        return self.status in [self.DONE, self.FAILED]
+
+    @property
+    def percentage(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, 100 * self.rows_written // self.total_rows)
+
+    def get_absolute_url(self):
+        return reverse('core:reports:job', kwargs=self.obj_kwargs())
+
+    def __str__(self):
+        return '{} report for {}'.format(self.report, self.trips_year_id)
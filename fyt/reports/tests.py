@@ -1,19 +1,32 @@
 import csv
+import io
 import tempfile
+import unittest
+import zipfile
 from contextlib import contextmanager
-from datetime import date
+from datetime import date, timedelta
 
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from model_mommy import mommy
 
 from fyt.applications.models import Grader, Question, Volunteer
 from fyt.applications.tests import ApplicationTestMixin
 from fyt.croos.models import Croo
 from fyt.gear.models import Gear, GearRequest
-from fyt.incoming.models import IncomingStudent, Registration, Settings
-from fyt.reports.views import croo_tshirts, leader_tshirts, trippee_tshirts
+from fyt.incoming.models import Charge, IncomingStudent, Registration, Settings
+from fyt.reports import aggregates, jobs, workbook
+from fyt.reports.models import ReportJob
+from fyt.reports.views import (
+    Registrations,
+    GenericReportView,
+    croo_tshirts,
+    leader_tshirts,
+    trippee_tshirts,
+)
 from fyt.test import FytTestCase
-from fyt.transport.models import ExternalBus, Route
+from fyt.transport.models import ExternalBus, Route, Stop
 from fyt.trips.models import Section, Trip, TripType
 from fyt.utils.choices import L, M, S, XL, XS, XXL
 
@@ -80,6 +93,7 @@ class ReportViewsTestCase(FytTestCase, ApplicationTestMixin):
         mommy.make(Grader).add_score(app, self.V4, self.V2)
         mommy.make(Grader).add_score(app, self.V5, self.V1)
         mommy.make(Grader).add_score(app, self.V4, self.V3)
+        self.run_commit_hooks()
 
         self.assertCsvReturns(
             'core:reports:all_apps',
@@ -101,6 +115,8 @@ class ReportViewsTestCase(FytTestCase, ApplicationTestMixin):
                     'leader score 2': '5.0',
                     'leader score 3': '4.0',
                     'avg croo score': '2.0',
+                    'normalized leader score': '4.3',
+                    'normalized croo score': '2.0',
                     'croo score 1': '2.0',
                     'croo score 2': '1.0',
                     'croo score 3': '3.0',
@@ -182,6 +198,55 @@ class ReportViewsTestCase(FytTestCase, ApplicationTestMixin):
             [{'name': trippee.name, 'netid': trippee.netid.upper()}],
         )
 
+    @unittest.mock.patch.object(GenericReportView, 'chunk_size', 2)
+    def test_reports_are_streamed_in_chunks(self):
+        incoming = mommy.make(IncomingStudent, 5, trips_year=self.trips_year)
+        for student in incoming:
+            mommy.make(Registration, trips_year=self.trips_year, trippee=student)
+
+        url = reverse('core:reports:housing', kwargs={'trips_year': self.trips_year})
+        self.client.force_login(self.make_director())
+        resp = self.client.get(url)
+        self.assertTrue(resp.streaming)
+
+        # Registrations are prefetched for each of the three chunks
+        with self.assertNumQueries(1 + 3):
+            rows = list(csv.reader(line.decode() for line in resp.streaming_content))
+        self.assertEqual(
+            sorted(row[1] for row in rows[1:]),
+            sorted(student.netid for student in incoming),
+        )
+
+    def test_registrations_csv_pivots_preferences(self):
+        sections = mommy.make(Section, 2, trips_year=self.trips_year)
+        triptype = mommy.make(TripType, trips_year=self.trips_year, hidden=False)
+        complete = mommy.make(Registration, trips_year=self.trips_year)
+        complete.set_section_preference(sections[0], 'PREFER')
+        complete.set_section_preference(sections[1], 'AVAILABLE')
+        complete.set_triptype_preference(triptype, 'FIRST CHOICE')
+        # Missing choices are left blank
+        missing = mommy.make(Registration, trips_year=self.trips_year)
+        missing.set_section_preference(sections[1], 'PREFER')
+
+        url = reverse(
+            'core:reports:registrations', kwargs={'trips_year': self.trips_year}
+        )
+        self.client.force_login(self.make_director())
+        resp = self.client.get(url)
+
+        # Sections, triptypes, and the registrations
+        with self.assertNumQueries(3):
+            content = b''.join(resp.streaming_content).decode()
+        rows = {row['netid']: row for row in csv.DictReader(content.splitlines())}
+        columns = [str(sections[0]), str(sections[1]), str(triptype)]
+        self.assertEqual(
+            [rows[complete.user.netid][c] for c in columns],
+            ['PREFER', 'AVAILABLE', 'FIRST CHOICE'],
+        )
+        self.assertEqual(
+            [rows[missing.user.netid][c] for c in columns], ['', 'PREFER', '']
+        )
+
     def test_registrations_csv(self):
         r = mommy.make(
             Registration, trips_year=self.trips_year, name='Bob', gender='male'
@@ -294,6 +359,24 @@ class ReportViewsTestCase(FytTestCase, ApplicationTestMixin):
         # not charged because no trip assignment AND no DOC membership
         mommy.make(IncomingStudent, trips_year=self.trips_year)
 
+        # The report is read from a snapshot of the charges, and is not
+        # downloaded until the snapshot is up to date
+        url = reverse(
+            'core:incomingstudent:index', kwargs={'trips_year': self.trips_year}
+        )
+        charges_url = reverse(
+            'core:reports:charges', kwargs={'trips_year': self.trips_year}
+        )
+        res = self.app.get(charges_url, user=self.make_directorate())
+        self.assertRedirects(res, url, fetch_redirect_response=False)
+        res = res.follow()
+        self.assertIn('Update the charges', res)
+        res.forms['update-charges-form'].submit(status=403)
+        res = self.app.get(url, user=self.make_director())
+        res = res.forms['update-charges-form'].submit()
+        self.assertRedirects(res, charges_url, fetch_redirect_response=False)
+        self.director.delete()
+
         self.assertCsvReturns(
             'core:reports:charges',
             [
@@ -762,6 +845,140 @@ class ReportViewsTestCase(FytTestCase, ApplicationTestMixin):
         )
 
 
+class AggregatesTestCase(FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.init_old_trips_year()
+
+    def test_volunteer_counts(self):
+        mommy.make(
+            Volunteer,
+            2,
+            trips_year=self.trips_year,
+            status=Volunteer.LEADER,
+            tshirt_size=S,
+        )
+        mommy.make(
+            Volunteer, trips_year=self.trips_year, status=Volunteer.CROO, tshirt_size=XL
+        )
+        mommy.make(
+            Volunteer,
+            trips_year=self.trips_year,
+            status=Volunteer.PENDING,
+            tshirt_size=S,
+        )
+        mommy.make(
+            Volunteer,
+            trips_year=self.old_trips_year,
+            status=Volunteer.LEADER,
+            tshirt_size=S,
+        )
+
+        # The data version, and the counts
+        with self.assertNumQueries(2):
+            counts = aggregates.volunteer_counts(self.trips_year)
+        self.assertEqual(
+            counts[Volunteer.LEADER], {XS: 0, S: 2, M: 0, L: 0, XL: 0, XXL: 0}
+        )
+        self.assertEqual(
+            counts[Volunteer.CROO], {XS: 0, S: 0, M: 0, L: 0, XL: 1, XXL: 0}
+        )
+
+    def test_registration_counts(self):
+        stop = mommy.make(Stop, trips_year=self.trips_year)
+        mommy.make(
+            Registration,
+            trips_year=self.trips_year,
+            tshirt_size=M,
+            financial_assistance=True,
+            bus_stop_to_hanover=stop,
+        )
+        mommy.make(
+            Registration,
+            trips_year=self.trips_year,
+            tshirt_size=M,
+            financial_assistance=False,
+            bus_stop_round_trip=stop,
+        )
+        mommy.make(
+            Registration,
+            trips_year=self.trips_year,
+            tshirt_size=L,
+            financial_assistance=False,
+        )
+
+        with self.assertNumQueries(2):
+            counts = aggregates.registration_counts(self.trips_year)
+        self.assertEqual(
+            counts,
+            {
+                'total': 3,
+                'tshirts': {XS: 0, S: 0, M: 2, L: 1, XL: 0, XXL: 0},
+                'financial_aid': 1,
+                'bus_requests': 2,
+            },
+        )
+
+    def test_incoming_counts(self):
+        trip = mommy.make(Trip, trips_year=self.trips_year)
+        mommy.make(
+            IncomingStudent,
+            2,
+            trips_year=self.trips_year,
+            incoming_status=IncomingStudent.FIRSTYEAR,
+            trip_assignment=trip,
+        )
+        mommy.make(
+            IncomingStudent,
+            trips_year=self.trips_year,
+            incoming_status='',
+            trip_assignment=trip,
+        )
+        mommy.make(
+            IncomingStudent,
+            trips_year=self.trips_year,
+            incoming_status=IncomingStudent.TRANSFER,
+            cancelled=True,
+        )
+
+        with self.assertNumQueries(2):
+            counts = aggregates.incoming_counts(self.trips_year)
+        self.assertEqual(
+            counts['with_trip'],
+            {
+                'firstyear_count': 2,
+                'transfer_count': 0,
+                'exchange_count': 0,
+                'unlabeled': 1,
+                'total': 3,
+            },
+        )
+        self.assertEqual(counts['cancelled']['transfer_count'], 1)
+        self.assertEqual(counts['cancelled']['total'], 1)
+
+    def test_counts_are_cached_until_the_data_changes(self):
+        mommy.make(Registration, trips_year=self.trips_year, tshirt_size=S)
+        aggregates.registration_counts(self.trips_year)
+        # Only the data version is read
+        with self.assertNumQueries(1):
+            counts = aggregates.registration_counts(self.trips_year)
+        self.assertEqual(counts['total'], 1)
+
+        mommy.make(Registration, trips_year=self.trips_year, tshirt_size=S)
+        self.run_commit_hooks()
+        self.assertEqual(aggregates.registration_counts(self.trips_year)['total'], 2)
+
+    def test_statistics_and_tshirts_pages(self):
+        mommy.make(Registration, trips_year=self.trips_year, financial_assistance=True)
+        mommy.make(Settings, trips_year=self.trips_year)
+        director = self.make_director()
+        for name in ['statistics', 'tshirts']:
+            url = reverse(
+                'core:reports:{}'.format(name), kwargs={'trips_year': self.trips_year}
+            )
+            self.app.get(url, user=director)
+
+
 class TShirtCountTestCase(FytTestCase):
     def setUp(self):
         self.init_trips_year()
@@ -789,3 +1006,175 @@ class TShirtCountTestCase(FytTestCase):
         mommy.make(Registration, trips_year=self.trips_year, tshirt_size=L)
         target = {XS: 0, S: 0, M: 0, L: 1, XL: 0, XXL: 0}
         self.assertEqual(target, trippee_tshirts(self.trips_year))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class ReportJobTestCase(FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.registrations = mommy.make(Registration, 2, trips_year=self.trips_year)
+
+    def test_jobs_are_reused_until_the_data_changes(self):
+        job = jobs.request_report(self.trips_year, 'registrations')
+        self.assertEqual(jobs.request_report(self.trips_year, 'registrations'), job)
+
+        self.registrations[0].save()
+        self.run_commit_hooks()
+        self.assertNotEqual(jobs.request_report(self.trips_year, 'registrations'), job)
+
+    def test_unversioned_reports_are_not_reused(self):
+        job = jobs.request_report(self.trips_year, 'trippees')
+        self.assertNotEqual(jobs.request_report(self.trips_year, 'trippees'), job)
+
+    @unittest.mock.patch.object(jobs, 'PROGRESS_INTERVAL', 1)
+    def test_run_job(self):
+        job = jobs.request_report(self.trips_year, 'registrations')
+        self.assertEqual(jobs.run_queued_jobs(), 1)
+        self.assertEqual(jobs.run_queued_jobs(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.DONE)
+        self.assertEqual(job.total_rows, 2)
+        self.assertEqual(job.rows_written, 2)
+        self.assertEqual(job.percentage, 100)
+        self.assertIsNotNone(job.finished_at)
+
+        with job.file.open('r') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(
+            sorted(row['netid'] for row in rows),
+            sorted(r.user.netid for r in self.registrations),
+        )
+
+        # The finished report is reused
+        self.assertEqual(jobs.request_report(self.trips_year, 'registrations'), job)
+
+    @unittest.mock.patch.object(
+        Registrations, 'get_row', side_effect=ValueError('oops')
+    )
+    def test_failed_jobs_are_not_reused(self, get_row):
+        job = jobs.request_report(self.trips_year, 'registrations')
+        jobs.run_job(jobs.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.FAILED)
+        self.assertEqual(job.error, 'oops')
+        self.assertNotEqual(jobs.request_report(self.trips_year, 'registrations'), job)
+
+    def test_version_is_kept_from_the_request(self):
+        job = jobs.request_report(self.trips_year, 'registrations')
+        version = job.version
+        # The worker would see the same version unless the data changed
+        with unittest.mock.patch.object(
+            Registrations, 'get_version', return_value='other'
+        ):
+            jobs.run_queued_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.version, version)
+        self.assertEqual(jobs.request_report(self.trips_year, 'registrations'), job)
+
+    def test_charges_are_snapshotted_by_the_worker(self):
+        mommy.make(Settings, trips_year=self.trips_year, trips_cost=100)
+        mommy.make(
+            IncomingStudent,
+            trips_year=self.trips_year,
+            trip_assignment__trips_year=self.trips_year,
+        )
+        job = jobs.request_report(self.trips_year, 'charges')
+        jobs.run_queued_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.rows_written, 1)
+        self.assertFalse(Charge.objects.is_stale(self.trips_year))
+
+    def test_stale_running_jobs_are_claimed_again(self):
+        started_at = timezone.now() - jobs.STALE_AFTER - timedelta(minutes=1)
+        stale = mommy.make(
+            ReportJob,
+            trips_year=self.trips_year,
+            report='registrations',
+            status=ReportJob.RUNNING,
+            started_at=started_at,
+            rows_written=5,
+        )
+        mommy.make(
+            ReportJob,
+            trips_year=self.trips_year,
+            report='registrations',
+            status=ReportJob.RUNNING,
+            started_at=timezone.now(),
+        )
+
+        job = jobs.claim_next_job()
+        self.assertEqual(job, stale)
+        self.assertEqual(job.rows_written, 0)
+        self.assertGreater(job.started_at, started_at)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_job_views(self):
+        url = reverse('core:reports:jobs', kwargs={'trips_year': self.trips_year})
+        res = self.app.get(url, user=self.make_director())
+        res.form['report'] = 'registrations'
+        res = res.form.submit().follow()
+        self.assertContains(res, 'Registrations')
+        self.assertContains(res, 'Queued')
+
+        jobs.run_queued_jobs()
+        job = ReportJob.objects.get()
+        res = self.app.get(job.get_absolute_url(), user=self.director)
+        self.assertContains(res, job.file.url)
+
+
+class WorkbookTestCase(FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        self.trippees = mommy.make(
+            IncomingStudent,
+            3,
+            trips_year=self.trips_year,
+            trip_assignment__trips_year=self.trips_year,
+        )
+
+    def read_sheets(self, content):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            names = archive.read('xl/workbook.xml').decode()
+            sheets = [
+                archive.read(name).decode()
+                for name in sorted(archive.namelist())
+                if name.startswith('xl/worksheets/')
+            ]
+        return names, sheets
+
+    def test_write_workbook(self):
+        f = io.BytesIO()
+        workbook.write_workbook(f, self.trips_year, reports=['housing', 'trippees'])
+        names, sheets = self.read_sheets(f.getvalue())
+
+        # Sheets are in the order of SHEETS
+        self.assertLess(names.index('Trippees'), names.index('Housing'))
+        self.assertNotIn('Trip Leaders', names)
+        self.assertEqual(len(sheets), 2)
+        for sheet in sheets:
+            for trippee in self.trippees:
+                self.assertIn(trippee.name, sheet)
+
+    def test_cell(self):
+        self.assertEqual(workbook.cell(None), '')
+        self.assertEqual(workbook.cell(True), 'True')
+        self.assertEqual(workbook.cell(12), 12)
+        self.assertEqual(workbook.cell(self.trips_year), str(self.trips_year))
+
+    def test_download_workbook(self):
+        url = reverse('core:reports:workbook', kwargs={'trips_year': self.trips_year})
+        res = self.app.get(url, user=self.make_director())
+        res = res.forms['workbook-form'].submit()
+        self.assertEqual(
+            res.content_disposition,
+            'attachment; filename="{}"'.format(workbook.get_filename(self.trips_year)),
+        )
+        names, sheets = self.read_sheets(res.body)
+        self.assertEqual(len(sheets), len(workbook.SHEETS))
@@ -16,6 +16,7 @@ urlpatterns = [
     ),
     url(r'^incoming/trippees/$', TrippeesCSV.as_view(), name='trippees'),
     url(r'^incoming/charges/$', Charges.as_view(), name="charges"),
+    url(r'^incoming/charges/update/$', UpdateCharges.as_view(), name="update_charges",),
     url(r'^incoming/housing/$', Housing.as_view(), name="housing"),
     url(r'^medical/$', MedicalInfo.as_view(), name="medical"),
     url(r'^registrations/$', Registrations.as_view(), name="registrations"),
@@ -34,4 +35,7 @@ urlpatterns = [
     url(r'^tshirts/$', TShirts.as_view(), name='tshirts'),
     url(r'^foodboxes/$', Foodboxes.as_view(), name='foodboxes'),
     url(r'^statistics/$', Statistics.as_view(), name='statistics'),
+    url(r'^jobs/$', ReportJobs.as_view(), name='jobs'),
+    url(r'^jobs/(?P<pk>[0-9]+)/$', ReportJobDetail.as_view(), name='job'),
+    url(r'^workbook/$', Workbook.as_view(), name='workbook'),
 ]
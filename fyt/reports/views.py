@@ -1,28 +1,40 @@
 import csv
 import itertools
-from collections import OrderedDict
+import tempfile
 
 from braces.views import AllVerbsMixin
+from django.contrib import messages
 from django.core.exceptions import ImproperlyConfigured
-from django.db.models import Q, Count, Max, Prefetch
-from django.http import HttpResponse
+from django.db.models import Max, OuterRef, Q, QuerySet, Subquery
+from django.http import FileResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.urls import reverse
 from django.utils.functional import cached_property
-from vanilla import View
+from vanilla import DetailView, FormView, View
 
 from fyt.applications.models import Volunteer as Application
+from fyt.applications.models import LeaderSupplement, Score
 from fyt.core.views import DatabaseTemplateView, TripsYearMixin
 from fyt.gear.models import GearRequest
 from fyt.incoming.models import (
+    Charge,
     IncomingStudent,
     Registration,
     RegistrationSectionChoice,
     RegistrationTripTypeChoice,
     Settings,
 )
-from fyt.permissions.views import DatabaseReadPermissionRequired
-from fyt.transport.models import ExternalBus
+from fyt.permissions.views import (
+    DatabaseEditPermissionRequired,
+    DatabaseReadPermissionRequired,
+)
+from fyt.reports import aggregates, jobs, workbook
+from fyt.reports.forms import ReportJobForm, WorkbookForm
+from fyt.reports.models import ReportJob
+from fyt.transport.models import ExternalBus, Stop
 from fyt.trips.models import Section, Trip, TripType
-from fyt.utils.choices import TSHIRT_SIZES
+from fyt.utils.cache import data_version
+from fyt.utils.query import prefetching_iterator
+from fyt.utils.views import ExtraContextMixin
 
 
 def yes_no(value):
@@ -39,13 +51,33 @@ def fmt_float(value):
     return '{:.1f}'.format(value)
 
 
+class Echo:
+    """
+    A file-like object for ``csv.writer`` which returns each row instead of
+    buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
 class GenericReportView(
     DatabaseReadPermissionRequired, TripsYearMixin, AllVerbsMixin, View
 ):
-    # TODO use a ListView here?
+    """
+    A CSV report with a row for each object of ``get_queryset``.
+
+    The CSV is streamed to the client a row at a time, and the queryset is
+    fetched ``chunk_size`` objects at a time, so memory use does not grow
+    with the size of the report.
+    """
 
     file_prefix = None
     header = None
+    chunk_size = 500
+    # Models whose data the report shows. Reports run in the background are
+    # reused until one of these changes.
+    version_models = []
 
     def get_filename(self):
         return "{}-{}.csv".format(self.file_prefix, self.trips_year)
@@ -61,27 +93,62 @@ class GenericReportView(
     def get_row(self, obj):
         raise ImproperlyConfigured('implement get_row()')
 
+    def prepare(self):
+        """
+        Called before the report is run in the background.
+        """
+        pass
+
+    def get_version(self):
+        """
+        The data version of the report, or an empty string if it is not
+        versioned.
+        """
+        if not self.version_models:
+            return ''
+        return data_version(self.trips_year, *self.version_models)
+
+    def iterate(self, qs):
+        """
+        Iterate over a queryset a chunk at a time, prefetching its related
+        lookups for each chunk.
+        """
+        if isinstance(qs, QuerySet):
+            return prefetching_iterator(qs, chunk_size=self.chunk_size)
+        return qs
+
+    def values(self):
+        """
+        The header, followed by the values of each row.
+        """
+        yield self.get_header()
+        for obj in self.iterate(self.get_queryset()):
+            yield self.get_row(obj)
+
+    def rows(self):
+        writer = csv.writer(Echo())
+        for values in self.values():
+            yield writer.writerow(values)
+
     def all(self, request, *args, **kwargs):
-        response = HttpResponse(content_type='text/csv')
+        response = StreamingHttpResponse(self.rows(), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="{}"'.format(
             self.get_filename()
         )
-        qs = self.get_queryset()
-        writer = csv.writer(response)
-        writer.writerow(self.get_header())
-        for obj in qs:
-            writer.writerow(self.get_row(obj))
         return response
 
 
 class VolunteerCSV(GenericReportView):
 
     file_prefix = 'TL-and-Croo-applicants'
+    version_models = [Application, LeaderSupplement, Score]
     header = [
         'name',
         'netid',
         'avg leader score',
         'avg croo score',
+        'normalized leader score',
+        'normalized croo score',
         'status',
         'leader app',
         'croo app',
@@ -94,11 +161,8 @@ class VolunteerCSV(GenericReportView):
     ]
 
     def get_header(self):
-        score_count_max = (
-            Application.objects.leader_or_croo_applications(self.trips_year)
-            .annotate(Count('scores'))
-            .aggregate(Max('scores__count'))['scores__count__max']
-        ) or 0
+        qs = Application.objects.leader_or_croo_applications(self.trips_year)
+        score_count_max = qs.aggregate(Max('score_count'))['score_count__max'] or 0
 
         return (
             self.header
@@ -107,12 +171,9 @@ class VolunteerCSV(GenericReportView):
         )
 
     def get_queryset(self):
-        return (
-            Application.objects.leader_or_croo_applications(self.trips_year)
-            .with_avg_scores()
-            .prefetch_related(
-                'scores', 'answer_set', 'scores__leader_score', 'scores__croo_score'
-            )
+        qs = Application.objects.leader_or_croo_applications(self.trips_year)
+        return qs.prefetch_related(
+            'scores', 'answer_set', 'scores__leader_score', 'scores__croo_score'
         )
 
     def get_row(self, application):
@@ -123,6 +184,8 @@ class VolunteerCSV(GenericReportView):
                 user.netid,
                 fmt_float(application.avg_leader_score),
                 fmt_float(application.avg_croo_score),
+                fmt_float(application.normalized_leader_score),
+                fmt_float(application.normalized_croo_score),
                 application.status,
                 yes_no(application.leader_application_submitted),
                 yes_no(application.croo_application_submitted),
@@ -269,23 +332,43 @@ class Registrations(GenericReportView):
     """
 
     file_prefix = 'Registrations'
+    version_models = [Registration, Section, TripType]
 
     def get_queryset(self):
+        """
+        Pivot the section and triptype preferences of each registration into
+        a column per section and triptype.
+
+        Each column is a subquery for the single choice of the registration,
+        which is NULL if the choice is missing. Joining both choice tables
+        instead would multiply the rows of each registration.
+        """
+        columns = {}
+        for section in self.sections:
+            columns[self.section_column(section)] = Subquery(
+                RegistrationSectionChoice.objects.filter(
+                    registration=OuterRef('pk'), section=section
+                ).values('preference')
+            )
+        for triptype in self.triptypes:
+            columns[self.triptype_column(triptype)] = Subquery(
+                RegistrationTripTypeChoice.objects.filter(
+                    registration=OuterRef('pk'), triptype=triptype
+                ).values('preference')
+            )
+
         return (
             Registration.objects.filter(trips_year=self.trips_year)
             .select_related('user')
-            .prefetch_related(
-                Prefetch(
-                    'registrationsectionchoice_set',
-                    queryset=RegistrationSectionChoice.objects.order_by('section'),
-                ),
-                Prefetch(
-                    'registrationtriptypechoice_set',
-                    queryset=RegistrationTripTypeChoice.objects.order_by('triptype'),
-                ),
-            )
+            .annotate(**columns)
         )
 
+    def section_column(self, section):
+        return 'section_{}_preference'.format(section.pk)
+
+    def triptype_column(self, triptype):
+        return 'triptype_{}_preference'.format(triptype.pk)
+
     def get_header(self):
         header = [
             'name',
@@ -343,13 +426,8 @@ class Registrations(GenericReportView):
             r.height,
             r.weight,
         ]
-        for pref, sxn in zip(r.registrationsectionchoice_set.all(), self.sections):
-            assert pref.section_id == sxn.pk
-            row += [pref.preference]
-
-        for pref, tt in zip(r.registrationtriptypechoice_set.all(), self.triptypes):
-            assert pref.triptype_id == tt.pk
-            row += [pref.preference]
+        row += [getattr(r, self.section_column(s)) or '' for s in self.sections]
+        row += [getattr(r, self.triptype_column(t)) or '' for t in self.triptypes]
 
         row += [
             r.schedule_conflicts,
@@ -387,21 +465,38 @@ class Charges(GenericReportView):
     """
     CSV file of charges to be applied to each trippee.
 
-    All values are adjusted by financial aid, if applicable
+    All values are adjusted by financial aid, if applicable. The charges are
+    read from the last snapshot of the ledger, which is taken by
+    ``UpdateCharges`` or when the report is run in the background. An out of
+    date snapshot is never downloaded; the user is sent back to update it.
     """
 
     file_prefix = 'Charges'
+    version_models = [IncomingStudent, Registration, Settings, Trip, Stop]
+
+    def prepare(self):
+        if Charge.objects.is_stale(self.trips_year):
+            Charge.objects.snapshot(self.trips_year)
+
+    def all(self, request, *args, **kwargs):
+        if Charge.objects.is_stale(self.trips_year):
+            messages.warning(
+                request,
+                'The charges have changed since they were last updated. '
+                'Update the charges to download them.',
+            )
+            return HttpResponseRedirect(
+                reverse(
+                    'core:incomingstudent:index',
+                    kwargs={'trips_year': self.trips_year.pk},
+                )
+            )
+        return super().all(request, *args, **kwargs)
 
     def get_queryset(self):
-        return IncomingStudent.objects.filter(
-            (
-                Q(trip_assignment__isnull=False)
-                | Q(cancelled=True)
-                | Q(registration__doc_membership=True)
-                | Q(registration__green_fund_donation__gt=0)
-            ),
-            trips_year=self.trips_year,
-        ).prefetch_related('registration')
+        return Charge.objects.filter(trips_year=self.trips_year).select_related(
+            'incoming_student'
+        )
 
     header = [
         'name',
@@ -415,23 +510,30 @@ class Charges(GenericReportView):
         'cancellation',
     ]
 
-    def get_row(self, incoming):
-        reg = incoming.get_registration()
+    def get_row(self, charge):
         return [
-            incoming.name,
-            incoming.netid,
-            incoming.compute_cost(self.costs),
-            incoming.financial_aid or '',
-            incoming.trip_cost(self.costs) or '',
-            incoming.bus_cost() or '',
-            incoming.doc_membership_cost(self.costs) or '',
-            incoming.green_fund_donation() or '',
-            incoming.cancellation_cost(self.costs) or '',
+            charge.incoming_student.name,
+            charge.incoming_student.netid,
+            charge.total,
+            charge.financial_aid or '',
+            charge.trip or '',
+            charge.bus or '',
+            charge.doc_membership or '',
+            charge.green_fund or '',
+            charge.cancellation or '',
         ]
 
-    @cached_property
-    def costs(self):
-        return Settings.objects.get(trips_year=self.trips_year)
+
+class UpdateCharges(DatabaseEditPermissionRequired, TripsYearMixin, View):
+    """
+    Take a new snapshot of the charges ledger, and download it.
+    """
+
+    def post(self, request, *args, **kwargs):
+        Charge.objects.snapshot(self.trips_year)
+        return HttpResponseRedirect(
+            reverse('core:reports:charges', kwargs={'trips_year': self.trips_year.pk})
+        )
 
 
 class DocMembers(GenericReportView):
@@ -452,33 +554,16 @@ class DocMembers(GenericReportView):
         return [reg.user.name, reg.user.netid, reg.user.email]
 
 
-def _tshirt_count(qs):
-    """
-    Return an OrderedDict with XS, S, M, L, XL, XXL keys, each
-    with the number of shirts needed in that size.
-    """
-    counts = OrderedDict([(size, 0) for size in TSHIRT_SIZES])
-
-    for size in TSHIRT_SIZES:
-        counts[size] += qs.filter(tshirt_size=size).count()
-
-    return counts
-
-
 def leader_tshirts(trips_year):
-    return _tshirt_count(
-        Application.objects.filter(trips_year=trips_year, status=Application.LEADER)
-    )
+    return aggregates.volunteer_counts(trips_year)[Application.LEADER]
 
 
 def croo_tshirts(trips_year):
-    return _tshirt_count(
-        Application.objects.filter(trips_year=trips_year, status=Application.CROO)
-    )
+    return aggregates.volunteer_counts(trips_year)[Application.CROO]
 
 
 def trippee_tshirts(trips_year):
-    return _tshirt_count(Registration.objects.filter(trips_year=trips_year))
+    return aggregates.registration_counts(trips_year)['tshirts']
 
 
 class TShirts(DatabaseTemplateView):
@@ -544,8 +629,11 @@ class GearRequests(GenericReportView):
 
     file_prefix = 'Gear-Requests'
 
+    @cached_property
+    def matrix(self):
+        return GearRequest.objects.matrix(self.trips_year)
+
     def get_queryset(self):
-        self.matrix = GearRequest.objects.matrix(self.trips_year)
         return self.matrix
 
     def get_header(self):
@@ -596,7 +684,7 @@ class DietaryRestrictions(GenericReportView):
             'trippee__trip_assignment__section',
             'trippee__trip_assignment__template',
         )
-        return itertools.chain(applications, registrations)
+        return itertools.chain(self.iterate(applications), self.iterate(registrations))
 
     header = [
         'name',
@@ -721,17 +809,62 @@ class Statistics(DatabaseTemplateView):
     template_name = 'reports/statistics.html'
 
     def extra_context(self):
-        IS = IncomingStudent
-
-        counts = lambda qs: {
-            'firstyear_count': qs.filter(incoming_status=IS.FIRSTYEAR).count(),
-            'transfer_count': qs.filter(incoming_status=IS.TRANSFER).count(),
-            'exchange_count': qs.filter(incoming_status=IS.EXCHANGE).count(),
-            'unlabeled': qs.filter(incoming_status='').count(),
-            'total': qs.count(),
-        }
+        charges = Charge.objects.filter(trips_year=self.trips_year)
+        return dict(
+            aggregates.incoming_counts(self.trips_year),
+            registrations=aggregates.registration_counts(self.trips_year),
+            charges=charges.totals() if charges.exists() else None,
+            charges_stale=Charge.objects.is_stale(self.trips_year),
+        )
 
-        return {
-            'with_trip': counts(IS.objects.with_trip(self.trips_year)),
-            'cancelled': counts(IS.objects.cancelled(self.trips_year)),
-        }
+
+class ReportJobs(
+    DatabaseReadPermissionRequired, ExtraContextMixin, TripsYearMixin, FormView
+):
+    """
+    Run reports in the background, and list recent report jobs.
+    """
+
+    form_class = ReportJobForm
+    template_name = 'reports/jobs.html'
+
+    def form_valid(self, form):
+        job = jobs.request_report(
+            self.trips_year, form.cleaned_data['report'], user=self.request.user
+        )
+        return HttpResponseRedirect(job.get_absolute_url())
+
+    def extra_context(self):
+        return {'jobs': ReportJob.objects.filter(trips_year=self.trips_year)[:20]}
+
+
+class ReportJobDetail(
+    DatabaseReadPermissionRequired, ExtraContextMixin, TripsYearMixin, DetailView
+):
+    """
+    The progress of a report job, and a link to the finished report.
+    """
+
+    model = ReportJob
+    template_name = 'reports/job.html'
+    context_object_name = 'job'
+
+
+class Workbook(DatabaseReadPermissionRequired, TripsYearMixin, FormView):
+    """
+    Download an Excel workbook with a sheet for each of the selected
+    reports.
+    """
+
+    form_class = WorkbookForm
+    template_name = 'reports/workbook.html'
+
+    def form_valid(self, form):
+        f = tempfile.TemporaryFile()
+        workbook.write_workbook(
+            f, self.trips_year, reports=form.cleaned_data['reports']
+        )
+        f.seek(0)
+        return FileResponse(
+            f, as_attachment=True, filename=workbook.get_filename(self.trips_year)
+        )
@@ -0,0 +1,61 @@
+"""
+Excel workbooks of several reports.
+
+Each report is written to its own sheet, using the header and rows of its
+``GenericReportView``. Rows are streamed from the database and written by
+``pyexcel-xlsxw``, which keeps only the current row of each sheet in memory.
+"""
+import numbers
+from collections import OrderedDict
+
+import pyexcel
+
+from fyt.reports.jobs import REPORTS, report_view
+
+
+# The url names of reports which can be included in a workbook, in the order
+# of their sheets
+SHEETS = [
+    'leaders',
+    'croo_members',
+    'trippees',
+    'housing',
+    'dietary',
+    'medical',
+    'foodboxes',
+    'bus_stops',
+]
+
+
+def get_filename(trips_year):
+    return 'Reports-{}.xlsx'.format(trips_year)
+
+
+def cell(value):
+    """
+    Numbers are written as numbers, and everything else as it is written to
+    the CSV reports.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return value
+    return str(value)
+
+
+def sheet_rows(trips_year, report):
+    view = report_view(trips_year, report)
+    for row in view.values():
+        yield [cell(value) for value in row]
+
+
+def write_workbook(f, trips_year, reports=SHEETS):
+    """
+    Write a workbook with a sheet for each of ``reports`` to the file ``f``.
+    """
+    sheets = OrderedDict(
+        (REPORTS[report], sheet_rows(trips_year, report))
+        for report in SHEETS
+        if report in reports
+    )
+    pyexcel.isave_book_as(bookdict=sheets, dest_file_type='xlsx', dest_file_stream=f)
@@ -43,6 +43,12 @@ AWS_DEFAULT_ACL = None
 DEFAULT_FILE_STORAGE = 'fyt.utils.storages.S3FileStorage'
 FILE_STORAGE_PREFIX = 'uploads'
 
+# Keep files on disk during development, unless S3 is configured
+if DEBUG and not AWS_STORAGE_BUCKET_NAME:
+    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+    MEDIA_ROOT = os.path.join(BASE_DIR, '..', 'media')
+    MEDIA_URL = '/media/'
+
 # CanonicalHostMiddleware redirects requests for HEROKU_HOST to
 # CANONICAL_HOST.
 HEROKU_HOST = 'doc-trips.herokuapp.com'
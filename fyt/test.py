@@ -3,8 +3,11 @@ import itertools
 import logging
 import os
 import string
+import threading
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django_webtest import WebTest
 from model_mommy import mommy, random_gen
 from vcr import VCR
@@ -51,6 +54,39 @@ vcr = VCR(
 )  # Strip Google Maps API key
 
 
+def run_concurrently(*funcs):
+    """
+    Call each of ``funcs`` at the same time, each in its own thread and so
+    with its own database connection. Use this in a ``TransactionTestCase``.
+
+    Returns the results of the calls, or raises the first exception.
+    """
+    barrier = threading.Barrier(len(funcs))
+    results = [None] * len(funcs)
+    errors = []
+
+    def run(i, func):
+        try:
+            barrier.wait()
+            results[i] = func()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=run, args=(i, func)) for i, func in enumerate(funcs)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
 class FytTestCase(WebTest):
     """
     WebTest allows us to make requests without having to mock CAS
@@ -69,10 +105,24 @@ class FytTestCase(WebTest):
         # solution to this.
         logging.disable(logging.CRITICAL)
 
+        # Cached fragments must not leak between tests
+        cache.clear()
+
     def _unpatch_settings(self):
         super()._unpatch_settings()
         logging.disable(logging.NOTSET)
 
+    def run_commit_hooks(self):
+        """
+        Run the ``transaction.on_commit`` callbacks registered so far.
+
+        A TestCase never commits its transaction, so these would otherwise
+        never be called.
+        """
+        hooks, connection.run_on_commit = connection.run_on_commit, []
+        for _, func in hooks:
+            func()
+
     def init_trips_year(self):
         """
         Initialize a current trips_year object in the test database.
@@ -2,6 +2,7 @@ from django.db import models
 from django.db.models import Q
 
 from fyt.transport.category import EXTERNAL, INTERNAL
+from fyt.utils.cache import bump_data_version
 from fyt.utils.matrix import OrderedMatrix
 
 
@@ -143,3 +144,59 @@ class StopOrderManager(models.Manager):
             'trip__template__dropoff_stop',
             'trip__template__pickup_stop',
         )
+
+    def create_for_new_trips(self, trips_year, trips):
+        """
+        Create the dropoff and pickup StopOrders for newly created trips.
+
+        This is the batched equivalent of the ``update_ordering_for_trip_changes``
+        signal, for trips created with ``bulk_create``. All buses for the year
+        are loaded in one query instead of looking up two buses per trip.
+        """
+        from fyt.trips.models import Trip
+        from fyt.transport.models import InternalBus
+
+        trips = Trip.objects.filter(pk__in=[trip.pk for trip in trips]).select_related(
+            'dropoff_route',
+            'pickup_route',
+            'template__dropoff_stop__route',
+            'template__pickup_stop__route',
+        )
+        buses = {
+            (bus.route_id, bus.date): bus
+            for bus in InternalBus.objects.filter(trips_year=trips_year)
+        }
+
+        def stoporder(trip, route, date, stop, stop_type):
+            bus = buses.get((getattr(route, 'pk', None), date))
+            if bus is not None:
+                return self.model(
+                    trips_year=trips_year,
+                    bus=bus,
+                    trip=trip,
+                    stop_type=stop_type,
+                    order=stop.distance,
+                )
+
+        orders = []
+        for trip in trips:
+            orders += [
+                stoporder(
+                    trip,
+                    trip.get_dropoff_route(),
+                    trip.dropoff_date,
+                    trip.template.dropoff_stop,
+                    self.model.DROPOFF,
+                ),
+                stoporder(
+                    trip,
+                    trip.get_pickup_route(),
+                    trip.pickup_date,
+                    trip.template.pickup_stop,
+                    self.model.PICKUP,
+                ),
+            ]
+
+        created = self.bulk_create(filter(None, orders))
+        bump_data_version(trips_year, self.model)
+        return created
@@ -11,6 +11,7 @@ from fyt.transport.models import (
     TransportConfig,
 )
 from fyt.trips.models import Section, Trip, TripTemplate
+from fyt.utils.cache import bump_data_version
 
 
 def create_dropoff(bus, trip):
@@ -134,6 +135,7 @@ def mark_buses_dirty_for_address_changes(instance, created, **kwargs):
         # TODO: iterate and save if we use a signal to generate directions
         # based on the dirty flag, since `update` does not emit a signal.
         affected_buses.update(dirty=True)
+        bump_data_version(instance.trips_year_id, InternalBus)
 
 
 @receiver(post_save, sender=StopOrder)
@@ -182,3 +184,4 @@ def update_all_buses_for_hanover_and_lodge_changes(instance, created, **kwargs):
     ):
 
         InternalBus.objects.filter(trips_year=instance.trips_year).update(dirty=True)
+        bump_data_version(instance.trips_year_id, InternalBus)
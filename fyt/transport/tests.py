@@ -37,7 +37,7 @@ from fyt.transport.views import (
     preload_transported_trips,
     trip_transport_matrix,
 )
-from fyt.trips.models import Section, Trip
+from fyt.trips.models import Section, Trip, TripTemplate
 
 
 """
@@ -1122,6 +1122,49 @@ class RefactorTestCase(TransportTestCase):
 
         self.assertQsEqual(bus.get_stop_ordering(), [])
 
+    def test_bulk_scheduling_trips_adds_to_ordering(self):
+        bus = mommy.make(
+            InternalBus,
+            trips_year=self.trips_year,
+            date=date(2015, 1, 1),
+            route__category=Route.INTERNAL,
+            route__trips_year=self.trips_year,
+        )
+        stop1 = mommy.make(
+            Stop, trips_year=self.trips_year, route=bus.route, distance=1
+        )
+        stop2 = mommy.make(
+            Stop, trips_year=self.trips_year, route=bus.route, distance=2
+        )
+        template1 = mommy.make(
+            TripTemplate, trips_year=self.trips_year, dropoff_stop=stop1
+        )
+        template2 = mommy.make(
+            TripTemplate, trips_year=self.trips_year, pickup_stop=stop2
+        )
+        section1 = mommy.make(
+            Section,
+            trips_year=self.trips_year,
+            leaders_arrive=bus.date - timedelta(days=2),
+        )
+        section2 = mommy.make(
+            Section,
+            trips_year=self.trips_year,
+            leaders_arrive=bus.date - timedelta(days=4),
+        )
+
+        trip1, trip2 = Trip.objects.bulk_schedule(
+            self.trips_year, [(template1, section1), (template2, section2)]
+        )
+
+        self.assertQsContains(
+            bus.get_stop_ordering(),
+            [
+                {'bus': bus, 'trip': trip1, 'stop_type': StopOrder.DROPOFF, 'order': 1},
+                {'bus': bus, 'trip': trip2, 'stop_type': StopOrder.PICKUP, 'order': 2},
+            ],
+        )
+
     def test_changing_trip_route_changes_ordering(self):
         bus1 = mommy.make(
             InternalBus,
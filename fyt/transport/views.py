@@ -6,11 +6,13 @@ from django.core.exceptions import ValidationError
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from django.utils.functional import cached_property
+from django.utils.functional import SimpleLazyObject, cached_property
 from raven.contrib.django.raven_compat.models import client as sentry
 from vanilla.views import FormView, TemplateView
 
+from fyt.applications.models import Volunteer
 from fyt.core.views import (
+    DataVersionMixin,
     DatabaseCreateView,
     DatabaseDeleteView,
     DatabaseDetailView,
@@ -253,28 +255,53 @@ def total_size(trips):
     return sum(trip.size for trip in trips)
 
 
-class InternalBusMatrix(DatabaseReadPermissionRequired, TripsYearMixin, TemplateView):
+class InternalBusMatrix(
+    DataVersionMixin, DatabaseReadPermissionRequired, TripsYearMixin, TemplateView
+):
     template_name = 'transport/internal_matrix.html'
+    version_models = [
+        Route,
+        Vehicle,
+        Stop,
+        InternalBus,
+        StopOrder,
+        TransportConfig,
+        Section,
+        TripTemplate,
+        Trip,
+        Volunteer,
+        IncomingStudent,
+    ]
+
+    @cached_property
+    def matrix(self):
+        return get_internal_route_matrix(self.trips_year)
+
+    @cached_property
+    def riders(self):
+        return get_internal_rider_matrix(self.trips_year)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['matrix'] = matrix = get_internal_route_matrix(self.trips_year)
-        context['riders'] = riders = get_internal_rider_matrix(self.trips_year)
-        context['issues'] = get_internal_issues_matrix(matrix, riders)
+        context['matrix'] = SimpleLazyObject(lambda: self.matrix)
+        context['riders'] = SimpleLazyObject(lambda: self.riders)
+        context['issues'] = SimpleLazyObject(
+            lambda: get_internal_issues_matrix(self.matrix, self.riders)
+        )
         context['NOT_SCHEDULED'] = NOT_SCHEDULED
         context['EXCEEDS_CAPACITY'] = EXCEEDS_CAPACITY
 
         # Transport numbers
         # TODO: move to separate view
-        context['dropoff_matrix'] = riders.map(
-            lambda x: total_size(x.dropping_off)
-        ).truncate()
-        context['pickup_matrix'] = riders.map(
-            lambda x: total_size(x.picking_up)
-        ).truncate()
-        context['return_matrix'] = riders.map(
-            lambda x: total_size(x.returning)
-        ).truncate()
+        context['dropoff_matrix'] = SimpleLazyObject(
+            lambda: self.riders.map(lambda x: total_size(x.dropping_off)).truncate()
+        )
+        context['pickup_matrix'] = SimpleLazyObject(
+            lambda: self.riders.map(lambda x: total_size(x.picking_up)).truncate()
+        )
+        context['return_matrix'] = SimpleLazyObject(
+            lambda: self.riders.map(lambda x: total_size(x.returning)).truncate()
+        )
 
         return context
 
@@ -558,15 +585,27 @@ def wrap_trip(trip, route_getter):
         return TripWrapper(trip, route_getter)
 
 
-class InternalTransportByDate(DatabaseTemplateView):
+class InternalTransportByDate(DataVersionMixin, DatabaseTemplateView):
     template_name = 'transport/internal_by_date.html'
+    version_models = [Route, Stop, Section, TripTemplate, Trip]
+
+    @cached_property
+    def matrices(self):
+        return trip_transport_matrix(self.trips_year)
 
     def extra_context(self):
-        d, p, r = trip_transport_matrix(self.trips_year)
         return {
-            'dropoff_matrix': d.map(lambda t: wrap_trip(t, 'get_dropoff_route')),
-            'pickup_matrix': p.map(lambda t: wrap_trip(t, 'get_pickup_route')),
-            'return_matrix': r.map(lambda t: wrap_trip(t, 'get_return_route')),
+            'dropoff_matrix': SimpleLazyObject(
+                lambda: self.matrices[0].map(
+                    lambda t: wrap_trip(t, 'get_dropoff_route')
+                )
+            ),
+            'pickup_matrix': SimpleLazyObject(
+                lambda: self.matrices[1].map(lambda t: wrap_trip(t, 'get_pickup_route'))
+            ),
+            'return_matrix': SimpleLazyObject(
+                lambda: self.matrices[2].map(lambda t: wrap_trip(t, 'get_return_route'))
+            ),
         }
 
 
@@ -7,7 +7,13 @@ from django import forms
 from fyt.applications.models import Volunteer
 from fyt.core.forms import TripsYearModelForm
 from fyt.incoming.models import IncomingStudent
-from fyt.trips.models import Section, Trip, TripTemplate, TripTemplateDescription
+from fyt.trips.models import (
+    Campsite,
+    Section,
+    Trip,
+    TripTemplate,
+    TripTemplateDescription,
+)
 
 
 class SectionForm(TripsYearModelForm):
@@ -42,6 +48,50 @@ class TripTemplateForm(TripsYearModelForm):
         helper.form_tag = False
         return helper
 
+    def campsite_conflicts(self):
+        """
+        Return the campsite capacity conflicts that saving this form would
+        cause at the template's campsites.
+
+        This is evaluated against the cleaned data, before the template
+        is saved. New templates do not have any trips yet.
+        """
+        if self.instance.pk is None:
+            return []
+
+        campsites = (self.cleaned_data['campsite1'], self.cleaned_data['campsite2'])
+        return Campsite.objects.capacity_conflicts(
+            self.trips_year,
+            overrides={self.instance.pk: campsites},
+            campsites=campsites,
+        )
+
+
+class ScheduleTripsForm(forms.Form):
+    """
+    Select cells of the template x section matrix to schedule as trips.
+
+    Each cell is submitted as ``<template pk>-<section pk>``.
+    """
+
+    cells = forms.MultipleChoiceField()
+
+    def __init__(self, trips_year, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        templates = TripTemplate.objects.filter(trips_year=trips_year)
+        sections = Section.objects.filter(trips_year=trips_year)
+        self.fields['cells'].choices = [
+            ('{}-{}'.format(t.pk, s.pk), '{}{}'.format(s.name, t.name))
+            for t in templates
+            for s in sections
+        ]
+
+    def clean_cells(self):
+        """
+        Return a list of ``(template pk, section pk)`` pairs.
+        """
+        return [tuple(map(int, cell.split('-'))) for cell in self.cleaned_data['cells']]
+
 
 class TripTemplateDescriptionForm(TripsYearModelForm):
     class Meta:
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from fyt.core.models import TripsYear
+from fyt.trips import packets
+from fyt.trips.models import Section
+
+
+class Command(BaseCommand):
+    help = "Render the leader and medical packets for every section to file storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trips-year',
+            type=int,
+            help='Generate packets for this trips year. Defaults to the current year.',
+        )
+
+    def handle(self, *args, **options):
+        if options['trips_year']:
+            trips_year = TripsYear.objects.get(year=options['trips_year'])
+        else:
+            trips_year = TripsYear.objects.current()
+
+        for section in Section.objects.filter(trips_year=trips_year):
+            for kind in packets.PACKET_TEMPLATES:
+                name = packets.save_packets(section, kind)
+                self.stdout.write(
+                    'Saved {} packet for {} to {}'.format(kind, section, name)
+                )
@@ -1,8 +1,10 @@
+from collections import namedtuple
 from datetime import timedelta
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models import F, Q
 
+from fyt.utils.cache import bump_data_version
 from fyt.utils.matrix import OrderedMatrix
 
 
@@ -105,6 +107,97 @@ class TripManager(models.Manager):
 
         return matrix
 
+    def bulk_schedule(self, trips_year, cells):
+        """
+        Schedule a trip for each ``(template, section)`` pair in ``cells``.
+
+        All trips are created with a single ``bulk_create``; pairs which are
+        already scheduled are skipped. The templates are locked while the
+        scheduled pairs are read, so that concurrent requests can't schedule
+        the same trip twice. Since ``bulk_create`` does not send
+        ``post_save`` signals, the transport StopOrders for the new trips are
+        created in one batch as well.
+
+        Returns a list of the created trips.
+        """
+        from fyt.transport.models import StopOrder
+        from fyt.trips.models import TripTemplate
+
+        cells = [
+            (getattr(template, 'pk', template), getattr(section, 'pk', section))
+            for template, section in cells
+        ]
+
+        with transaction.atomic():
+            list(
+                TripTemplate.objects.filter(pk__in={template for template, _ in cells})
+                .order_by('pk')
+                .select_for_update()
+                .values_list('pk', flat=True)
+            )
+            scheduled = set(
+                self.filter(trips_year=trips_year).values_list('template', 'section')
+            )
+
+            trips = []
+            for key in cells:
+                if key not in scheduled:
+                    scheduled.add(key)
+                    trips.append(
+                        self.model(
+                            trips_year=trips_year,
+                            template_id=key[0],
+                            section_id=key[1],
+                        )
+                    )
+
+            trips = self.bulk_create(trips)
+            StopOrder.objects.create_for_new_trips(trips_year, trips)
+
+        bump_data_version(trips_year, self.model)
+        return trips
+
+    def schedule_from_sheet(self, sheet, trips_year):
+        """
+        Schedule trips from a pyexcel sheet laid out like the trip matrix.
+
+        The first row contains section names and the first column contains
+        template names. A trip is scheduled for every non-empty cell.
+
+        Raises a ``ValueError`` for unknown sections or templates.
+        """
+        from fyt.trips.models import Section, TripTemplate
+
+        sections = {
+            str(s.name): s for s in Section.objects.filter(trips_year=trips_year)
+        }
+        templates = {
+            str(t.name): t for t in TripTemplate.objects.filter(trips_year=trips_year)
+        }
+
+        def lookup(objects, name, label):
+            try:
+                return objects[str(name).strip()]
+            except KeyError:
+                raise ValueError('Unknown {} {!r}'.format(label, name))
+
+        rows = sheet.to_array()
+        header = [
+            lookup(sections, name, 'section') if str(name).strip() else None
+            for name in rows[0][1:]
+        ]
+
+        cells = []
+        for row in rows[1:]:
+            if not str(row[0]).strip():
+                continue
+            template = lookup(templates, row[0], 'template')
+            for section, value in zip(header, row[1:]):
+                if section is not None and str(value).strip():
+                    cells.append((template, section))
+
+        return self.bulk_schedule(trips_year, cells)
+
     def with_counts(self, trips_year):
         """
         Annotate the number of trippees and leaders.
@@ -188,6 +281,75 @@ class CampsiteManager(models.Manager):
 
         return matrix
 
+    def occupancy(self, trips_year, overrides=None):
+        """
+        Return a matrix of the number of people staying at each campsite
+        on each night.
+
+        matrix[campsite][date] is the combined size of all trips staying at
+        campsite on date. Runs a constant number of queries regardless of
+        the number of trips.
+
+        ``overrides`` maps a TripTemplate pk to a ``(campsite1, campsite2)``
+        pair which is used instead of the saved campsites of the template.
+        Use this to evaluate a change before it is saved.
+        """
+        from .models import Section, Trip
+
+        campsites = list(self.filter(trips_year=trips_year))
+        dates = Section.dates.camping_dates(trips_year)
+        matrix = OrderedMatrix(campsites, dates, default=0)
+
+        by_pk = {campsite.pk: campsite for campsite in campsites}
+        overrides = {
+            template: tuple(getattr(c, 'pk', c) for c in pair)
+            for template, pair in (overrides or {}).items()
+        }
+
+        trips = Trip.objects.with_counts(trips_year).values_list(
+            'template',
+            'template__campsite1',
+            'template__campsite2',
+            'section__leaders_arrive',
+            'size',
+        )
+
+        first, second = timedelta(days=2), timedelta(days=3)
+        for template, campsite1, campsite2, leaders_arrive, size in trips:
+            campsite1, campsite2 = overrides.get(template, (campsite1, campsite2))
+            matrix[by_pk[campsite1]][leaders_arrive + first] += size
+            matrix[by_pk[campsite2]][leaders_arrive + second] += size
+
+        return matrix
+
+    def capacity_conflicts(self, trips_year, overrides=None, campsites=None):
+        """
+        Return a list of ``CapacityConflict`` tuples for every night on
+        which a campsite holds more people than its capacity.
+
+        Campsites without a capacity are never flagged. Pass ``campsites``
+        to only check some campsites; ``overrides`` is passed through to
+        ``occupancy``.
+        """
+        occupancy = self.occupancy(trips_year, overrides=overrides)
+        if campsites is not None:
+            campsites = {getattr(c, 'pk', c) for c in campsites}
+
+        conflicts = []
+        for campsite, dates in occupancy.items():
+            if campsite.capacity is None:
+                continue
+            if campsites is not None and campsite.pk not in campsites:
+                continue
+            for date, headcount in dates.items():
+                if headcount > campsite.capacity:
+                    conflicts.append(CapacityConflict(campsite, date, headcount))
+
+        return conflicts
+
+
+CapacityConflict = namedtuple('CapacityConflict', ['campsite', 'date', 'headcount'])
+
 
 class TripTypeManager(models.Manager):
     def visible(self, trips_year):
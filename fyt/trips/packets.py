@@ -0,0 +1,97 @@
+"""
+Streaming rendering of the leader and medical packets for a section.
+
+The packet pages are rendered one trip at a time so that memory use does not
+grow with the size of the section.
+"""
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from fyt.trips.models import Trip
+from fyt.utils.query import chunked_iterator
+
+
+LEADER = 'leader'
+MEDICAL = 'medical'
+
+# Page template and single trip template for each kind of packet
+PACKET_TEMPLATES = {
+    LEADER: ('trips/section_packet.html', 'trips/_section_packet.html'),
+    MEDICAL: ('trips/medical_packet.html', 'trips/_section_medical.html'),
+}
+
+# Marks where the trips go in the rendered page
+PLACEHOLDER = '<!-- packets -->'
+
+# Number of trips to prefetch leaders and trippees for at a time
+CHUNK_SIZE = 20
+
+PREFETCH = ['leaders', 'leaders__applicant', 'trippees', 'trippees__registration']
+
+
+def section_trips(section):
+    """
+    All trips in the section, with everything needed for their packets.
+    """
+    return (
+        Trip.objects.filter(section=section)
+        .select_related(
+            'template__campsite1',
+            'template__campsite2',
+            'template__dropoff_stop',
+            'template__pickup_stop',
+            'template__description',
+        )
+        .order_by(*Trip._meta.ordering)
+    )
+
+
+def stream_packets(section, kind, context=None, request=None):
+    """
+    Yield the ``kind`` packet page for ``section``, one trip at a time.
+
+    ``context`` and ``request`` are used to render the page around the
+    packets.
+    """
+    page_template, trip_template = PACKET_TEMPLATES[kind]
+
+    context = dict(context or {}, section=section, packets=mark_safe(PLACEHOLDER))
+    page = render_to_string(page_template, context, request=request)
+    head, tail = page.split(PLACEHOLDER)
+
+    yield head
+
+    template = get_template(trip_template)
+    trips = chunked_iterator(section_trips(section), *PREFETCH, chunk_size=CHUNK_SIZE)
+    for trip in trips:
+        yield template.render({'trip': trip})
+
+    yield tail
+
+
+def packet_path(section, kind):
+    return 'packets/{}/{}-{}.html'.format(section.trips_year_id, kind, section.pk)
+
+
+def save_packets(section, kind, storage=default_storage):
+    """
+    Render the ``kind`` packet for ``section`` to ``storage``, replacing any
+    previously saved copy.
+
+    Returns the name of the saved file.
+    """
+    name = packet_path(section, kind)
+    context = {'trips_year': section.trips_year}
+
+    with tempfile.TemporaryFile() as f:
+        for chunk in stream_packets(section, kind, context=context):
+            f.write(chunk.encode('utf-8'))
+        f.seek(0)
+
+        if storage.exists(name):
+            storage.delete(name)
+        return storage.save(name, File(f))
@@ -1,14 +1,20 @@
 import math
+import tempfile
 import unittest
 from datetime import date, time, timedelta
 
 import boto3  # This is required to fix an issue with VCR
+import pyexcel
 import webtest
 from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
 from django.forms.models import model_to_dict
+from django.test import TransactionTestCase
 from django.urls import reverse
 from model_mommy import mommy
 
+from .. import packets
+from ..forms import TripTemplateForm
 from ..models import (
     NUM_BAGELS_REGULAR,
     NUM_BAGELS_SUPPLEMENT,
@@ -23,13 +29,14 @@ from ..models import (
 from fyt.applications.models import Volunteer
 from fyt.applications.tests import make_application
 from fyt.core.forward import forward
+from fyt.core.models import TripsYear
 from fyt.incoming.models import (
     IncomingStudent,
     Registration,
     RegistrationSectionChoice,
     RegistrationTripTypeChoice,
 )
-from fyt.test import FytTestCase, vcr
+from fyt.test import FytTestCase, run_concurrently, vcr
 from fyt.timetable.models import Timetable
 from fyt.transport.models import Route
 from fyt.utils.choices import AVAILABLE, PREFER
@@ -577,6 +584,50 @@ class TripManagerTestCase(FytTestCase):
         self.assertEqual(trip.num_leaders, 0)
 
 
+class BulkScheduleTestCase(FytTestCase):
+    def setUp(self):
+        self.trips_year = self.init_trips_year()
+        self.section = mommy.make(Section, trips_year=self.trips_year, name='A')
+        self.templates = mommy.make(TripTemplate, 3, trips_year=self.trips_year)
+
+    def test_bulk_schedule(self):
+        cells = [(template, self.section) for template in self.templates]
+        trips = Trip.objects.bulk_schedule(self.trips_year, cells)
+        self.assertQsEqual(Trip.objects.all(), trips, ordered=False)
+
+    def test_bulk_schedule_skips_scheduled_trips(self):
+        trip = mommy.make(
+            Trip,
+            trips_year=self.trips_year,
+            template=self.templates[0],
+            section=self.section,
+        )
+        cells = [(template.pk, self.section.pk) for template in self.templates]
+        trips = Trip.objects.bulk_schedule(self.trips_year, cells + cells)
+        self.assertEqual(len(trips), 2)
+        self.assertEqual(Trip.objects.count(), 3)
+
+    def test_schedule_from_sheet_with_unknown_section(self):
+        sheet = pyexcel.Sheet([['', 'Z'], [self.templates[0].name, 'x']])
+        with self.assertRaisesRegex(ValueError, "Unknown section 'Z'"):
+            Trip.objects.schedule_from_sheet(sheet, self.trips_year)
+
+
+class ConcurrentBulkScheduleTestCase(TransactionTestCase):
+    def test_concurrent_requests_schedule_each_trip_once(self):
+        trips_year = mommy.make(TripsYear, year=2014, is_current=True)
+        section = mommy.make(Section, trips_year=trips_year)
+        templates = mommy.make(TripTemplate, 3, trips_year=trips_year)
+        cells = [(template, section) for template in templates]
+
+        results = run_concurrently(
+            lambda: Trip.objects.bulk_schedule(trips_year, cells),
+            lambda: Trip.objects.bulk_schedule(trips_year, cells),
+        )
+        self.assertEqual(sorted(len(trips) for trips in results), [0, 3])
+        self.assertEqual(Trip.objects.count(), 3)
+
+
 class CampsiteManagerTestCase(FytTestCase):
     def test_campsite_matrix(self):
         trips_year = self.init_trips_year()
@@ -606,6 +657,78 @@ class CampsiteManagerTestCase(FytTestCase):
         actual = Campsite.objects.matrix(trips_year)
         self.assertEqual(target, actual)
 
+    def make_campsites(self):
+        trips_year = self.init_trips_year()
+        sxn = mommy.make(Section, trips_year=trips_year)
+        campsite_a = mommy.make(Campsite, trips_year=trips_year, capacity=4)
+        campsite_b = mommy.make(Campsite, trips_year=trips_year, capacity=None)
+        trip1 = mommy.make(
+            Trip,
+            trips_year=trips_year,
+            section=sxn,
+            template__trips_year=trips_year,
+            template__campsite1=campsite_a,
+            template__campsite2=campsite_b,
+        )
+        trip2 = mommy.make(
+            Trip,
+            trips_year=trips_year,
+            section=sxn,
+            template__trips_year=trips_year,
+            template__campsite1=campsite_b,
+            template__campsite2=campsite_a,
+        )
+        mommy.make(IncomingStudent, 3, trips_year=trips_year, trip_assignment=trip1)
+        mommy.make(Volunteer, 2, trips_year=trips_year, trip_assignment=trip1)
+        mommy.make(IncomingStudent, 2, trips_year=trips_year, trip_assignment=trip2)
+        return trips_year, sxn, campsite_a, campsite_b, trip1
+
+    def test_occupancy(self):
+        trips_year, sxn, campsite_a, campsite_b, trip = self.make_campsites()
+        with self.assertNumQueries(3):
+            occupancy = Campsite.objects.occupancy(trips_year)
+        self.assertEqual(
+            occupancy,
+            {
+                campsite_a: {sxn.at_campsite1: 5, sxn.at_campsite2: 2},
+                campsite_b: {sxn.at_campsite1: 2, sxn.at_campsite2: 5},
+            },
+        )
+
+    def test_occupancy_with_overrides(self):
+        trips_year, sxn, campsite_a, campsite_b, trip = self.make_campsites()
+        overrides = {trip.template.pk: (campsite_a, campsite_a)}
+        occupancy = Campsite.objects.occupancy(trips_year, overrides=overrides)
+        self.assertEqual(
+            occupancy,
+            {
+                campsite_a: {sxn.at_campsite1: 5, sxn.at_campsite2: 7},
+                campsite_b: {sxn.at_campsite1: 2, sxn.at_campsite2: 0},
+            },
+        )
+
+    def test_capacity_conflicts(self):
+        trips_year, sxn, campsite_a, campsite_b, trip = self.make_campsites()
+        self.assertEqual(
+            Campsite.objects.capacity_conflicts(trips_year),
+            [(campsite_a, sxn.at_campsite1, 5)],
+        )
+        self.assertEqual(
+            Campsite.objects.capacity_conflicts(trips_year, campsites=[campsite_b]), [],
+        )
+
+    def test_triptemplate_form_campsite_conflicts(self):
+        trips_year, sxn, campsite_a, campsite_b, trip = self.make_campsites()
+        form = TripTemplateForm(instance=trip.template)
+        form.cleaned_data = {'campsite1': campsite_b, 'campsite2': campsite_b}
+        self.assertEqual(form.campsite_conflicts(), [])
+
+        form.cleaned_data = {'campsite1': campsite_a, 'campsite2': campsite_a}
+        self.assertEqual(
+            form.campsite_conflicts(),
+            [(campsite_a, sxn.at_campsite1, 5), (campsite_a, sxn.at_campsite2, 7)],
+        )
+
 
 class ViewsTestCase(FytTestCase):
 
@@ -624,6 +747,40 @@ class ViewsTestCase(FytTestCase):
         resp.form.submit()
         Trip.objects.get(section=section, template=template)
 
+    def test_schedule_trips_from_matrix(self):
+        trips_year = self.init_trips_year()
+        section1 = mommy.make(Section, trips_year=trips_year)
+        section2 = mommy.make(Section, trips_year=trips_year)
+        template = mommy.make(TripTemplate, trips_year=trips_year)
+        url = reverse('core:trip:index', kwargs={'trips_year': trips_year})
+        resp = self.app.get(url, user=self.make_director())
+        resp.form['cells'] = ['{}-{}'.format(template.pk, section2.pk)]
+        resp.form.submit().follow()
+        self.assertQsEqual(Trip.objects.all(), [Trip.objects.get(section=section2)])
+
+    def test_upload_trip_schedule(self):
+        trips_year = self.init_trips_year()
+        section1 = mommy.make(Section, trips_year=trips_year, name='A')
+        section2 = mommy.make(Section, trips_year=trips_year, name='B')
+        template1 = mommy.make(TripTemplate, trips_year=trips_year, name=101)
+        template2 = mommy.make(TripTemplate, trips_year=trips_year, name=102)
+        url = reverse('core:trip:upload_schedule', kwargs={'trips_year': trips_year})
+        resp = self.app.get(url, user=self.make_director())
+        resp.form['spreadsheet'] = webtest.Upload(
+            'schedule.csv', b',A,B\n101,x,\n102,x,x\n'
+        )
+        resp.form.submit().follow()
+        self.assertQsEqual(
+            Trip.objects.values_list('template', 'section'),
+            [
+                (template1.pk, section1.pk),
+                (template2.pk, section1.pk),
+                (template2.pk, section2.pk),
+            ],
+            transform=tuple,
+            ordered=False,
+        )
+
     def test_packet_shows_leader_med_info(self):
         trips_year = self.init_trips_year()
         trip = mommy.make(Trip, trips_year=trips_year)
@@ -742,3 +899,50 @@ class TripTemplateDocumentUploadTestCase(FytTestCase):
         files = tt.documents.all()
         self.assertEqual(len(files), 1)
         self.assertEqual(files[0].name, 'Map')
+
+
+class SectionPacketTestCase(FytTestCase):
+    def setUp(self):
+        self.trips_year = self.init_trips_year()
+        self.section = mommy.make(Section, trips_year=self.trips_year, name='A')
+        self.trips = mommy.make(
+            Trip, 3, trips_year=self.trips_year, section=self.section
+        )
+        for trip in self.trips:
+            mommy.make(
+                Volunteer,
+                trips_year=self.trips_year,
+                trip_assignment=trip,
+                medical_conditions='magic',
+            )
+
+    def test_section_packets_are_streamed(self):
+        url = reverse(
+            'core:packets:section',
+            kwargs={'trips_year': self.trips_year, 'section_pk': self.section.pk},
+        )
+        resp = self.app.get(url, user=self.make_director())
+        self.assertContains(resp, 'Leader Packets')
+        for trip in self.trips:
+            self.assertContains(resp, trip.verbose_str())
+
+    def test_medical_packets_are_streamed(self):
+        url = reverse(
+            'core:packets:medical',
+            kwargs={'trips_year': self.trips_year, 'section_pk': self.section.pk},
+        )
+        resp = self.app.get(url, user=self.make_director())
+        self.assertContains(resp, 'magic', count=3)
+
+    def test_save_packets(self):
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+        name = packets.save_packets(self.section, packets.MEDICAL, storage=storage)
+        self.assertEqual(name, packets.packet_path(self.section, packets.MEDICAL))
+
+        # Saving again replaces the old copy
+        self.assertEqual(
+            name, packets.save_packets(self.section, packets.MEDICAL, storage=storage)
+        )
+        with storage.open(name) as f:
+            html = f.read().decode('utf-8')
+        self.assertEqual(html.count('magic'), 3)
@@ -13,6 +13,8 @@ database urlpatterns.
 trip_urlpatterns = [
     url(DB_REGEX['LIST'], TripList.as_view(), name='index'),
     url(DB_REGEX['CREATE'], TripCreate.as_view(), name='create'),
+    url(r'^schedule/$', ScheduleTrips.as_view(), name='schedule'),
+    url(r'^schedule/upload/$', UploadTripSchedule.as_view(), name='upload_schedule'),
     url(DB_REGEX['DETAIL'], TripDetail.as_view(), name='detail'),
     url(DB_REGEX['UPDATE'], TripUpdate.as_view(), name='update'),
     url(DB_REGEX['DELETE'], TripDelete.as_view(), name='delete'),
@@ -3,16 +3,20 @@ from statistics import mean
 
 from braces.views import FormValidMessageMixin, SetHeadlineMixin
 from crispy_forms.layout import Submit
-from django.db.models import Prefetch
+from django.contrib import messages
+from django.db.models import F, Prefetch
 from django.forms.models import modelformset_factory
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse
-from django.utils.functional import cached_property
+from django.utils.functional import SimpleLazyObject, cached_property
 from django.utils.safestring import mark_safe
 from vanilla import FormView, UpdateView
 
+from . import packets
 from .forms import (
     FoodboxFormsetHelper,
     LeaderAssignmentForm,
+    ScheduleTripsForm,
     SectionForm,
     TripTemplateDescriptionForm,
     TripTemplateForm,
@@ -38,14 +42,17 @@ from fyt.applications.models import (
 from fyt.core.views import (
     BaseCreateView,
     BaseUpdateView,
+    DataVersionMixin,
     DatabaseCreateView,
     DatabaseDeleteView,
     DatabaseDetailView,
+    DatabaseFormView,
     DatabaseListView,
     DatabaseTemplateView,
     DatabaseUpdateView,
     TripsYearMixin,
 )
+from fyt.incoming.forms import PyExcelFileForm
 from fyt.incoming.models import (
     AVAILABLE,
     FIRST_CHOICE,
@@ -162,6 +169,51 @@ class TripCreate(PopulateMixin, DatabaseCreateView):
     fields = ['section', 'template']
 
 
+class ScheduleTrips(DatabaseFormView):
+    """
+    Schedule all the trips selected in the trip matrix at once.
+    """
+
+    form_class = ScheduleTripsForm
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponseRedirect(self.get_success_url())
+
+    def form_valid(self, form):
+        trips = Trip.objects.bulk_schedule(self.trips_year, form.cleaned_data['cells'])
+        messages.success(self.request, 'Scheduled {} trips'.format(len(trips)))
+        return HttpResponseRedirect(self.get_success_url())
+
+    def form_invalid(self, form):
+        messages.error(self.request, 'Select at least one trip to schedule')
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get_success_url(self):
+        return reverse('core:trip:index', kwargs={'trips_year': self.trips_year})
+
+
+class UploadTripSchedule(DatabaseFormView):
+    """
+    Schedule trips from an uploaded spreadsheet of the trip matrix.
+    """
+
+    form_class = PyExcelFileForm
+    template_name = 'trips/upload_schedule.html'
+
+    def form_valid(self, form):
+        try:
+            trips = Trip.objects.schedule_from_sheet(form.load_sheet(), self.trips_year)
+        except ValueError as exc:
+            messages.error(self.request, str(exc))
+            return HttpResponseRedirect(self.request.path)
+
+        messages.success(self.request, 'Scheduled {} trips'.format(len(trips)))
+        return HttpResponseRedirect(self.get_success_url())
+
+    def get_success_url(self):
+        return reverse('core:trip:index', kwargs={'trips_year': self.trips_year})
+
+
 class TripDelete(DatabaseDeleteView):
     model = Trip
     success_url_pattern = 'core:trip:index'
@@ -244,6 +296,19 @@ class TripTemplateUpdate(
             'description_form': self.object.description,
         }
 
+    def form_valid(self, forms):
+        for conflict in forms['template_form'].campsite_conflicts():
+            messages.warning(
+                self.request,
+                '{} will hold {} people on {:%m/%d}, over its capacity of {}'.format(
+                    conflict.campsite,
+                    conflict.headcount,
+                    conflict.date,
+                    conflict.campsite.capacity,
+                ),
+            )
+        return super().form_valid(forms)
+
 
 class TripTemplateDelete(DatabaseDeleteView):
     model = TripTemplate
@@ -324,12 +389,20 @@ class TripTypeDelete(DatabaseDeleteView):
     success_url_pattern = 'core:triptype:index'
 
 
-class CampsiteMatrix(DatabaseTemplateView):
+class CampsiteMatrix(DataVersionMixin, DatabaseTemplateView):
     model = Campsite
     template_name = 'trips/campsite_index.html'
+    version_models = [Campsite, Section, TripTemplate, Trip, Volunteer, IncomingStudent]
 
     def extra_context(self):
-        return {'matrix': Campsite.objects.matrix(self.trips_year)}
+        return {
+            'matrix': SimpleLazyObject(
+                lambda: Campsite.objects.matrix(self.trips_year)
+            ),
+            'occupancy': SimpleLazyObject(
+                lambda: Campsite.objects.occupancy(self.trips_year)
+            ),
+        }
 
 
 class CampsiteCreate(DatabaseCreateView):
@@ -575,8 +648,10 @@ class AssignLeader(_TripMixin, DatabaseListView):
     def get_queryset(self):
         return (
             Volunteer.objects.prospective_leaders_for_trip(self.trip)
-            .with_avg_scores()
-            .order_by('-avg_leader_score')
+            .order_by(
+                F('normalized_leader_score').desc(nulls_last=True),
+                F('avg_leader_score').desc(nulls_last=True),
+            )
             .select_related(
                 'applicant',
                 'trip_assignment',
@@ -697,15 +772,18 @@ class RemoveAssignedTrip(
         )
 
 
-class TrippeeLeaderCounts(DatabaseTemplateView):
+class TrippeeLeaderCounts(DataVersionMixin, DatabaseTemplateView):
     """
     Shows a matrix of the number of tripees and leaders for all trips
     """
 
     template_name = 'trips/trippee_leader_counts.html'
+    version_models = [Section, TripTemplate, TripType, Trip, Volunteer, IncomingStudent]
 
     def extra_context(self):
-        return {'matrix': Trip.objects.matrix(self.trips_year)}
+        return {
+            'matrix': SimpleLazyObject(lambda: Trip.objects.matrix(self.trips_year))
+        }
 
 
 class FoodboxCounts(DatabaseListView):
@@ -766,29 +844,20 @@ class LeaderPacket(DatabaseDetailView):
     template_name = 'trips/leader_packet.html'
 
 
-class PacketsForSection(_SectionMixin, DatabaseListView):
+class PacketsForSection(_SectionMixin, DatabaseTemplateView):
     """
     All leader packets for a section.
+
+    The packets are streamed to the browser one trip at a time.
     """
 
-    model = Trip
-    template_name = 'trips/section_packet.html'
-    context_object_name = 'trips'
+    packet = packets.LEADER
 
-    def get_queryset(self):
-        return (
-            super()
-            .get_queryset()
-            .filter(section=self.section)
-            .select_related(
-                'template__campsite1',
-                'template__campsite2',
-                'template__dropoff_stop',
-                'template__pickup_stop',
-                'template__description',
-            )
-            .prefetch_related(
-                'leaders', 'leaders__applicant', 'trippees', 'trippees__registration'
+    def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        return StreamingHttpResponse(
+            packets.stream_packets(
+                self.section, self.packet, context=context, request=request
             )
         )
 
@@ -800,7 +869,7 @@ class MedicalInfoForSection(PacketsForSection):
     Contains leader and trippee med information.
     """
 
-    template_name = 'trips/medical_packet.html'
+    packet = packets.MEDICAL
 
 
 class TrippeeChecklist(_SectionMixin, DatabaseListView):
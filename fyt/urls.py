@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.conf.urls import include, url
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.views.generic import TemplateView
 
@@ -37,3 +38,7 @@ if settings.DEBUG:
     import debug_toolbar
 
     urlpatterns = [url(r'^__debug__/', include(debug_toolbar.urls))] + urlpatterns
+
+# Serve files saved to local storage during development
+if settings.DEBUG and settings.MEDIA_URL:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
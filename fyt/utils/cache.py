@@ -0,0 +1,68 @@
+"""
+Data versions for cached fragments of the trips database.
+
+Each model has a version counter per ``trips_year`` which is bumped whenever
+an instance is saved or deleted. Cache keys which include the version of
+every model that contributes to a page are invalidated automatically.
+
+The counters are stored in the database rather than the cache, so that a
+change made in one process invalidates the fragments cached by every other
+process. A counter is bumped once the transaction which made the change
+commits, so that concurrent writers don't queue on the counter row, and
+fragments are never cached under the new version with uncommitted data.
+
+Saving or deleting a ``DatabaseModel`` bumps its version. Code which writes
+with queryset ``update`` or ``bulk_*`` methods must call
+``bump_data_version`` itself.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+from fyt.core.models import DataVersion
+
+
+def _label(model):
+    return model._meta.concrete_model._meta.label
+
+
+def data_version(trips_year, *models):
+    """
+    Return a string identifying the current state of ``models`` in
+    ``trips_year``.
+    """
+    labels = [_label(model) for model in models]
+    versions = dict(
+        DataVersion.objects.filter(
+            trips_year=getattr(trips_year, 'pk', trips_year), model__in=labels
+        ).values_list('model', 'version')
+    )
+    # Models which have never been changed have no counter
+    return '.'.join(str(versions.get(label, 0)) for label in labels)
+
+
+def bump_data_version(trips_year, model):
+    """
+    Invalidate all cached data that depends on ``model`` in ``trips_year``,
+    once the current transaction commits.
+    """
+    trips_year = getattr(trips_year, 'pk', trips_year)
+    label = _label(model)
+    transaction.on_commit(lambda: _bump(trips_year, label))
+
+
+def _bump(trips_year, label):
+    versions = DataVersion.objects.filter(trips_year=trips_year, model=label)
+    if versions.update(version=F('version') + 1):
+        return
+
+    # Start new counters from the current time so that a version is never
+    # reused for different data, e.g. after a database is restored.
+    _, created = DataVersion.objects.get_or_create(
+        trips_year_id=trips_year,
+        model=label,
+        defaults={'version': int(time.time() * 1000)},
+    )
+    if not created:
+        versions.update(version=F('version') + 1)
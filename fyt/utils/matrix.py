@@ -1,38 +1,160 @@
 from collections import OrderedDict
+from collections.abc import Mapping
 
 
-class OrderedMatrix(OrderedDict):
+# Placeholder for entries of a mapped matrix which have not been computed yet
+_PENDING = object()
+
+
+class MatrixRow(Mapping):
+    """
+    A view of a single row of an OrderedMatrix.
+
+    Behaves like an ordered dict of col -> entry, so that templates can use
+    ``matrix[row][col]`` and ``matrix[row].items``. Assigning to the row
+    writes through to the matrix.
+    """
+
+    def __init__(self, matrix, position):
+        self._matrix = matrix
+        self._offset = position * len(matrix.cols)
+
+    def _position(self, col):
+        try:
+            return self._offset + self._matrix._col_index[col]
+        except (KeyError, TypeError):
+            raise KeyError(col)
+
+    def __getitem__(self, col):
+        return self._matrix._get(self._position(col))
+
+    def __setitem__(self, col, value):
+        self._matrix._data[self._position(col)] = value
+
+    def __iter__(self):
+        return iter(self._matrix.cols)
+
+    def __len__(self):
+        return len(self._matrix.cols)
+
+    def __contains__(self, col):
+        try:
+            return col in self._matrix._col_index
+        except TypeError:
+            return False
+
+    def values(self):
+        get = self._matrix._get
+        return [get(self._offset + j) for j in range(len(self._matrix.cols))]
+
+    def items(self):
+        return list(zip(self._matrix.cols, self.values()))
+
+    def __repr__(self):
+        return repr(OrderedDict(self.items()))
+
+
+class OrderedMatrix(Mapping):
     """
     Holds a matrix of objects.
 
     Unlike a numerical matrix, the entries can be keyed
     with any hashable object.
+
+    Row and column keys are mapped to integer positions and the entries are
+    stored in a single flat list. ``matrix[row]`` returns a ``MatrixRow``
+    view, so the matrix can be used like a dict of dicts:
+    ``matrix[row][col]``, ``matrix.items()`` and ``matrix[row].items()``.
     """
 
     def __init__(self, rows, cols, default=None):
-        super().__init__()
-        self.rows = rows
-        self.cols = cols
-        for r in rows:
-            self[r] = OrderedDict()
-            for c in cols:
-                if callable(default):
-                    self[r][c] = default()
-                else:
-                    self[r][c] = default
+        self._init(rows, cols)
+        size = len(self._all_rows) * len(self.cols)
+        if callable(default):
+            self._data = [default() for _ in range(size)]
+        else:
+            self._data = [default] * size
+        self._func = None
+        self._source = None
 
-    def truncate(self):
-        """
-        Remove all empty rows from matrix
+    def _init(self, rows, cols):
+        # dict.fromkeys drops duplicate keys, the same as the nested dicts did
+        self._all_rows = list(OrderedDict.fromkeys(rows))
+        self.cols = list(OrderedDict.fromkeys(cols))
+        self._row_index = {row: i for i, row in enumerate(self._all_rows)}
+        self._col_index = {col: j for j, col in enumerate(self.cols)}
+        self._truncated = False
+        self._visible_rows = None
 
-        Note: this mutates the original matrix.
+    def _view(self):
+        """
+        Return a new matrix with the same keys, sharing the key indexes.
         """
-        empty = [row for row, cols in self.items() if not any(cols.values())]
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        view._visible_rows = None
+        return view
+
+    def _get(self, position):
+        value = self._data[position]
+        if value is _PENDING:
+            value = self._data[position] = self._func(self._source._get(position))
+        return value
+
+    def _row_values(self, i):
+        width = len(self.cols)
+        return [self._get(i * width + j) for j in range(width)]
+
+    @property
+    def rows(self):
+        if not self._truncated:
+            return self._all_rows
+        if self._visible_rows is None:
+            self._visible_rows = [
+                row for i, row in enumerate(self._all_rows) if any(self._row_values(i))
+            ]
+        return self._visible_rows
+
+    def __getitem__(self, row):
+        try:
+            i = self._row_index[row]
+        except (KeyError, TypeError):
+            raise KeyError(row)
+        if self._truncated and row not in self.rows:
+            raise KeyError(row)
+        return MatrixRow(self, i)
 
-        for row in empty:
-            self.pop(row)
+    def __iter__(self):
+        return iter(self.rows)
 
-        return self
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, row):
+        try:
+            return row in self._row_index and (not self._truncated or row in self.rows)
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, OrderedDict(self.items()))
+
+    def items(self):
+        return [(row, self[row]) for row in self.rows]
+
+    def values(self):
+        return [self[row] for row in self.rows]
+
+    def truncate(self):
+        """
+        Return a view of the matrix without any empty rows.
+
+        The view shares entries with the original matrix. Which rows are
+        empty is only computed when the view is first iterated.
+        """
+        view = self._view()
+        view._truncated = True
+        return view
 
     def map(self, func):
         """
@@ -40,9 +162,49 @@ class OrderedMatrix(OrderedDict):
 
         Returns a new OrderedMatrix with each entry set as
         new[row][col] = func(orig[row][col])
+
+        Entries are computed lazily, the first time they are accessed.
+        Entries assigned to the new matrix do not affect the original.
         """
-        new = OrderedMatrix(self.rows, self.cols)
-        for row in self.rows:
-            for col in self.cols:
-                new[row][col] = func(self[row][col])
+        new = self._view()
+        new._truncated = False
+        new._data = [_PENDING] * len(self._data)
+        new._func = func
+        new._source = self
         return new
+
+    def row_sums(self):
+        """
+        Return an OrderedDict of row -> the sum of the entries in the row.
+        """
+        return OrderedDict(
+            (row, sum(self._row_values(self._row_index[row]))) for row in self.rows
+        )
+
+    def col_sums(self):
+        """
+        Return an OrderedDict of col -> the sum of the entries in the column.
+        """
+        sums = [0] * len(self.cols)
+        for row in self.rows:
+            for j, value in enumerate(self._row_values(self._row_index[row])):
+                sums[j] += value
+        return OrderedDict(zip(self.cols, sums))
+
+    def nonempty_rows(self):
+        """
+        Return an OrderedDict of row -> whether any entry in the row is truthy.
+        """
+        return OrderedDict(
+            (row, any(self._row_values(self._row_index[row]))) for row in self.rows
+        )
+
+    def nonempty_cols(self):
+        """
+        Return an OrderedDict of col -> whether any entry in the column is truthy.
+        """
+        mask = [False] * len(self.cols)
+        for row in self.rows:
+            for j, value in enumerate(self._row_values(self._row_index[row])):
+                mask[j] = mask[j] or bool(value)
+        return OrderedDict(zip(self.cols, mask))
@@ -0,0 +1,215 @@
+"""
+Keyset pagination.
+
+Instead of skipping rows with an ``OFFSET``, each page is found by filtering
+for the rows which sort after the last row of the previous page, so later
+pages are as fast as the first, and the total number of rows is never
+counted. The position of a page is passed between requests as an opaque,
+signed cursor.
+"""
+import datetime
+import decimal
+import json
+import operator
+import uuid
+from collections import namedtuple
+from functools import reduce
+
+from django.core import signing
+from django.db.models import F, Q
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import OrderBy
+from django.db.models.fields import FieldDoesNotExist
+
+
+class Key(namedtuple('Key', ['lookup', 'descending', 'nulls_last'])):
+    """
+    A column of the ordering of a queryset.
+    """
+
+    def equal(self, value):
+        if value is None:
+            return Q(**{self.lookup + '__isnull': True})
+        return Q(**{self.lookup: value})
+
+    def after(self, value):
+        """
+        Rows which sort strictly after ``value`` in this column.
+        """
+        if value is None:
+            if self.nulls_last:
+                return Q(pk__in=[])
+            return Q(**{self.lookup + '__isnull': False})
+
+        op = 'lt' if self.descending else 'gt'
+        q = Q(**{'{}__{}'.format(self.lookup, op): value})
+        if self.nulls_last:
+            q |= Q(**{self.lookup + '__isnull': True})
+        return q
+
+
+def ordering_keys(queryset):
+    """
+    The ``Key`` columns that ``queryset`` is ordered by, ending with the
+    primary key so that the ordering is total.
+
+    Orderings by related objects are expanded to the ordering of the related
+    model, as Django does. Raises a ``ValueError`` if the queryset is ordered
+    by something other than field and annotation lookups.
+    """
+    keys = []
+    for order in _ordering(queryset):
+        keys.extend(_expand(queryset.model, order))
+
+    if not any(key.lookup in ['pk', queryset.model._meta.pk.name] for key in keys):
+        keys.append(Key('pk', False, True))
+
+    if not queryset.query.standard_ordering:
+        # The queryset has been reversed
+        keys = [Key(key.lookup, not key.descending, not key.nulls_last) for key in keys]
+    return keys
+
+
+def _ordering(queryset):
+    query = queryset.query
+    if query.order_by:
+        return list(query.order_by)
+    elif query.default_ordering:
+        return list(queryset.model._meta.ordering)
+    return []
+
+
+def _expand(model, order, prefix='', descending=False):
+    # Postgres sorts nulls as larger than every other value
+    if isinstance(order, OrderBy) and isinstance(order.expression, F):
+        if order.nulls_last or order.nulls_first:
+            nulls_last = order.nulls_last
+        else:
+            nulls_last = not order.descending
+        return [Key(order.expression.name, order.descending, nulls_last)]
+
+    if isinstance(order, F):
+        return [Key(order.name, False, True)]
+
+    if not isinstance(order, str) or order == '?':
+        raise ValueError('Cannot paginate by the ordering {!r}'.format(order))
+
+    if order.startswith('-'):
+        order = order[1:]
+        descending = not descending
+
+    lookup = prefix + order
+    opts = model._meta
+    field = None
+    try:
+        for name in order.split(LOOKUP_SEP):
+            field = opts.get_field(name)
+            if field.is_relation:
+                opts = field.related_model._meta
+    except FieldDoesNotExist:
+        # An annotation, or the primary key
+        return [Key(lookup, descending, not descending)]
+
+    if field.is_relation and opts.ordering and name != field.attname:
+        return [
+            key
+            for related_order in opts.ordering
+            for key in _expand(
+                field.related_model, related_order, lookup + LOOKUP_SEP, descending
+            )
+        ]
+
+    return [Key(lookup, descending, not descending)]
+
+
+class CursorEncoder(json.JSONEncoder):
+    """
+    Encode the values of a cursor without losing precision.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, (decimal.Decimal, uuid.UUID)):
+            return str(o)
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_previous, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+        self.has_previous = has_previous
+        self.has_next = next_cursor is not None
+        self.has_other_pages = self.has_previous or self.has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate an ordered queryset, ``per_page`` rows at a time.
+    """
+
+    salt = 'fyt.utils.pagination'
+
+    def __init__(self, queryset, per_page):
+        self.per_page = per_page
+        self.keys = ordering_keys(queryset)
+        # Break ties by primary key
+        self.queryset = queryset.order_by(*_ordering(queryset), 'pk')
+        self.signature = [list(key) for key in self.keys]
+
+    def page(self, cursor=None):
+        """
+        The page after ``cursor``, or the first page if the cursor is
+        missing or was made for a different ordering.
+        """
+        values = self.decode(cursor)
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self.after(values))
+
+        object_list = list(queryset[: self.per_page + 1])
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[: self.per_page]
+            next_cursor = self.encode(object_list[-1])
+
+        return KeysetPage(object_list, values is not None, next_cursor)
+
+    def after(self, values):
+        """
+        Rows which sort strictly after the row with key ``values``.
+        """
+        conditions = []
+        equal = Q()
+        for key, value in zip(self.keys, values):
+            conditions.append(equal & key.after(value))
+            equal &= key.equal(value)
+        return reduce(operator.or_, conditions)
+
+    def encode(self, obj):
+        values = (
+            self.queryset.filter(pk=obj.pk)
+            .values_list(*[key.lookup for key in self.keys])
+            .get()
+        )
+        values = json.loads(json.dumps(values, cls=CursorEncoder))
+        return signing.dumps([self.signature, values], salt=self.salt)
+
+    def decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            signature, values = signing.loads(cursor, salt=self.salt)
+        except (signing.BadSignature, ValueError):
+            return None
+        if signature != self.signature:
+            return None
+        return values
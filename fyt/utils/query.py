@@ -22,3 +22,34 @@ def TrueIf(**kwargs):
         default=False,
         output_field=models.BooleanField(),
     )
+
+
+def chunked_iterator(qs, *prefetch_lookups, chunk_size=100):
+    """
+    Iterate over a queryset with ``.iterator()``, prefetching related
+    objects ``chunk_size`` objects at a time.
+
+    ``prefetch_related`` is ignored by ``.iterator()``, and prefetching for
+    the whole queryset at once keeps every related object in memory.
+    """
+    chunk = []
+    for obj in qs.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            models.prefetch_related_objects(chunk, *prefetch_lookups)
+            yield from chunk
+            chunk = []
+
+    if chunk:
+        models.prefetch_related_objects(chunk, *prefetch_lookups)
+        yield from chunk
+
+
+def prefetching_iterator(qs, chunk_size=100):
+    """
+    Like ``chunked_iterator``, prefetching the ``prefetch_related`` lookups
+    of the queryset itself.
+    """
+    return chunked_iterator(
+        qs.prefetch_related(None), *qs._prefetch_related_lookups, chunk_size=chunk_size
+    )
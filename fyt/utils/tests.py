@@ -1,14 +1,18 @@
 import unittest
 
 from django.core.exceptions import ValidationError
+from django.db.models import F
 from django.template import Context, Template
 from model_mommy import mommy
 
+from fyt.incoming.models import IncomingStudent
 from fyt.test import FytTestCase
-from fyt.trips.models import Section
+from fyt.trips.models import Section, Trip
 from fyt.utils.fmt import join_with_and, join_with_or, section_range
 from fyt.utils.lat_lng import parse_lat_lng, validate_lat_lng
 from fyt.utils.matrix import OrderedMatrix
+from fyt.utils.pagination import Key, KeysetPaginator, ordering_keys
+from fyt.utils.query import chunked_iterator
 
 
 class OrderedMatrixTestCase(unittest.TestCase):
@@ -33,6 +37,136 @@ class OrderedMatrixTestCase(unittest.TestCase):
         n = m.map(lambda x: x + 1)
         self.assertEqual(m[0][0], 0)
 
+    def test_map_is_lazy(self):
+        calls = []
+        m = OrderedMatrix([0, 1], [0, 1], default=0)
+        n = m.map(calls.append)
+        self.assertEqual(calls, [])
+        n[1][0]
+        n[1][0]
+        self.assertEqual(calls, [0])
+
+    def test_assign_to_mapped_matrix(self):
+        m = OrderedMatrix([0, 1], [0, 1], default=0)
+        n = m.map(lambda x: None)
+        n[0][1] = 'issue'
+        self.assertEqual(n, {0: {0: None, 1: 'issue'}, 1: {0: None, 1: None}})
+        self.assertEqual(m[0][1], 0)
+
+    def test_truncate_is_a_view(self):
+        m = OrderedMatrix([0, 1, 2], [0, 1], default=0)
+        t = m.truncate()
+        m[2][0] = 5
+        self.assertEqual(list(t), [2])
+        self.assertNotIn(0, t)
+        self.assertEqual(list(m), [0, 1, 2])
+
+    def test_sums(self):
+        m = OrderedMatrix(['a', 'b'], [0, 1, 2], default=0)
+        m['a'][0] = 1
+        m['a'][2] = 2
+        m['b'][2] = 3
+        self.assertEqual(m.row_sums(), {'a': 3, 'b': 3})
+        self.assertEqual(m.col_sums(), {0: 1, 1: 0, 2: 5})
+
+    def test_nonempty_masks(self):
+        m = OrderedMatrix(['a', 'b'], [0, 1], default=list)
+        m['b'][0].append('trip')
+        self.assertEqual(m.nonempty_rows(), {'a': False, 'b': True})
+        self.assertEqual(m.nonempty_cols(), {0: True, 1: False})
+
+    def test_missing_keys(self):
+        m = OrderedMatrix([0], [0])
+        with self.assertRaises(KeyError):
+            m[1]
+        with self.assertRaises(KeyError):
+            m[0][1]
+
+
+class ChunkedIteratorTestCase(FytTestCase):
+    def test_prefetches_in_chunks(self):
+        trips_year = self.init_trips_year()
+        trips = mommy.make(Trip, 3, trips_year=trips_year)
+        qs = Trip.objects.order_by('pk')
+
+        # One query for the trips, one per chunk for the leaders
+        with self.assertNumQueries(3):
+            result = list(chunked_iterator(qs, 'leaders', chunk_size=2))
+            for trip in result:
+                list(trip.leaders.all())
+
+        self.assertEqual(result, trips)
+
+
+class KeysetPaginatorTestCase(FytTestCase):
+    def setUp(self):
+        self.init_trips_year()
+        trips = mommy.make(Trip, 2, trips_year=self.trips_year)
+        for i, trip in enumerate([None, trips[0], trips[1], None, trips[0]] * 2):
+            mommy.make(
+                IncomingStudent,
+                trips_year=self.trips_year,
+                name='Student {}'.format(i % 3),
+                trip_assignment=trip,
+            )
+
+    def test_ordering_keys(self):
+        qs = IncomingStudent.objects.order_by('-trip_assignment', 'name')
+        self.assertEqual(
+            ordering_keys(qs),
+            [
+                Key('trip_assignment__section__name', True, False),
+                Key('trip_assignment__template__name', True, False),
+                Key('name', False, True),
+                Key('pk', False, True),
+            ],
+        )
+
+    def test_default_ordering_keys(self):
+        self.assertEqual(
+            ordering_keys(IncomingStudent.objects.all()),
+            [Key('name', False, True), Key('pk', False, True)],
+        )
+
+    def test_pages_follow_ordering(self):
+        orderings = [
+            ['name'],
+            ['-name'],
+            ['trip_assignment'],
+            ['-trip_assignment', '-name'],
+            [F('trip_assignment').desc(nulls_last=True)],
+            [F('trip_assignment').asc(nulls_first=True), '-pk'],
+        ]
+        querysets = [IncomingStudent.objects.order_by(*o) for o in orderings] + [
+            IncomingStudent.objects.order_by('trip_assignment').reverse()
+        ]
+        for qs in querysets:
+            ordering = qs.query.order_by
+            expected = list(qs.order_by(*ordering, 'pk').values_list('pk', flat=True))
+            paginator = KeysetPaginator(qs, 3)
+
+            pages = [paginator.page()]
+            while pages[-1].has_next:
+                pages.append(paginator.page(pages[-1].next_cursor))
+
+            reverse = not qs.query.standard_ordering
+            with self.subTest(ordering=ordering, reverse=reverse):
+                self.assertEqual(len(pages), 4)
+                self.assertFalse(pages[0].has_previous)
+                self.assertTrue(pages[1].has_previous)
+                self.assertEqual([obj.pk for page in pages for obj in page], expected)
+
+    def test_cursor_for_other_ordering_is_ignored(self):
+        qs = IncomingStudent.objects.order_by('name')
+        cursor = KeysetPaginator(qs, 3).page().next_cursor
+
+        page = KeysetPaginator(qs.reverse(), 3).page(cursor)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(page.object_list, list(qs.order_by('-name', '-pk')[:3]))
+
+        page = KeysetPaginator(qs, 3).page('garbage')
+        self.assertFalse(page.has_previous)
+
 
 class FmtUtilsTest(FytTestCase):
     def test_section_range(self):